@@ -0,0 +1,122 @@
+"""
+負荷に応じた受け入れ制御 (admission.py)
+イベントループの遅延とルーム数から負荷レベルを決め、
+新規ルーム作成の拒否と、優先度の低い通信（カーソル・realtime・観戦）の間引きを行う。
+CPU を使いすぎているルーム（throttled）は、全体の負荷に関係なく OVERLOADED と同じだけ間引く。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Callable, Dict, Optional
+
+
+# =========================
+# 設定
+# =========================
+MAX_ROOMS = 5000            # これ以上は新規ルームを作らせない
+DEGRADE_ROOM_RATIO = 0.8    # MAX_ROOMS のこの割合を超えたら間引き開始
+LAG_DEGRADE_MS = 50.0       # ループ遅延がこれを超えたら間引き開始
+LAG_REJECT_MS = 200.0       # ループ遅延がこれを超えたら新規ルームを拒否
+SAMPLE_INTERVAL = 0.25      # 遅延の計測間隔（秒）
+LAG_SMOOTHING = 0.3         # 遅延のEWMA係数
+
+NORMAL = 0
+DEGRADED = 1
+OVERLOADED = 2
+LEVEL_NAMES = ("normal", "degraded", "overloaded")
+
+# レベルごとの間引き設定（インデックス = レベル）
+CURSOR_INTERVAL_SEC = (0.0, 0.25, 1.0)   # 同じroleのカーソル更新を受け付ける最小間隔
+REALTIME_EVERY_TICKS = (1, 2, 5)         # realtime フレームを何ティックに1回送るか
+SPECTATOR_INTERVAL_SEC = (0.0, 2.0, 5.0) # 観戦者へ state を送る最小間隔
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        room_count: Callable[[], int],
+        max_rooms: int = MAX_ROOMS,
+        lag_degrade_ms: float = LAG_DEGRADE_MS,
+        lag_reject_ms: float = LAG_REJECT_MS,
+        interval: float = SAMPLE_INTERVAL,
+    ):
+        self.room_count = room_count
+        self.max_rooms = max_rooms
+        self.lag_degrade_ms = lag_degrade_ms
+        self.lag_reject_ms = lag_reject_ms
+        self.interval = interval
+        self.lag_ms = 0.0
+        self.rejected = 0
+        self.draining = False  # 引き継ぎ（デプロイ）中は新規ルームを作らせない
+        self._task: Optional[asyncio.Task] = None
+
+    # ----- 計測 -----
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._monitor())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _monitor(self) -> None:
+        # sleep が予定よりどれだけ遅れて戻ったか = 他の処理でループが詰まっていた時間
+        try:
+            while True:
+                t0 = time.monotonic()
+                await asyncio.sleep(self.interval)
+                lag = max(0.0, (time.monotonic() - t0 - self.interval) * 1000.0)
+                self.lag_ms += LAG_SMOOTHING * (lag - self.lag_ms)
+        except asyncio.CancelledError:
+            return
+
+    # ----- 判定 -----
+    @property
+    def level(self) -> int:
+        rooms = self.room_count()
+        if self.lag_ms >= self.lag_reject_ms or rooms >= self.max_rooms:
+            return OVERLOADED
+        if self.lag_ms >= self.lag_degrade_ms or rooms >= self.max_rooms * DEGRADE_ROOM_RATIO:
+            return DEGRADED
+        return NORMAL
+
+    def drain(self) -> None:
+        self.draining = True
+
+    def undrain(self) -> None:
+        """引き継ぎに失敗したとき、このプロセスで受け付けを再開する"""
+        self.draining = False
+
+    def admit_new_room(self) -> bool:
+        """新しいルームを作ってよいか（既存ルームへの参加は常に許可）"""
+        if self.draining or self.level >= OVERLOADED:
+            self.rejected += 1
+            return False
+        return True
+
+    def _room_level(self, throttled: bool) -> int:
+        return OVERLOADED if throttled else self.level
+
+    def cursor_interval(self, throttled: bool = False) -> float:
+        return CURSOR_INTERVAL_SEC[self._room_level(throttled)]
+
+    def realtime_every(self, throttled: bool = False) -> int:
+        return REALTIME_EVERY_TICKS[self._room_level(throttled)]
+
+    def spectator_interval(self, throttled: bool = False) -> float:
+        return SPECTATOR_INTERVAL_SEC[self._room_level(throttled)]
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "level": LEVEL_NAMES[self.level],
+            "lagMs": round(self.lag_ms, 2),
+            "rooms": self.room_count(),
+            "maxRooms": self.max_rooms,
+            "lagDegradeMs": self.lag_degrade_ms,
+            "lagRejectMs": self.lag_reject_ms,
+            "rejected": self.rejected,
+            "draining": self.draining,
+        }
@@ -0,0 +1,348 @@
+"""
+対戦アーカイブ (archive.py)
+終了した対戦を列指向のバイナリファイルへ追記し、mmapで読み出して集計する。
+
+ファイルはブロックの連続で、1ブロックに最大 BLOCK_MATCHES 試合ぶんの列が入る。
+各列は8バイト境界に揃えてあるので、読み出し側は memoryview.cast で
+Pythonオブジェクトを作らずに列を走査できる（リトルエンディアン前提）。
+append() はメモリにためるだけで、ブロックのエンコードとファイルへの追記は書き込みスレッドが行う。
+
+    header   magic "IKAB", version u16, reserved u16,
+             n_matches u32, n_actions u32, n_cheats u32, block_size u32
+    matches  started_at f64, duration f32, action_count u32, cheat_count u32,
+             turns u16, winner u8, first_attack u8, player_penalty u8, opponent_penalty u8
+    actions  t f32（開始からの秒）, action u8, role u8, ok u8
+    cheats   cheat_type u8, by u8, caught u8
+
+使い方: python archive.py var/matches.ikab
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import queue
+import struct
+import sys
+import threading
+from dataclasses import dataclass, field as dataclass_field
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from rules import CHEAT_TYPES, ROLES
+
+
+# =========================
+# 設定
+# =========================
+MAGIC = b"IKAB"
+VERSION = 1
+BLOCK_MATCHES = 256   # この試合数たまったらブロックとして書き出す
+HEADER = struct.Struct("<4sHHIIII")
+
+ACTIONS = ("start", "play-card", "end-turn", "cheat", "accuse", "mulligan")
+NONE_CODE = 255  # 役割なし（引き分け等）・未知のアクション/イカサマ
+
+# (名前, 型コード, 要素サイズ)
+MATCH_COLUMNS = (
+    ("started_at", "d", 8),
+    ("duration", "f", 4),
+    ("action_count", "I", 4),
+    ("cheat_count", "I", 4),
+    ("turns", "H", 2),
+    ("winner", "B", 1),
+    ("first_attack", "B", 1),
+    ("player_penalty", "B", 1),
+    ("opponent_penalty", "B", 1),
+)
+ACTION_COLUMNS = (
+    ("action_t", "f", 4),
+    ("action", "B", 1),
+    ("action_role", "B", 1),
+    ("action_ok", "B", 1),
+)
+CHEAT_COLUMNS = (
+    ("cheat_type", "B", 1),
+    ("cheat_by", "B", 1),
+    ("cheat_caught", "B", 1),
+)
+
+
+def _code(table: Tuple[str, ...], name: Optional[str]) -> int:
+    try:
+        return table.index(name) if name is not None else NONE_CODE
+    except ValueError:
+        return NONE_CODE
+
+
+def _pad8(n: int) -> int:
+    return (n + 7) & ~7
+
+
+# =========================
+# 書き込み
+# =========================
+@dataclass
+class MatchRecord:
+    started_at: float
+    duration: float
+    winner: Optional[str]
+    first_attack_role: Optional[str]
+    player_penalty: int
+    opponent_penalty: int
+    turns: int
+    actions: List[Tuple[float, str, str, bool]] = dataclass_field(default_factory=list)  # (経過秒, role, action, ok)
+    cheats: List[Tuple[str, str, bool]] = dataclass_field(default_factory=list)          # (by, cheatType, 指摘されたか)
+
+
+def _pack_column(fmt: str, values: List) -> bytes:
+    raw = struct.pack(f"<{len(values)}{fmt}", *values)
+    return raw + b"\0" * (_pad8(len(raw)) - len(raw))
+
+
+# キューに積むもの: 1ブロックぶんの対戦 / 書き終えの通知先 / 停止（None）
+_Item = Union[List[MatchRecord], threading.Event, None]
+
+
+class MatchArchiveWriter:
+    """
+    終了した対戦をメモリにためて、ブロック単位でファイル末尾へ追記する。
+    append() はイベントループから呼ぶ（待たない）。エンコードと書き込みは書き込みスレッドで行う
+    """
+
+    def __init__(self, path: str, block_matches: int = BLOCK_MATCHES):
+        self.path = path
+        self.block_matches = block_matches
+        self.pending: List[MatchRecord] = []
+        self._queue: "queue.SimpleQueue[_Item]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.written = 0   # 書き出した試合数
+        self.failed = 0    # 書けずに捨てた試合数
+
+    def append(self, record: MatchRecord) -> None:
+        self.pending.append(record)
+        if len(self.pending) >= self.block_matches:
+            self._hand_off()
+
+    def _hand_off(self) -> None:
+        if not self.pending:
+            return
+        records, self.pending = self.pending, []
+        self._ensure_thread()
+        self._queue.put(records)
+
+    def flush(self) -> None:
+        """ブロックに満たない分も含めて書き終えるまで待つ（終了時・ベンチ用。イベントループからは呼ばない）"""
+        self._hand_off()
+        if self._thread is None or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self) -> None:
+        """残りを書き出してスレッドを止める"""
+        self._hand_off()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="archive-writer", daemon=True)
+                self._thread.start()
+
+    # ----- 書き込みスレッド -----
+    def _run(self) -> None:
+        while True:
+            item: _Item = self._queue.get()
+            if item is None:
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            self._write(item)
+
+    def _write(self, records: List[MatchRecord]) -> None:
+        try:
+            block = encode_block(records)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "ab") as f:
+                f.write(block)
+        except (OSError, struct.error):
+            # ディスク不足・範囲外の値など。そのブロックは捨てる（書き込みスレッドは止めない）
+            self.failed += len(records)
+            return
+        self.written += len(records)
+
+
+def encode_block(records: List[MatchRecord]) -> bytes:
+    cols: Dict[str, List] = {name: [] for name, _, _ in MATCH_COLUMNS + ACTION_COLUMNS + CHEAT_COLUMNS}
+    for r in records:
+        cols["started_at"].append(r.started_at)
+        cols["duration"].append(r.duration)
+        cols["action_count"].append(len(r.actions))
+        cols["cheat_count"].append(len(r.cheats))
+        cols["turns"].append(min(r.turns, 0xFFFF))
+        cols["winner"].append(_code(ROLES, r.winner))
+        cols["first_attack"].append(_code(ROLES, r.first_attack_role))
+        cols["player_penalty"].append(min(r.player_penalty, 0xFF))
+        cols["opponent_penalty"].append(min(r.opponent_penalty, 0xFF))
+        for t, role, action, ok in r.actions:
+            cols["action_t"].append(t)
+            cols["action"].append(_code(ACTIONS, action))
+            cols["action_role"].append(_code(ROLES, role))
+            cols["action_ok"].append(1 if ok else 0)
+        for by, cheat_type, caught in r.cheats:
+            cols["cheat_type"].append(_code(CHEAT_TYPES, cheat_type))
+            cols["cheat_by"].append(_code(ROLES, by))
+            cols["cheat_caught"].append(1 if caught else 0)
+
+    body = b"".join(
+        _pack_column(fmt, cols[name])
+        for name, fmt, _ in MATCH_COLUMNS + ACTION_COLUMNS + CHEAT_COLUMNS
+    )
+    header = HEADER.pack(
+        MAGIC, VERSION, 0,
+        len(records), len(cols["action_t"]), len(cols["cheat_type"]),
+        HEADER.size + len(body),
+    )
+    return header + body
+
+
+# =========================
+# 読み出し（mmap）
+# =========================
+class Block:
+    """1ブロックぶんの列ビュー。各列は memoryview（コピーなし）"""
+
+    def __init__(self, mv: memoryview, offset: int):
+        magic, version, _, n, n_actions, n_cheats, size = HEADER.unpack_from(mv, offset)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"アーカイブが壊れています（offset={offset}）")
+        self.size = size
+        self.n_matches = n
+        self.columns: Dict[str, memoryview] = {}
+        pos = offset + HEADER.size
+        for group, count in ((MATCH_COLUMNS, n), (ACTION_COLUMNS, n_actions), (CHEAT_COLUMNS, n_cheats)):
+            for name, fmt, width in group:
+                length = count * width
+                self.columns[name] = mv[pos:pos + length].cast(fmt)
+                pos += _pad8(length)
+
+    def __getitem__(self, name: str) -> memoryview:
+        return self.columns[name]
+
+    def release(self) -> None:
+        for col in self.columns.values():
+            col.release()
+
+
+class MatchArchive:
+    """アーカイブファイルをmmapして列単位で集計する"""
+
+    def __init__(self, path: str):
+        if sys.byteorder != "little":
+            raise RuntimeError("MatchArchive はリトルエンディアン環境のみ対応しています")
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+        self._file.close()
+
+    def __enter__(self) -> "MatchArchive":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def blocks(self) -> Iterator[Block]:
+        if self._mm is None:
+            return
+        mv = memoryview(self._mm)
+        try:
+            offset = 0
+            while offset < len(mv):
+                block = Block(mv, offset)
+                try:
+                    yield block
+                finally:
+                    block.release()
+                offset += block.size
+        finally:
+            mv.release()
+
+    def __len__(self) -> int:
+        return sum(b.n_matches for b in self.blocks())
+
+    # ----- 集計 -----
+    def win_rate_by_first_attack(self) -> Dict[str, Dict[str, float]]:
+        """先攻側ごとの試合数・先攻勝利数・先攻勝率"""
+        matches = [0, 0]
+        wins = [0, 0]
+        for b in self.blocks():
+            for first, winner in zip(b["first_attack"], b["winner"]):
+                if first > 1:
+                    continue
+                matches[first] += 1
+                if first == winner:
+                    wins[first] += 1
+        return {
+            role: {
+                "matches": matches[i],
+                "firstAttackWins": wins[i],
+                "winRate": wins[i] / matches[i] if matches[i] else 0.0,
+            }
+            for i, role in enumerate(ROLES)
+        }
+
+    def accusation_rate_by_cheat_type(self) -> Dict[str, Dict[str, float]]:
+        """イカサマの種類ごとの件数・指摘された件数・指摘成功率"""
+        total = [0] * (NONE_CODE + 1)
+        caught = [0] * (NONE_CODE + 1)
+        for b in self.blocks():
+            for code, hit in zip(b["cheat_type"], b["cheat_caught"]):
+                total[code] += 1
+                caught[code] += hit
+        return {
+            name: {
+                "cheats": total[i],
+                "caught": caught[i],
+                "successRate": caught[i] / total[i] if total[i] else 0.0,
+            }
+            for i, name in enumerate(CHEAT_TYPES)
+        }
+
+    def average_turns_to_victory(self) -> float:
+        turns = 0
+        decided = 0
+        for b in self.blocks():
+            for t, winner in zip(b["turns"], b["winner"]):
+                if winner != NONE_CODE:
+                    turns += t
+                    decided += 1
+        return turns / decided if decided else 0.0
+
+
+if __name__ == "__main__":
+    import json
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "var/matches.ikab"
+    with MatchArchive(path) as archive:
+        print(json.dumps({
+            "matches": len(archive),
+            "winRateByFirstAttack": archive.win_rate_by_first_attack(),
+            "accusationRateByCheatType": archive.accusation_rate_by_cheat_type(),
+            "averageTurnsToVictory": archive.average_turns_to_victory(),
+        }, ensure_ascii=False, indent=2))
@@ -0,0 +1,202 @@
+"""
+静的アセット配信 (assets.py)
+static/ 以下のJS/CSSにコンテンツハッシュ付きのURLを与え、gzip版と一緒にメモリへ載せて配信する
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+
+# =========================
+# 設定
+# =========================
+URL_PREFIX = "/static/"
+INDEX_FILE = "index.html"
+# ハッシュ付きURLにするファイル（static/ からの相対パス）
+ASSET_FILES: List[str] = [
+    "src/main.js",
+    "src/render-3d.js",
+    "src/title.js",
+    "style.css",
+]
+GZIP_MIN_SIZE = 512  # これより小さいファイルは圧縮しない
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+MEDIA_TYPES = {
+    ".js": "text/javascript; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".html": "text/html; charset=utf-8",
+}
+
+
+@dataclass
+class Asset:
+    body: bytes
+    gzip_body: Optional[bytes]
+    digest: str          # 本文のsha256（ETagに使う）
+    media_type: str
+    immutable: bool      # ハッシュ付きURLなら長期キャッシュ可
+
+
+def hashed_name(rel: str, digest: str) -> str:
+    """src/main.js -> src/main.<hash>.js"""
+    base, ext = os.path.splitext(rel)
+    return f"{base}.{digest[:12]}{ext}"
+
+
+def accepts_gzip(headers: Headers) -> bool:
+    for part in headers.get("accept-encoding", "").split(","):
+        token, _, params = part.strip().partition(";")
+        if token.strip().lower() not in ("gzip", "*"):
+            continue
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+# =========================
+# アセットパイプライン
+# =========================
+class AssetPipeline:
+    """
+    起動時に一度だけ実行する：
+    1. 他アセットへの参照（例: main.js の import）を書き換えてからハッシュを取る
+    2. index.html の参照をハッシュ付きURLへ書き換える
+    3. 元URL・ハッシュ付きURLの両方をgzip版と一緒にメモリへ保持する
+    """
+
+    def __init__(self, directory: str = "static", files: Optional[List[str]] = None):
+        self.directory = directory
+        self.files = list(files if files is not None else ASSET_FILES)
+        self.assets: Dict[str, Asset] = {}   # URL -> Asset
+        self.urls: Dict[str, str] = {}       # 元URL -> ハッシュ付きURL
+        self.built = False
+
+    def _read(self, rel: str) -> str:
+        with open(os.path.join(self.directory, rel), encoding="utf-8") as f:
+            return f.read()
+
+    def _rewrite(self, text: str) -> str:
+        # 長いURLから置換して部分一致の取り違えを防ぐ
+        for src in sorted(self.urls, key=len, reverse=True):
+            text = text.replace(src, self.urls[src])
+        return text
+
+    def _add(self, url: str, rel: str, text: str, immutable: bool) -> Asset:
+        body = text.encode("utf-8")
+        gz = gzip.compress(body, compresslevel=9, mtime=0) if len(body) >= GZIP_MIN_SIZE else None
+        asset = Asset(
+            body=body,
+            gzip_body=gz if gz is not None and len(gz) < len(body) else None,
+            digest=hashlib.sha256(body).hexdigest(),
+            media_type=MEDIA_TYPES.get(os.path.splitext(rel)[1], "application/octet-stream"),
+            immutable=immutable,
+        )
+        self.assets[url] = asset
+        return asset
+
+    def build(self) -> None:
+        self.assets.clear()
+        self.urls.clear()
+        sources = {rel: self._read(rel) for rel in self.files}
+
+        # 参照先が先にハッシュ済みになるよう、依存が解決したものから順に処理する
+        pending = list(self.files)
+        while pending:
+            progressed = False
+            for rel in list(pending):
+                text = sources[rel]
+                deps = [
+                    other for other in self.files
+                    if other != rel and URL_PREFIX + other in text
+                ]
+                if any(URL_PREFIX + d not in self.urls for d in deps):
+                    continue
+                text = self._rewrite(text)
+                digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+                url = URL_PREFIX + hashed_name(rel, digest)
+                asset = self._add(url, rel, text, immutable=True)
+                # 元URLも同じ内容をメモリから返す（ただし毎回再検証させる）
+                self.assets[URL_PREFIX + rel] = Asset(
+                    body=asset.body,
+                    gzip_body=asset.gzip_body,
+                    digest=asset.digest,
+                    media_type=asset.media_type,
+                    immutable=False,
+                )
+                self.urls[URL_PREFIX + rel] = url
+                pending.remove(rel)
+                progressed = True
+            if not progressed:
+                raise RuntimeError(f"アセットの参照が循環しています: {pending}")
+
+        index = self._rewrite(self._read(INDEX_FILE))
+        self._add("/", INDEX_FILE, index, immutable=False)
+        self.built = True
+
+    def response(self, url: str, headers: Headers, head: bool = False) -> Optional[Response]:
+        """メモリ上のアセットを返す。対象外のURLならNone。head=True なら本文なし（長さだけ付ける）"""
+        if not self.built:
+            self.build()
+        asset = self.assets.get(url)
+        if asset is None:
+            return None
+
+        use_gzip = asset.gzip_body is not None and accepts_gzip(headers)
+        # 強いETagは表現ごとに別にする（gzip版は別のバイト列なので）
+        etag = f'"{asset.digest[:32]}{"-gz" if use_gzip else ""}"'
+        resp_headers = {
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE_CACHE if asset.immutable else REVALIDATE_CACHE,
+        }
+        # 中身が Accept-Encoding で変わるのは gzip 版があるときだけ
+        if asset.gzip_body is not None:
+            resp_headers["Vary"] = "Accept-Encoding"
+
+        if_none_match = headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+            return Response(status_code=304, headers=resp_headers)
+
+        body = asset.body
+        if use_gzip:
+            resp_headers["Content-Encoding"] = "gzip"
+            body = asset.gzip_body
+        if head:
+            resp_headers["Content-Length"] = str(len(body))
+            return Response(b"", media_type=asset.media_type, headers=resp_headers)
+        return Response(body, media_type=asset.media_type, headers=resp_headers)
+
+
+class AssetStaticFiles(StaticFiles):
+    """パイプラインにあるファイルはメモリから、それ以外（favicon等）は従来通りディスクから配信"""
+
+    def __init__(self, *, pipeline: AssetPipeline, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.pipeline = pipeline
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        # 親クラスと同じく GET/HEAD 以外は 405
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+        url = URL_PREFIX + path.replace(os.sep, "/")
+        resp = self.pipeline.response(url, Headers(scope=scope), head=scope["method"] == "HEAD")
+        if resp is not None:
+            return resp
+        return await super().get_response(path, scope)
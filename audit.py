@@ -0,0 +1,163 @@
+"""
+監査ログ (audit.py)
+接続・席の割り当て・アクションの結果・イカサマ・指摘を JSON Lines で記録する。
+
+record() は deque に積むだけ（append は GIL の下で1命令なのでロックを取らない）。
+JSON にするのもファイルへ書くのも書き込みスレッドが FLUSH_INTERVAL ごとにまとめて行うので、
+カーソル移動のたびに呼んでもイベントループはファイルI/Oを待たない。
+書き込みが追いつかずキューが MAX_QUEUE に達したら、新しい記録は捨てて dropped を数える。
+ファイルが MAX_BYTES を超えたら audit.jsonl → audit.jsonl.1 → ... と BACKUPS 世代まで回す
+（回せなければ今のファイルに書き続ける。ファイルの失敗で書き込みスレッドは止まらない）。
+
+    {"ts": 1700000000.123, "event": "action", "room": "abc", "role": "player", "action": "end-turn", "ok": true, ...}
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, TextIO, Tuple
+
+
+# =========================
+# 設定
+# =========================
+MAX_QUEUE = 100_000         # 書き出し待ちの上限（超えたら捨てる）
+FLUSH_INTERVAL = 0.2        # 書き込みスレッドが起きる間隔（秒）
+BATCH_LINES = 5000          # 1回の write にまとめる行数
+MAX_BYTES = 64 * 1024 * 1024  # これを超えたらファイルを回す
+BACKUPS = 5                 # 残しておく古いファイルの数
+
+# (時刻, イベント名, 項目)。項目の dict は積んだあと書き換えないこと
+_Record = Tuple[float, str, Dict[str, Any]]
+
+
+class AuditLog:
+    def __init__(self, path: str, max_queue: int = MAX_QUEUE, flush_interval: float = FLUSH_INTERVAL,
+                 max_bytes: int = MAX_BYTES, backups: int = BACKUPS):
+        self.path = path
+        self.max_queue = max_queue
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.enabled = True
+        self._queue: Deque[_Record] = deque()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.written = 0
+        self.dropped = 0   # キューが溢れて捨てた数（イベントループ側で数える）
+        self.failed = 0    # JSON にできなかった数（書き込みスレッド側で数える）
+        self.rotations = 0
+        self.rotate_failed = 0  # ファイルを回せなかった回数（今のファイルに書き続ける）
+
+    # ----- 記録（イベントループから呼ぶ。待たない） -----
+    def record(self, event: str, **fields: Any) -> None:
+        if not self.enabled:
+            return
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            return
+        self._queue.append((time.time(), event, fields))
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            self._ensure_thread()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": len(self._queue),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "rotations": self.rotations,
+            "rotateFailed": self.rotate_failed,
+        }
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+
+    def close(self) -> None:
+        """残りを書き出してスレッドを止める"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._stop.set()
+            thread.join()
+
+    # ----- 書き込みスレッド -----
+    def _run(self) -> None:
+        f: Optional[TextIO] = None
+        try:
+            while True:
+                stopping = self._stop.wait(self.flush_interval)
+                if f is None:
+                    # 開けなければキューに残したまま（溢れた分は record() で捨てる）次の回に再挑戦する
+                    f = self._open()
+                if f is not None:
+                    f = self._drain(f)
+                if stopping:
+                    return
+        finally:
+            if f is not None:
+                f.close()
+
+    def _open(self) -> Optional[TextIO]:
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            return open(self.path, "a", encoding="utf-8")
+        except OSError:
+            return None
+
+    def _drain(self, f: TextIO) -> TextIO:
+        queue = self._queue
+        while queue:
+            lines: List[str] = []
+            while queue and len(lines) < BATCH_LINES:
+                ts, event, fields = queue.popleft()
+                try:
+                    lines.append(json.dumps({"ts": ts, "event": event, **fields}, ensure_ascii=False, default=str))
+                except ValueError:
+                    # 循環参照など。記録は捨てても書き込みスレッドは止めない
+                    self.failed += 1
+            if not lines:
+                continue
+            try:
+                f.write("\n".join(lines) + "\n")
+                f.flush()
+            except OSError:
+                # ディスク不足など。書けなかった分は捨てて次の回に再挑戦する
+                self.failed += len(lines)
+                continue
+            self.written += len(lines)
+            if f.tell() >= self.max_bytes:
+                f = self._rotate(f)
+        return f
+
+    def _rotate(self, f: TextIO) -> TextIO:
+        """回せなかったら（権限・ディスク不足など）今のファイルに書き続け、次に MAX_BYTES を超えたときに再挑戦する"""
+        try:
+            for i in range(self.backups - 1, 0, -1):
+                src = f"{self.path}.{i}"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{i + 1}")
+            if self.backups > 0:
+                os.replace(self.path, f"{self.path}.1")
+            else:
+                os.remove(self.path)
+            new = open(self.path, "a", encoding="utf-8")
+        except OSError:
+            self.rotate_failed += 1
+            return f
+        # 開いたままのファイルは名前が変わっても同じ中身を指すので、新しいファイルを開けてから閉じる
+        f.close()
+        self.rotations += 1
+        return new
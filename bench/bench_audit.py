@@ -0,0 +1,88 @@
+"""
+監査ログのベンチマーク (bench/bench_audit.py)
+
+イベントループ上で record() を --records 回呼び、1回あたりの時間を測る。比較として、
+同じ内容を呼び出し側でその場で JSON にしてファイルへ書く（print/logging 相当）場合も測る。
+書き込みスレッドが全件を書き終えるまでの時間、溢れて捨てた数、ファイルを回した回数も出す。
+
+使い方: python bench/bench_audit.py --records 200000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audit import AuditLog  # noqa: E402
+
+
+def sample(i: int) -> dict:
+    # 多いのはカーソル、ときどきイカサマ
+    if i % 10 == 0:
+        return {"room": f"room-{i % 500}", "role": "player", "action": "cheat", "ok": True, "reason": "cheated",
+                "payload": {"cheatType": "modify-hp", "data": {"target": "opponent", "delta": -3}}}
+    return {"room": f"room-{i % 500}", "role": "opponent", "action": "cursor", "ok": True, "reason": "cursor updated"}
+
+
+async def measure_async(log: AuditLog, n: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(n):
+        log.record("action", **sample(i))
+        if i % 1000 == 0:
+            # 実際のサーバーと同じく、ときどきイベントループへ制御を返す
+            await asyncio.sleep(0)
+    return time.perf_counter() - t0
+
+
+async def measure_sync(path: str, n: int) -> float:
+    t0 = time.perf_counter()
+    with open(path, "a", encoding="utf-8") as f:
+        for i in range(n):
+            f.write(json.dumps({"ts": time.time(), "event": "action", **sample(i)}, ensure_ascii=False) + "\n")
+            f.flush()
+            if i % 1000 == 0:
+                await asyncio.sleep(0)
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--records", type=int, default=200_000)
+    ap.add_argument("--max-queue", type=int, default=100_000)
+    ap.add_argument("--max-bytes", type=int, default=8 * 1024 * 1024, help="回す大きさ（ベンチ用に小さめ）")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # 記録する内容を作るだけの時間（以下の数字からこれを引いたものが記録のコスト）
+        off = AuditLog(os.path.join(tmp, "off.jsonl"))
+        off.enabled = False
+        base_s = asyncio.run(measure_async(off, args.records))
+        print(f"記録なし:      {base_s / args.records * 1e6:.2f}us/record")
+        sync_s = asyncio.run(measure_sync(os.path.join(tmp, "sync.jsonl"), args.records))
+        print(f"その場で書く:   {sync_s / args.records * 1e6:.2f}us/record")
+
+        log = AuditLog(os.path.join(tmp, "audit.jsonl"), max_queue=args.max_queue, max_bytes=args.max_bytes)
+        t0 = time.perf_counter()
+        loop_s = asyncio.run(measure_async(log, args.records))
+        log.close()
+        total = time.perf_counter() - t0
+        stats = log.stats()
+        print(
+            f"AuditLog:      {loop_s / args.records * 1e6:.2f}us/record（イベントループ側） "
+            f"書き終えるまで {total:.2f}s = {stats['written'] / total:,.0f} records/s"
+        )
+        print(
+            f"written={stats['written']} dropped={stats['dropped']} failed={stats['failed']} "
+            f"rotations={stats['rotations']} files={sorted(os.listdir(tmp))}"
+        )
+
+
+if __name__ == "__main__":
+    main()
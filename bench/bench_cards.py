@@ -0,0 +1,77 @@
+"""
+カードレジストリのベンチマーク (bench/bench_cards.py)
+
+N 枚（既定 10,000）のカードプールを一時ディレクトリに生成し、
+JSON / バイナリそれぞれの読み込み時間と、ID参照・コスト索引の速度を測る。
+比較として従来の線形探索 next((c for c in CARD_DB if c.id == card_id), None) も測る。
+
+使い方: python bench/bench_cards.py --cards 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cards import CardRegistry, build_bin, load_cards, load_json  # noqa: E402
+
+
+def timed(fn, repeat: int = 5):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cards", type=int, default=10_000)
+    ap.add_argument("--lookups", type=int, default=200_000)
+    args = ap.parse_args()
+
+    rnd = random.Random(0)
+    rows = [
+        {"id": i, "name": f"フォロワー{i:05d}", "cost": rnd.randint(0, 10),
+         "power": rnd.randint(0, 12), "toughness": rnd.randint(1, 12)}
+        for i in range(args.cards)
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "cards.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({"cards": rows}, f, ensure_ascii=False)
+
+        t_json, cards = timed(lambda: CardRegistry(load_json(json_path)))
+        bin_path = build_bin(json_path)
+        t_bin, reg = timed(lambda: CardRegistry(load_cards(bin_path)))
+        print(f"cards={args.cards} json={os.path.getsize(json_path)}B bin={os.path.getsize(bin_path)}B")
+        print(f"load+index  json {t_json * 1000:.2f} ms   bin {t_bin * 1000:.2f} ms")
+
+    ids = [rnd.randrange(args.cards) for _ in range(args.lookups)]
+    t_get, _ = timed(lambda: [reg.get(i) for i in ids], repeat=3)
+    print(f"registry.get      {t_get / len(ids) * 1e9:.0f} ns/lookup")
+
+    card_db = reg.cards
+    sample = ids[:2000]
+    t_scan, _ = timed(lambda: [next((c for c in card_db if c.id == i), None) for i in sample], repeat=1)
+    print(f"linear scan       {t_scan / len(sample) * 1e9:.0f} ns/lookup")
+
+    manas = [rnd.randint(0, 10) for _ in range(10_000)]
+    t_aff, _ = timed(lambda: [reg.affordable(m) for m in manas], repeat=3)
+    print(f"affordable(mana)  {t_aff / len(manas) * 1e6:.1f} us/query（結果リストのコピーを含む）")
+    t_cost, _ = timed(lambda: [reg.by_cost(m) for m in manas], repeat=3)
+    print(f"by_cost(cost)     {t_cost / len(manas) * 1e9:.0f} ns/query")
+
+
+if __name__ == "__main__":
+    main()
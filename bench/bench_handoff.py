@@ -0,0 +1,171 @@
+"""
+デプロイ時のルーム引き継ぎのベンチマーク (bench/bench_handoff.py)
+
+古いプロセスと新しいプロセス（IKASAMA_HANDOFF_LISTEN で受け取り待ち）を uvicorn で起動し、
+古い方に N ルームを作って各ルームに2人ずつ接続・対戦を開始させる。
+管理APIで drain を実行し、
+  - サーバー側: ルームごとの停止時間（ロック取得 → 新プロセスの確認応答）
+  - クライアント側: reconnect 受信 → 新プロセスで resumed な hello を受け取るまで
+を測る。再接続後に別の席になったクライアントがいれば数える。
+
+使い方: python bench/bench_handoff.py --rooms 3000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import websockets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN_TOKEN = "bench-token"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, **env: str) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env=dict(os.environ, IKASAMA_ADMIN_TOKEN=ADMIN_TOKEN, **env),
+    )
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("サーバーが起動しませんでした")
+
+
+def admin_post(port: int, path: str, body: dict) -> dict:
+    req = urllib.request.Request(
+        f"http://127.0.0.1:{port}{path}",
+        data=json.dumps(body).encode(),
+        headers={"Content-Type": "application/json", "X-Admin-Token": ADMIN_TOKEN},
+        method="POST",
+    )
+    with urllib.request.urlopen(req, timeout=600) as res:
+        return json.loads(res.read())
+
+
+def pct(values: list, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+class Client:
+    def __init__(self, old_port: int, new_port: int, room_id: str):
+        self.old_port = old_port
+        self.new_port = new_port
+        self.room_id = room_id
+        self.role = None
+        self.token = None
+        self.last_seq = 0
+        self.started = asyncio.Event()
+        self.reconnect_at = None
+        self.gap = None
+        self.same_role = None
+
+    async def run(self, done: asyncio.Event) -> None:
+        url = f"ws://127.0.0.1:{self.old_port}/ws/{self.room_id}?mode=join"
+        async with websockets.connect(url, max_queue=None, open_timeout=120) as ws:
+            hello = json.loads(await ws.recv())
+            self.role, self.token = hello["role"], hello["token"]
+            try:
+                # 数千接続ぶんの state/realtime を全部 JSON として読むとクライアント側が先に詰まるので、
+                # 必要なところだけ文字列で拾う（seq は末尾に付く）
+                async for raw in ws:
+                    pos = raw.rfind('"seq": ')
+                    if pos >= 0:
+                        self.last_seq = int(raw[pos + 7:-1])
+                    if '"type": "reconnect"' in raw:
+                        self.reconnect_at = time.perf_counter()
+                    elif not self.started.is_set() and '"started": true' in raw:
+                        self.started.set()
+            except websockets.ConnectionClosed:
+                pass
+        if self.reconnect_at is None:
+            return
+
+        url = (
+            f"ws://127.0.0.1:{self.new_port}/ws/{self.room_id}?mode=join"
+            f"&token={self.token}&last_seq={self.last_seq}"
+        )
+        async with websockets.connect(url, max_queue=None, open_timeout=120) as ws:
+            msg = json.loads(await ws.recv())
+            self.gap = time.perf_counter() - self.reconnect_at
+            self.same_role = msg["type"] == "hello" and msg.get("resumed") and msg["role"] == self.role
+            await done.wait()
+
+
+async def scenario(old_port: int, new_port: int, rooms: int, sock: str) -> None:
+    prefix = "handoff-"
+    admin_post(old_port, "/api/admin/rooms", {"count": rooms, "prefix": prefix})
+    clients = [Client(old_port, new_port, f"{prefix}{i // 2}") for i in range(rooms * 2)]
+    done = asyncio.Event()
+    tasks = []
+    # 一度に張りすぎないよう少しずつ接続する
+    for i in range(0, len(clients), 200):
+        tasks += [asyncio.create_task(c.run(done)) for c in clients[i:i + 200]]
+        await asyncio.sleep(0.2)
+    await asyncio.wait_for(asyncio.gather(*(c.started.wait() for c in clients)), 300)
+    print(f"live rooms={rooms} clients={len(clients)} 全ルーム対戦開始")
+
+    t0 = time.perf_counter()
+    result = await asyncio.to_thread(admin_post, old_port, "/api/admin/drain", {"socket": sock})
+    drain_total = time.perf_counter() - t0
+    print(f"drain: rooms={result['rooms']} total={drain_total * 1000:.0f}ms pause/room {result['pauseMs']}")
+
+    deadline = time.perf_counter() + 120
+    while any(c.gap is None for c in clients) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.1)
+    gaps = [c.gap * 1000 for c in clients if c.gap is not None]
+    moved = sum(1 for c in clients if c.same_role is False)
+    missing = sum(1 for c in clients if c.gap is None)
+    if gaps:
+        print(
+            f"client reconnect->resumed hello p50={statistics.median(gaps):.1f}ms "
+            f"p99={pct(gaps, 0.99):.1f}ms max={max(gaps):.1f}ms"
+        )
+    print(f"席が変わった={moved} 再接続できなかった={missing}")
+    done.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rooms", type=int, default=3000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sock = os.path.join(tmp, "handoff.sock")
+        old_port, new_port = free_port(), free_port()
+        new = start_server(new_port, IKASAMA_HANDOFF_LISTEN=sock)
+        old = start_server(old_port)
+        try:
+            asyncio.run(scenario(old_port, new_port, args.rooms, sock))
+        finally:
+            for proc in (old, new):
+                proc.terminate()
+                proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+重いルームの検出と間引きのベンチマーク (bench/bench_hot_rooms.py)
+
+server.app をプロセス内で直接呼び出し（bench/soak.py の InProcessWebSocket を使う）、
+--rooms 個の普通のルームと、イカサマ（手札追加）を --spam-rate 回/秒送り続ける重いルーム1つを動かす。
+普通のルームの操作に結果が返るまでの時間と、管理APIの重いルーム一覧（上位3件）を、
+間引きあり（IKASAMA_ROOM_CPU_BUDGET の既定値）・なし で比べる。
+最後に計測そのもの（with room.cpu:）のコストも出す。
+
+使い方: python bench/bench_hot_rooms.py --rooms 30 --seconds 15
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import server  # noqa: E402
+from roomcpu import RoomCpu  # noqa: E402
+from soak import InProcessWebSocket  # noqa: E402
+
+
+class Client:
+    """rid 付きで操作を送り、結果（ack か rid 付きの state）が返るまでの時間を記録する"""
+
+    def __init__(self, ws: InProcessWebSocket):
+        self.ws = ws
+        self.next_rid = 1
+        self.pending = {}
+        self.latencies = []
+        self.reader = asyncio.create_task(self._read())
+
+    async def _read(self) -> None:
+        try:
+            while True:
+                msg = await self.ws.recv()
+                rid = msg.get("rid")
+                if rid in self.pending:
+                    self.latencies.append(time.perf_counter() - self.pending.pop(rid))
+        except RuntimeError:
+            pass
+
+    async def send(self, action: str, payload: dict) -> None:
+        rid = self.next_rid
+        self.next_rid += 1
+        self.pending[rid] = time.perf_counter()
+        await self.ws.outbox.put({"type": "websocket.receive", "text": json.dumps(
+            {"type": "action", "action": action, "payload": payload, "rid": rid}
+        )})
+
+
+async def join(room_id: str) -> tuple:
+    a = InProcessWebSocket(server.app, f"/ws/{room_id}", "mode=create")
+    await a.connect()
+    await a.until("hello")
+    b = InProcessWebSocket(server.app, f"/ws/{room_id}", "mode=join")
+    await b.connect()
+    await b.until("hello")
+    return Client(a), Client(b)
+
+
+async def run(prefix: str, rooms: int, seconds: float, spam_rate: float) -> None:
+    normal = [await join(f"{prefix}-{i}") for i in range(rooms)]
+    hot = await join(f"{prefix}-hot")
+    stop = time.perf_counter() + seconds
+
+    async def play(pair: tuple) -> None:
+        # カーソルを 5回/秒、ターン終了を 1回/秒
+        n = 0
+        while time.perf_counter() < stop:
+            for c in pair:
+                await c.send("cursor", {"x": n % 800, "y": n % 600})
+            if n % 5 == 0:
+                for c in pair:
+                    await c.send("end-turn", {})
+            n += 1
+            await asyncio.sleep(0.2)
+
+    async def spam(pair: tuple) -> None:
+        interval = 1.0 / spam_rate
+        next_at = time.perf_counter()
+        while time.perf_counter() < stop:
+            await pair[0].send("cheat", {"cheatType": "add-own-hand", "data": {}})
+            next_at += interval
+            await asyncio.sleep(max(0.0, next_at - time.perf_counter()))
+
+    await asyncio.gather(spam(hot), *(play(pair) for pair in normal))
+    await asyncio.sleep(0.5)
+
+    latencies = sorted(lat * 1000 for pair in normal for c in pair for lat in c.latencies)
+    report = await server.admin_hot_rooms(3)
+    hot_room = server.ROOMS[f"{prefix}-hot"]
+    print(
+        f"  普通のルームの応答 n={len(latencies)} p50={statistics.median(latencies):.1f}ms "
+        f"p99={latencies[int(len(latencies) * 0.99)]:.1f}ms max={latencies[-1]:.1f}ms"
+    )
+    print(f"  重いルーム: 手札 {len(hot_room.state.player.hand)} 枚 処理できたイカサマ {len(hot[0].latencies)} 件")
+    budget = f"{report['budgetMs']}ms/{report['windowSec']}s" if server.ROOM_CPU_BUDGET <= 1 else "なし"
+    print(f"  重いルーム上位 (budget {budget}, throttled={report['throttled']}):")
+    for row in report["rooms"]:
+        print(f"    {row['roomId']:<16} {row['cpuMs']:9.1f}ms {row['loadPct']:6.2f}% throttled={row['throttled']}")
+
+    for pair in normal + [hot]:
+        for c in pair:
+            c.reader.cancel()
+            await c.ws.close()
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    server.TRACER.sample_rate = 0.0
+    await server.app.router.startup()
+    default_budget = server.ROOM_CPU_BUDGET
+    for label, budget in (("間引きなし", 1e9), ("間引きあり", default_budget)):
+        server.ROOM_CPU_BUDGET = budget
+        print(f"{label}:")
+        await run("off" if budget > 1 else "on", args.rooms, args.seconds, args.spam_rate)
+    await server.app.router.shutdown()
+
+    cpu = RoomCpu()
+    n = 200_000
+    t0 = time.perf_counter()
+    for _ in range(n):
+        with cpu:
+            pass
+    print(f"計測のコスト: {(time.perf_counter() - t0) / n * 1e6:.2f}us / 区間")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rooms", type=int, default=30)
+    ap.add_argument("--seconds", type=float, default=15.0)
+    ap.add_argument("--spam-rate", type=float, default=200.0, help="重いルームが送るイカサマの回数/秒")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server.ARCHIVE.path = os.path.join(tmp, "matches.ikab")
+        server.RESULTS.path = os.path.join(tmp, "results.sqlite3")
+        server.AUDIT.path = os.path.join(tmp, "audit.jsonl")
+        asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
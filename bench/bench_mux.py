@@ -0,0 +1,172 @@
+"""
+複数ルーム観戦の接続方式の比較 (bench/bench_mux.py)
+
+uvicorn でサーバーを起動し、--rooms 個のルームに2人ずつ接続して対戦を始めさせたあと、
+--watchers 人の観戦ボットが全ルームを見る。
+  - per-room: ルームごとに /ws/{room_id}?mode=watch を張る（watchers × rooms 本）
+  - mux:      1人1本の /mux/ws で全ルームを subscribe する（watchers 本）
+それぞれで、全ルームの最初の state が揃うまでの時間、サーバーの RSS の増加、
+--seconds 秒間に受け取ったフレーム数を出す。
+
+使い方: python bench/bench_mux.py --rooms 100 --watchers 10
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import websockets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+    )
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("サーバーが起動しませんでした")
+
+
+def rss_kib(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+async def drain(ws) -> None:
+    try:
+        async for _ in ws:
+            pass
+    except websockets.ConnectionClosed:
+        pass
+
+
+async def players(port: int, rooms: int, stop: asyncio.Event) -> None:
+    async def pair(room_id: str) -> None:
+        base = f"ws://127.0.0.1:{port}/ws/{room_id}"
+        async with websockets.connect(f"{base}?mode=create", max_queue=None) as a, \
+                websockets.connect(f"{base}?mode=join", max_queue=None) as b:
+            tasks = [asyncio.create_task(drain(a)), asyncio.create_task(drain(b))]
+            await stop.wait()
+            for t in tasks:
+                t.cancel()
+
+    await asyncio.gather(*(pair(f"mux-bench-{i}") for i in range(rooms)))
+
+
+async def watch_per_room(port: int, rooms: int, counter: list, ready: asyncio.Event, stop: asyncio.Event) -> None:
+    remaining = rooms
+
+    async def one(room_id: str) -> None:
+        nonlocal remaining
+        url = f"ws://127.0.0.1:{port}/ws/{room_id}?mode=watch"
+        async with websockets.connect(url, max_queue=None, open_timeout=120) as ws:
+            first = True
+            async def read() -> None:
+                nonlocal remaining, first
+                async for raw in ws:
+                    counter[0] += 1
+                    if first and '"type": "state"' in raw:
+                        first = False
+                        remaining -= 1
+                        if remaining == 0:
+                            ready.set()
+            task = asyncio.create_task(read())
+            await stop.wait()
+            task.cancel()
+
+    await asyncio.gather(*(one(f"mux-bench-{i}") for i in range(rooms)))
+
+
+async def watch_mux(port: int, rooms: int, counter: list, ready: asyncio.Event, stop: asyncio.Event) -> None:
+    async with websockets.connect(f"ws://127.0.0.1:{port}/mux/ws", max_queue=None) as ws:
+        for i in range(rooms):
+            await ws.send(json.dumps({"type": "subscribe", "roomId": f"mux-bench-{i}"}))
+        pending = {f"mux-bench-{i}" for i in range(rooms)}
+
+        async def read() -> None:
+            async for raw in ws:
+                counter[0] += 1
+                if pending and '"frame": {"type": "state"' in raw:
+                    pending.discard(json.loads(raw)["roomId"])
+                    if not pending:
+                        ready.set()
+
+        task = asyncio.create_task(read())
+        await stop.wait()
+        task.cancel()
+
+
+async def scenario(port: int, pid: int, mode: str, rooms: int, watchers: int, seconds: float) -> None:
+    stop = asyncio.Event()
+    player_task = asyncio.create_task(players(port, rooms, stop))
+    await asyncio.sleep(2 + rooms / 100)
+
+    before = rss_kib(pid)
+    counter = [0]
+    readies = [asyncio.Event() for _ in range(watchers)]
+    watch = watch_mux if mode == "mux" else watch_per_room
+    t0 = time.perf_counter()
+    tasks = [asyncio.create_task(watch(port, rooms, counter, ev, stop)) for ev in readies]
+    await asyncio.wait_for(asyncio.gather(*(ev.wait() for ev in readies)), 300)
+    subscribed = time.perf_counter() - t0
+
+    counter[0] = 0
+    await asyncio.sleep(seconds)
+    frames = counter[0]
+    after = rss_kib(pid)
+    connections = watchers if mode == "mux" else watchers * rooms
+    print(
+        f"{mode:>8}: connections={connections} 全ルームの state まで {subscribed * 1000:.0f}ms "
+        f"RSS +{(after - before) / 1024:.1f} MiB frames/s={frames / seconds:.0f}"
+    )
+    stop.set()
+    await asyncio.gather(player_task, *tasks, return_exceptions=True)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rooms", type=int, default=100)
+    ap.add_argument("--watchers", type=int, default=10)
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--mode", choices=("per-room", "mux", "both"), default="both")
+    args = ap.parse_args()
+
+    modes = ("per-room", "mux") if args.mode == "both" else (args.mode,)
+    for mode in modes:
+        # 方式ごとにサーバーを起動し直して RSS を比べやすくする
+        port = free_port()
+        proc = start_server(port)
+        try:
+            asyncio.run(scenario(port, proc.pid, mode, args.rooms, args.watchers, args.seconds))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+ルーム一括作成 + 同時参加のベンチマーク (bench/bench_provision.py)
+
+別プロセスで uvicorn を起動し、管理APIでルームを一括作成したあと、
+N 本の WebSocket を同時に張って「接続開始 → hello 受信」までの時間を測る。
+--cold を付けるとルームを事前作成せず、mode=create で接続時にルームを作らせる（比較用）。
+
+使い方: python bench/bench_provision.py --joins 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+import websockets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN_TOKEN = "bench-token"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int) -> subprocess.Popen:
+    env = dict(os.environ, IKASAMA_ADMIN_TOKEN=ADMIN_TOKEN)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env=env,
+    )
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("サーバーが起動しませんでした")
+
+
+def provision(port: int, n_rooms: int, prefix: str) -> float:
+    body = json.dumps({"count": n_rooms, "prefix": prefix, "firstAttackRole": "player"}).encode()
+    req = urllib.request.Request(
+        f"http://127.0.0.1:{port}/api/admin/rooms",
+        data=body,
+        headers={"Content-Type": "application/json", "X-Admin-Token": ADMIN_TOKEN},
+        method="POST",
+    )
+    t0 = time.perf_counter()
+    with urllib.request.urlopen(req) as res:
+        created = json.loads(res.read())["created"]
+    elapsed = time.perf_counter() - t0
+    assert len(created) == n_rooms, created
+    return elapsed
+
+
+async def join(url: str, start: asyncio.Event, hold: asyncio.Event, latencies: list) -> None:
+    await start.wait()
+    t0 = time.perf_counter()
+    async with websockets.connect(url, max_queue=None) as ws:
+        while True:
+            msg = json.loads(await ws.recv())
+            if msg["type"] == "hello":
+                latencies.append(time.perf_counter() - t0)
+                break
+            if msg["type"] == "error":
+                raise RuntimeError(msg)
+        await hold.wait()
+
+
+def pct(values: list, p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def burst(port: int, joins: int, prefix: str, cold: bool) -> list:
+    mode = "create" if cold else "join"
+    start = asyncio.Event()
+    hold = asyncio.Event()
+    latencies: list = []
+    # 1ルームに2人ずつ入る
+    tasks = [
+        asyncio.create_task(join(f"ws://127.0.0.1:{port}/ws/{prefix}{i // 2}?mode={mode}", start, hold, latencies))
+        for i in range(joins)
+    ]
+    await asyncio.sleep(0.1)
+    start.set()
+    while len(latencies) < joins and not any(t.done() and t.exception() for t in tasks):
+        await asyncio.sleep(0.01)
+    hold.set()
+    await asyncio.gather(*tasks)
+    return latencies
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--joins", type=int, default=1000)
+    ap.add_argument("--cold", action="store_true", help="事前作成せず接続時にルームを作る")
+    args = ap.parse_args()
+
+    port = free_port()
+    proc = start_server(port)
+    try:
+        prefix = "bench-"
+        if not args.cold:
+            elapsed = provision(port, (args.joins + 1) // 2, prefix)
+            print(f"provision {(args.joins + 1) // 2} rooms: {elapsed * 1000:.1f} ms")
+        latencies = asyncio.run(burst(port, args.joins, prefix, args.cold))
+        ms = [x * 1000 for x in latencies]
+        print(
+            f"{'cold' if args.cold else 'provisioned'} joins={len(ms)} "
+            f"connect->hello p50={statistics.median(ms):.1f}ms p95={pct(ms, 0.95):.1f}ms "
+            f"p99={pct(ms, 0.99):.1f}ms max={max(ms):.1f}ms"
+        )
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+対戦結果ストアのベンチマーク (bench/bench_results.py)
+
+--matches 試合ぶんの結果（--players 人からランダムに2人）を record() し、
+  - 呼び出し側の record() 1回あたりの時間（イベントループが止まる時間）
+  - 書き込みスレッドが全件をコミットし終えるまでの時間（試合/秒）
+  - ランキング・履歴の取得時間（キャッシュなし / あり）
+を出す。
+
+使い方: python bench/bench_results.py --matches 100000 --players 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from results import MatchResult, ResultStore  # noqa: E402
+
+
+def timed(fn, repeat: int) -> float:
+    """1回あたりの平均（マイクロ秒）"""
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--matches", type=int, default=100_000)
+    ap.add_argument("--players", type=int, default=5000)
+    ap.add_argument("--queries", type=int, default=2000)
+    args = ap.parse_args()
+
+    rng = random.Random(42)
+    names = [f"player{i:05d}" for i in range(args.players)]
+    results = []
+    for i in range(args.matches):
+        a, b = rng.sample(names, 2)
+        results.append(MatchResult(
+            room_id=f"bench-{i}",
+            finished_at=1_700_000_000 + i,
+            duration=rng.uniform(60, 900),
+            winner=rng.choice(("player", "opponent", "player", "opponent", None)),
+            player=a,
+            opponent=b,
+            player_penalty=rng.randint(0, 2),
+            opponent_penalty=rng.randint(0, 2),
+            turns=rng.randint(1, 30),
+        ))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ResultStore(os.path.join(tmp, "results.sqlite3"))
+
+        t0 = time.perf_counter()
+        worst = 0.0
+        for r in results:
+            t = time.perf_counter()
+            store.record(r)
+            worst = max(worst, time.perf_counter() - t)
+        enqueued = time.perf_counter() - t0
+        store.flush()
+        total = time.perf_counter() - t0
+        print(
+            f"record: {enqueued / args.matches * 1e6:.2f}us/match (最大 {worst * 1e6:.0f}us) "
+            f"コミット完了まで {total:.2f}s = {args.matches / total:,.0f} matches/s "
+            f"batches={store.batches} failed={store.failed}"
+        )
+
+        sample = [rng.choice(names) for _ in range(args.queries)]
+        it = iter(sample * 2)
+        store.cache_size = 0
+        cold_board = timed(lambda: store.leaderboard(20), args.queries)
+        cold_history = timed(lambda: store.history(next(it), 20), args.queries)
+        store.cache_size = args.queries * 2
+        store.leaderboard(20)
+        for name in sample:
+            store.history(name, 20)
+        it = iter(sample * 2)
+        warm_board = timed(lambda: store.leaderboard(20), args.queries)
+        warm_history = timed(lambda: store.history(next(it), 20), args.queries)
+        print(f"leaderboard top20: {cold_board:.1f}us（キャッシュなし） {warm_board:.2f}us（キャッシュ）")
+        print(f"history 20件:      {cold_history:.1f}us（キャッシュなし） {warm_history:.2f}us（キャッシュ）")
+        top = store.leaderboard(3)
+        print("top3: " + ", ".join(f"{row['player']} {row['wins']}勝{row['losses']}敗" for row in top))
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
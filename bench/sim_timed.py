@@ -0,0 +1,150 @@
+"""
+仮想時計で対戦のタイマーを早回しするシミュレーション (bench/sim_timed.py)
+
+clock.VirtualClock に差し替えた上で server のルームを --rooms 個用意し（クライアントは繋がない）、
+  開始 → マリガン締め切り → イカサマ → 指摘（受付時間の内 / 外を交互に） → ターン切れを何周か
+を実時間を待たずに進める。最後に全ルームの状態のハッシュを出す。
+同じ引数・同じ --seed で2回続けて回し、ハッシュが一致すること（= タイマーまわりの挙動が決定的に再現できる）と、
+マリガン締め切り・指摘の受付時間・ターン切れがそれぞれ期待どおりの結果になったことを確かめる。
+外れたら FAIL を出して終了コード 1 で終わる。
+
+使い方: python bench/sim_timed.py --rooms 200 --seconds 600
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import rules  # noqa: E402
+import server  # noqa: E402
+from clock import VirtualClock, set_clock  # noqa: E402
+
+
+def expected_turns(elapsed: float) -> int:
+    """開始から elapsed 秒後の turnCount（ループは1秒ごとに tick し、マリガン締め切り後はターン切れだけで進む）"""
+    turn_elapsed = int(elapsed) - rules.MULLIGAN_SECONDS
+    return 1 + max(0, turn_elapsed // rules.TURN_SECONDS)
+
+
+async def run(args: argparse.Namespace) -> Tuple[str, List[str]]:
+    """1回ぶん回し、(状態のハッシュ, 期待と違った点の一覧) を返す"""
+    clock = VirtualClock()
+    set_clock(clock)
+    random.seed(args.seed)
+    server.TRACER.sample_rate = 0.0
+
+    ids = [f"sim-{i}" for i in range(args.rooms)]
+    server.provision_rooms([(room_id, "player") for room_id in ids])
+    rooms = [server.ROOMS[room_id] for room_id in ids]
+    results = []
+    problems: List[str] = []
+    first_hand = [c.id for c in rules.registry().cards[:3]]
+    second_hand = [c.id for c in rules.registry().cards[:4]]
+
+    async def act(room, role: str, action: str, payload: dict) -> None:
+        ok, reason = await room.handle_action(role, action, payload)
+        results.append((room.room_id, clock.time(), role, action, ok, reason))
+
+    for room in rooms:
+        await act(room, "player", "start", {})
+    # マリガンは選ばずに締め切らせる
+    await clock.advance(rules.MULLIGAN_SECONDS + 1)
+    for room in rooms:
+        s = room.state
+        if s.isMulliganPhase or s.turnCount != 1 or s.currentTurn != "player":
+            problems.append(f"{room.room_id}: マリガン締め切り後 isMulliganPhase={s.isMulliganPhase} "
+                            f"turnCount={s.turnCount} currentTurn={s.currentTurn}")
+        elif s.player.hand != first_hand or s.opponent.hand != second_hand:
+            problems.append(f"{room.room_id}: 選ばずに締め切ったのに手札が変わった")
+    for room in rooms:
+        await act(room, "player", "cheat", {"cheatType": "add-own-hand", "data": {}})
+    # 偶数ルームは受付時間内に、奇数ルームは受付時間が過ぎてから指摘する
+    await clock.advance(rules.ACCUSATION_WINDOW_SEC / 2)
+    for room in rooms[0::2]:
+        await act(room, "opponent", "accuse", {"index": 0})
+    await clock.advance(rules.ACCUSATION_WINDOW_SEC)
+    for room in rooms[1::2]:
+        await act(room, "opponent", "accuse", {"index": 0})
+    # 残りはターン切れで進める
+    await clock.advance(args.seconds)
+
+    for room in rooms:
+        await room.stop_loop()
+    for room in rooms:
+        s = room.state
+        turns = expected_turns(clock.time())
+        if s.isGameOver or s.turnCount != turns or s.currentTurn != ("player" if turns % 2 else "opponent"):
+            problems.append(f"{room.room_id}: ターン切れ後 turnCount={s.turnCount}（期待 {turns}） "
+                            f"currentTurn={s.currentTurn} isGameOver={s.isGameOver}")
+    accuse_ok = {r[0]: r[4] for r in results if r[3] == "accuse"}
+    for i, room in enumerate(rooms):
+        if accuse_ok.get(room.room_id) != (i % 2 == 0):
+            want = "成功" if i % 2 == 0 else "失敗"
+            problems.append(f"{room.room_id}: 指摘が{want}するはずが ok={accuse_ok.get(room.room_id)}")
+
+    digest = hashlib.sha256()
+    for room in rooms:
+        state = rules.state_to_dict(room.state)
+        digest.update(json.dumps(state, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    digest.update(json.dumps(results, ensure_ascii=False).encode("utf-8"))
+
+    turns = [room.state.turnCount for room in rooms]
+    accused = sum(1 for r in results if r[3] == "accuse" and r[4])
+    print(
+        f"rooms={len(rooms)} 仮想時間={clock.time():.0f}s 指摘成功={accused}/{len(rooms)} "
+        f"turnCount min={min(turns)} max={max(turns)}"
+    )
+
+    # 次の回に同じIDで用意し直せるよう、一覧から外してプールへ戻す
+    for room in rooms:
+        del server.ROOMS[room.room_id]
+        server.LOBBY.remove(room.room_id)
+        server.POOL.release(room)
+    return digest.hexdigest(), problems
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rooms", type=int, default=200)
+    ap.add_argument("--seconds", type=float, default=600, help="指摘のあとに進める仮想時間（秒）")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        server.ARCHIVE.path = os.path.join(tmp, "matches.ikab")
+        server.RESULTS.path = os.path.join(tmp, "results.sqlite3")
+        server.AUDIT.path = os.path.join(tmp, "audit.jsonl")
+        digests = []
+        problems: List[str] = []
+        for _ in range(2):
+            t0 = time.perf_counter()
+            digest, found = asyncio.run(run(args))
+            print(f"実時間 {time.perf_counter() - t0:.2f}s state hash {digest}")
+            digests.append(digest)
+            problems.extend(found)
+        server.RESULTS.close()
+        server.AUDIT.close()
+
+    if digests[0] != digests[1]:
+        problems.append("同じ seed で2回回したのにハッシュが一致しない")
+    for problem in problems[:20]:
+        print("  " + problem)
+    if problems:
+        print(f"FAIL（{len(problems)} 件）")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+ルームのライフサイクルを回し続けるソークテスト (bench/soak.py)
+
+server.app をプロセス内で直接呼び出し（ASGI の websocket スコープを自作する。ソケットは使わない）、
+「作成 → 参加 → 対戦 → 切断」を大量に繰り返す。--every 試合ごとに gc した上で
+tracemalloc とオブジェクト数のスナップショットを取り、ウォームアップ後の基準点から
+1試合あたりに残ったメモリが --max-bytes-per-match を超えたら終了コード1で失敗する。
+--abandon-every 試合に1回は決着前に2人とも切断させ、放置ルームの片付けも確かめる。
+
+使い方: python bench/soak.py --matches 20000 --concurrency 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import server  # noqa: E402
+
+# 残っていたらリークを疑う型
+WATCHED_TYPES = ("Room", "Session", "GameState", "PlayerState", "CheatLogItem", "WebSocket", "Task", "StateVersion", "LobbyEntry")
+
+
+class InProcessWebSocket:
+    """ASGI アプリへ直接つなぐ WebSocket クライアント"""
+
+    def __init__(self, app, path: str, query: str):
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.outbox: asyncio.Queue = asyncio.Queue()
+        scope = {
+            "type": "websocket",
+            "asgi": {"version": "3.0"},
+            "scheme": "ws",
+            "http_version": "1.1",
+            "path": path,
+            "raw_path": path.encode(),
+            "root_path": "",
+            "query_string": query.encode(),
+            "headers": [(b"host", b"soak")],
+            "client": ("127.0.0.1", 0),
+            "server": ("soak", 80),
+            "subprotocols": [],
+        }
+        self.task = asyncio.create_task(app(scope, self.outbox.get, self.inbox.put))
+
+    async def connect(self) -> None:
+        await self.outbox.put({"type": "websocket.connect"})
+        msg = await self.inbox.get()
+        if msg["type"] != "websocket.accept":
+            raise RuntimeError(f"接続できませんでした: {msg}")
+
+    async def recv(self) -> dict:
+        msg = await self.inbox.get()
+        if msg["type"] == "websocket.close":
+            raise RuntimeError("サーバーから切断されました")
+        return json.loads(msg["text"])
+
+    async def until(self, typ: str) -> dict:
+        while True:
+            msg = await self.recv()
+            if msg["type"] == typ:
+                return msg
+            if msg["type"] == "error":
+                raise RuntimeError(msg)
+
+    async def act(self, action: str, payload: dict) -> dict:
+        await self.outbox.put({"type": "websocket.receive", "text": json.dumps({"type": "action", "action": action, "payload": payload})})
+        return await self.until("ack")
+
+    async def close(self) -> None:
+        await self.outbox.put({"type": "websocket.disconnect", "code": 1000})
+        await self.task
+
+
+async def lifecycle(n: int, abandon: bool) -> None:
+    room_id = f"soak-{n}"
+    a = InProcessWebSocket(server.app, f"/ws/{room_id}", "mode=create")
+    await a.connect()
+    await a.until("hello")
+    b = InProcessWebSocket(server.app, f"/ws/{room_id}", "mode=join")
+    await b.connect()
+    await b.until("hello")
+
+    await a.act("mulligan", {"cardIndices": [0]})
+    await b.act("mulligan", {"cardIndices": []})
+    await a.act("cursor", {"x": 10, "y": 20, "cardId": 1})
+    await b.act("cursor", {"x": 30, "y": 40})
+    await a.act("play-card", {"handIndex": 0})
+    await a.act("end-turn", {})
+    await b.act("cheat", {"cheatType": "add-own-hand", "data": {}})
+    await a.act("accuse", {})
+    if not abandon:
+        await b.act("cheat", {"cheatType": "modify-hp", "data": {"target": "player", "delta": -100}})
+        await a.act("cheat", {"cheatType": "modify-hp", "data": {"target": "opponent", "delta": -100}})
+    await a.close()
+    await b.close()
+
+
+def object_counts() -> Counter:
+    counts: Counter = Counter()
+    for obj in gc.get_objects():
+        name = type(obj).__name__
+        if name in WATCHED_TYPES:
+            counts[name] += 1
+    return counts
+
+
+async def settle(grace: float) -> None:
+    # 放置ルームの片付け・キャンセルしたループの後始末を待ってから計測する
+    await asyncio.sleep(grace * 2 + 0.05)
+    server.ARCHIVE.flush()
+    gc.collect()
+
+
+async def run(args: argparse.Namespace) -> int:
+    server.RESUME_GRACE_SEC = args.grace
+    server.TRACER.sample_rate = 0.0
+    await server.app.router.startup()
+
+    sem = asyncio.Semaphore(args.concurrency)
+    done = 0
+    failures = 0
+
+    async def one(n: int) -> None:
+        nonlocal done, failures
+        async with sem:
+            try:
+                await lifecycle(n, args.abandon_every > 0 and n % args.abandon_every == 0)
+            except Exception as e:
+                failures += 1
+                if failures <= 5:
+                    print(f"match {n} 失敗: {e!r}")
+            done += 1
+
+    tracemalloc.start(args.frames)
+    baseline = None
+    baseline_done = 0
+    baseline_counts: Counter = Counter()
+    t0 = time.perf_counter()
+    for start in range(0, args.matches, args.every):
+        await asyncio.gather(*(one(n) for n in range(start, min(start + args.every, args.matches))))
+        await settle(args.grace)
+        snap = tracemalloc.take_snapshot()
+        counts = object_counts()
+        traced = sum(stat.size for stat in snap.statistics("filename"))
+        line = (
+            f"[{done:>7} matches {time.perf_counter() - t0:7.1f}s] traced={traced / 1024:9.1f} KiB "
+            f"rooms={len(server.ROOMS)} pool={len(server.POOL.free)} tasks={len(asyncio.all_tasks())} "
+            + " ".join(f"{k}={counts[k]}" for k in WATCHED_TYPES)
+        )
+        print(line)
+        # 最初の区間はプール・キャッシュが埋まるまでのウォームアップ
+        if baseline is None and done >= args.warmup:
+            baseline, baseline_done, baseline_counts = snap, done, counts
+            baseline_traced = traced
+
+    await server.app.router.shutdown()
+    tracemalloc.stop()
+
+    if baseline is None or done == baseline_done:
+        print("ウォームアップ後の試合がないため判定できません（--matches を増やしてください）")
+        return 1
+
+    matches = done - baseline_done
+    per_match = (traced - baseline_traced) / matches
+    print(f"\n基準点から {matches} 試合: 残留 {per_match:.1f} B/match（上限 {args.max_bytes_per_match} B）失敗 {failures}")
+    grown = {k: counts[k] - baseline_counts[k] for k in WATCHED_TYPES if counts[k] != baseline_counts[k]}
+    if grown:
+        print("オブジェクト数の増減: " + ", ".join(f"{k} {v:+d}" for k, v in grown.items()))
+    print(f"\n増加の大きい割り当て箇所 上位{args.top}:")
+    for stat in snap.compare_to(baseline, "traceback" if args.frames > 1 else "lineno")[:args.top]:
+        if stat.size_diff <= 0:
+            break
+        print(f"  {stat.size_diff / 1024:+9.1f} KiB {stat.count_diff:+7d} blocks  {stat.traceback.format()[-1].strip()}")
+
+    if failures or per_match > args.max_bytes_per_match:
+        print("FAIL")
+        return 1
+    print("OK")
+    return 0
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--matches", type=int, default=20_000)
+    ap.add_argument("--concurrency", type=int, default=50)
+    ap.add_argument("--every", type=int, default=1000, help="スナップショットを取る間隔（試合数）")
+    ap.add_argument("--warmup", type=int, default=2000, help="基準点を取るまでの試合数")
+    ap.add_argument("--abandon-every", type=int, default=10, help="N試合に1回、決着前に全員切断させる（0で無効）")
+    ap.add_argument("--grace", type=float, default=0.05, help="再接続の猶予（秒）。放置ルームの片付けを早めるため短くする")
+    ap.add_argument("--max-bytes-per-match", type=float, default=64.0)
+    ap.add_argument("--frames", type=int, default=1, help="tracemalloc で記録するスタックの深さ")
+    ap.add_argument("--top", type=int, default=10)
+    args = ap.parse_args()
+
+    # 対戦記録・対戦結果・監査ログは一時ファイルへ（本番の var/ を汚さない）
+    with tempfile.TemporaryDirectory() as tmp:
+        server.ARCHIVE.path = os.path.join(tmp, "matches.ikab")
+        server.RESULTS.path = os.path.join(tmp, "results.sqlite3")
+        server.AUDIT.path = os.path.join(tmp, "audit.jsonl")
+        sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
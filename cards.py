@@ -0,0 +1,202 @@
+"""
+カードレジストリ (cards.py)
+カード定義をデータファイルから読み込み、IDで引ける配列とコスト別の索引を作る。
+
+data/cards.json が元データ。起動を速くしたい場合は
+    python cards.py build [data/cards.json]
+で列指向のバイナリ（data/cards.bin）を作っておくと、JSONより新しければそちらを読む。
+
+    header  magic "IKCD", version u16, reserved u16, count u32
+    columns id i32, cost i16, power i16, toughness i16, name_end u32（名前blob内の終端位置）
+    names   UTF-8 を連結したもの
+"""
+
+from __future__ import annotations
+
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# =========================
+# 設定
+# =========================
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+CARDS_JSON = os.path.join(DATA_DIR, "cards.json")
+MAGIC = b"IKCD"
+VERSION = 1
+HEADER = struct.Struct("<4sHHI")
+
+
+@dataclass
+class Card:
+    id: int
+    name: str
+    cost: int
+    power: int
+    toughness: int
+
+
+class CardRegistry:
+    """
+    - cards: 読み込み順のカード一覧（従来の CARD_DB と同じ並び）
+    - get(id): ID添字の配列で O(1) 参照（IDが疎な場合は dict）
+    - by_cost(cost) / affordable(mana): コスト順の索引（AI・ドロー・「マナ以下で出せるカード」用）
+    """
+
+    def __init__(self, cards: Sequence[Card]):
+        self.cards: List[Card] = list(cards)
+        max_id = max((c.id for c in self.cards), default=-1)
+        self._index: Optional[List[Optional[Card]]] = None
+        self._sparse: Optional[Dict[int, Card]] = None
+        if 0 <= min((c.id for c in self.cards), default=0) and max_id < 4 * len(self.cards) + 16:
+            self._index = [None] * (max_id + 1)
+            for c in self.cards:
+                self._index[c.id] = c
+        else:
+            self._sparse = {c.id: c for c in self.cards}
+
+        # コスト昇順（同コストは読み込み順）
+        self._by_cost_order: List[Card] = sorted(self.cards, key=lambda c: c.cost)
+        self._costs: List[int] = [c.cost for c in self._by_cost_order]
+        groups: Dict[int, List[Card]] = {}
+        for c in self._by_cost_order:
+            groups.setdefault(c.cost, []).append(c)
+        self._cost_groups: Dict[int, Tuple[Card, ...]] = {cost: tuple(g) for cost, g in groups.items()}
+
+    def __len__(self) -> int:
+        return len(self.cards)
+
+    def __iter__(self) -> Iterator[Card]:
+        return iter(self.cards)
+
+    def get(self, card_id: int) -> Optional[Card]:
+        if self._index is not None:
+            if 0 <= card_id < len(self._index):
+                return self._index[card_id]
+            return None
+        return self._sparse.get(card_id)
+
+    def by_cost(self, cost: int) -> Tuple[Card, ...]:
+        return self._cost_groups.get(cost, ())
+
+    def affordable(self, mana: int) -> Sequence[Card]:
+        """コストが mana 以下のカード（コスト昇順）"""
+        return self._by_cost_order[:bisect_right(self._costs, mana)]
+
+    def min_cost(self) -> Optional[int]:
+        return self._costs[0] if self._costs else None
+
+
+# =========================
+# 読み込み・書き出し
+# =========================
+def load_json(path: str) -> List[Card]:
+    import json
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    rows = data["cards"] if isinstance(data, dict) else data
+    return [
+        Card(int(r["id"]), str(r["name"]), int(r["cost"]), int(r["power"]), int(r["toughness"]))
+        for r in rows
+    ]
+
+
+def encode_bin(cards: Sequence[Card]) -> bytes:
+    names = [c.name.encode("utf-8") for c in cards]
+    ends = array("I")
+    pos = 0
+    for n in names:
+        pos += len(n)
+        ends.append(pos)
+    cols = (
+        array("i", (c.id for c in cards)),
+        array("h", (c.cost for c in cards)),
+        array("h", (c.power for c in cards)),
+        array("h", (c.toughness for c in cards)),
+        ends,
+    )
+    if sys.byteorder != "little":
+        for col in cols:
+            col.byteswap()
+    return HEADER.pack(MAGIC, VERSION, 0, len(cards)) + b"".join(col.tobytes() for col in cols) + b"".join(names)
+
+
+def decode_bin(raw: bytes) -> List[Card]:
+    magic, version, _, n = HEADER.unpack_from(raw, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("カードデータ（バイナリ）の形式が不正です")
+    pos = HEADER.size
+    cols = []
+    for code in ("i", "h", "h", "h", "I"):
+        col = array(code)
+        size = col.itemsize * n
+        col.frombytes(raw[pos:pos + size])
+        if sys.byteorder != "little":
+            col.byteswap()
+        cols.append(col)
+        pos += size
+    ids, costs, powers, toughs, ends = cols
+    blob = raw[pos:]
+    cards: List[Card] = []
+    start = 0
+    for i in range(n):
+        end = ends[i]
+        cards.append(Card(ids[i], blob[start:end].decode("utf-8"), costs[i], powers[i], toughs[i]))
+        start = end
+    return cards
+
+
+def bin_path_for(json_path: str) -> str:
+    return os.path.splitext(json_path)[0] + ".bin"
+
+
+def load_cards(path: str = CARDS_JSON) -> List[Card]:
+    """JSON を読む。隣に新しいバイナリがあればそちらを使う"""
+    if path.endswith(".bin"):
+        with open(path, "rb") as f:
+            return decode_bin(f.read())
+    bin_path = bin_path_for(path)
+    try:
+        if os.path.getmtime(bin_path) >= os.path.getmtime(path):
+            with open(bin_path, "rb") as f:
+                return decode_bin(f.read())
+    except OSError:
+        pass
+    return load_json(path)
+
+
+def build_bin(json_path: str = CARDS_JSON) -> str:
+    out = bin_path_for(json_path)
+    with open(out, "wb") as f:
+        f.write(encode_bin(load_json(json_path)))
+    return out
+
+
+_REGISTRY: Optional[CardRegistry] = None
+
+
+def registry() -> CardRegistry:
+    """既定のカードレジストリ（初回アクセス時に読み込む）"""
+    global _REGISTRY
+    if _REGISTRY is None:
+        _REGISTRY = CardRegistry(load_cards())
+    return _REGISTRY
+
+
+def set_registry(reg: CardRegistry) -> None:
+    """テスト・ベンチマーク用に差し替える"""
+    global _REGISTRY
+    _REGISTRY = reg
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 2 and sys.argv[1] == "build":
+        print(build_bin(sys.argv[2] if len(sys.argv) > 2 else CARDS_JSON))
+    else:
+        print("使い方: python cards.py build [data/cards.json]")
@@ -0,0 +1,107 @@
+"""
+時計 (clock.py)
+ターン・マリガンのタイマー、イカサマの時刻、指摘の受付時間はすべてここから時刻を取る。
+本番は実時間の RealClock。テストやシミュレーションでは VirtualClock に差し替えると、
+予定された sleep の間を待たずに飛ばせるので、60秒のターン切れも一瞬で・毎回同じ順序で再現できる。
+
+    clock = VirtualClock()
+    set_clock(clock)
+    ...（ルームを作ってループを起動する）
+    await clock.advance(90)   # 90秒ぶんのティックを順に起こす
+
+rules.py からも import するので、asyncio は使う関数の中で import する。
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import time
+from typing import TYPE_CHECKING, List, Tuple, Union
+
+if TYPE_CHECKING:
+    import asyncio
+
+
+class RealClock:
+    def time(self) -> float:
+        """壁時計（記録・表示用のタイムスタンプ）"""
+        return time.time()
+
+    def monotonic(self) -> float:
+        """間隔を測る用"""
+        return time.monotonic()
+
+    async def sleep(self, seconds: float) -> None:
+        import asyncio
+
+        await asyncio.sleep(seconds)
+
+
+class VirtualClock:
+    """
+    advance() を呼んだときだけ進む時計。
+    sleep() は予定時刻を登録して待ち、advance() が予定時刻の順（同時刻なら登録順）に1つずつ起こす。
+    起こすたびにイベントループへ settle 回だけ制御を返し、起きた側が次の sleep を登録するのを待つ
+    （sleep の間に実際のI/Oを待つ処理があると順序は保証できない）。
+    """
+
+    def __init__(self, start: float = 0.0, settle: int = 8):
+        self._now = start
+        self.settle = settle
+        self._waiters: List[Tuple[float, int, asyncio.Future]] = []
+        self._order = itertools.count()
+
+    def time(self) -> float:
+        return self._now
+
+    def monotonic(self) -> float:
+        return self._now
+
+    async def sleep(self, seconds: float) -> None:
+        import asyncio
+
+        if seconds <= 0:
+            await asyncio.sleep(0)
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (self._now + seconds, next(self._order), fut))
+        await fut
+
+    def pending(self) -> int:
+        return sum(1 for _, _, fut in self._waiters if not fut.done())
+
+    async def _settle(self) -> None:
+        import asyncio
+
+        for _ in range(self.settle):
+            await asyncio.sleep(0)
+
+    async def advance(self, seconds: float) -> None:
+        """seconds だけ進める。途中に予定された sleep は時刻順に起こす"""
+        target = self._now + seconds
+        await self._settle()
+        while self._waiters and self._waiters[0][0] <= target:
+            deadline, _, fut = heapq.heappop(self._waiters)
+            if fut.done():  # キャンセル済み
+                continue
+            self._now = max(self._now, deadline)
+            fut.set_result(None)
+            await self._settle()
+        self._now = target
+
+
+Clock = Union[RealClock, VirtualClock]
+
+_CLOCK: Clock = RealClock()
+
+
+def get_clock() -> Clock:
+    """現在の時計（既定は実時間）"""
+    return _CLOCK
+
+
+def set_clock(clock: Clock) -> None:
+    """テスト・シミュレーション用に差し替える"""
+    global _CLOCK
+    _CLOCK = clock
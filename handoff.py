@@ -0,0 +1,214 @@
+"""
+プロセス間のルーム引き継ぎ (handoff.py)
+デプロイ時に、古いプロセスから新しいプロセスへ対戦中のルームを unix ソケット経由で渡す。
+このモジュールは受け渡しの手順（フレームの送受信と確認応答）だけを扱い、
+ルームの中身の書き出し・復元は呼び出し側（server.py）が行う。
+
+    フレーム: 長さ u32 (big endian) + JSON
+    ルームごとに2段階で渡す（両方のプロセスで同じルームが動かないように）:
+      送信側 {"type": "room", "room": {...}}  → 受信側 復元だけして {"type": "ready", "roomId": ...}
+                                                （断るときは {"type": "error", "roomId": ..., "error": ...}）
+      送信側 {"type": "commit", "roomId": ...} → 受信側 登録して動かし始め {"type": "ack", "roomId": ...}
+      送信側 {"type": "abort", "roomId": ...}  → 受信側 復元したものを捨てて {"type": "aborted", "roomId": ...}
+    送信側 {"type": "end"} → 受信側 {"type": "ack"}
+    commit を受け取る前に接続が切れたら、受信側は復元したものを捨てる。
+    送信側は commit を送った後は（確認応答が来なくても）手元でそのルームを再開しない。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import struct
+from typing import Any, Callable, Dict, Optional
+
+
+# =========================
+# 設定
+# =========================
+FRAME = struct.Struct(">I")
+MAX_FRAME = 16 * 1024 * 1024
+ACK_TIMEOUT = 5.0   # 1ルームの確認応答を待つ上限（秒）
+
+
+class HandoffError(Exception):
+    """
+    接続できた後の引き継ぎの失敗（相手の復元失敗・切断・確認応答のタイムアウト）。
+    resumable: 相手がそのルームを動かしていないと確かめられた（断られた・abort が確認された）。
+    偽なら相手で動いているかもしれないので、送信側はそのルームを再開してはいけない
+    """
+
+    def __init__(self, message: str, resumable: bool):
+        super().__init__(message)
+        self.resumable = resumable
+
+
+async def write_frame(writer: asyncio.StreamWriter, obj: Dict[str, Any]) -> None:
+    body = json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    writer.write(FRAME.pack(len(body)) + body)
+    await writer.drain()
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+    """相手が閉じていれば None"""
+    try:
+        head = await reader.readexactly(FRAME.size)
+    except asyncio.IncompleteReadError:
+        return None
+    (size,) = FRAME.unpack(head)
+    if size > MAX_FRAME:
+        raise ValueError(f"引き継ぎフレームが大きすぎます: {size}")
+    return json.loads(await reader.readexactly(size))
+
+
+class HandoffReceiver:
+    """
+    新しいプロセス側。受け取ったルームを prepare で復元し（まだ動かさない）、
+    commit が来たら commit で登録・開始する。abort か切断なら discard で捨てる
+    """
+
+    def __init__(
+        self,
+        path: str,
+        prepare: Callable[[Dict[str, Any]], Any],
+        commit: Callable[[Any], None],
+        discard: Callable[[Any], None],
+    ):
+        self.path = path
+        self.prepare = prepare
+        self.commit = commit
+        self.discard = discard
+        self.received = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        pending: Dict[str, Any] = {}  # roomId -> prepare の戻り値（commit 待ち）
+        try:
+            while True:
+                frame = await read_frame(reader)
+                if frame is None:
+                    break
+                typ = frame.get("type")
+                if typ == "end":
+                    await write_frame(writer, {"type": "ack"})
+                    break
+                if typ == "room":
+                    room_id = frame["room"].get("roomId")
+                    try:
+                        if room_id in pending:
+                            raise ValueError(f"同じルームを二重に受け取りました: {room_id}")
+                        pending[room_id] = self.prepare(frame["room"])
+                    except Exception as e:
+                        # 断った。送信側はこのルームを手元で続ける
+                        await write_frame(writer, {"type": "error", "roomId": room_id, "error": repr(e)})
+                        continue
+                    await write_frame(writer, {"type": "ready", "roomId": room_id})
+                elif typ == "commit":
+                    room_id = frame.get("roomId")
+                    prepared = pending.pop(room_id, None)
+                    if prepared is None:
+                        await write_frame(writer, {"type": "error", "roomId": room_id, "error": "prepare されていません"})
+                        continue
+                    try:
+                        self.commit(prepared)
+                    except Exception as e:
+                        self.discard(prepared)
+                        await write_frame(writer, {"type": "error", "roomId": room_id, "error": repr(e)})
+                        continue
+                    self.received += 1
+                    await write_frame(writer, {"type": "ack", "roomId": room_id})
+                elif typ == "abort":
+                    room_id = frame.get("roomId")
+                    prepared = pending.pop(room_id, None)
+                    if prepared is not None:
+                        self.discard(prepared)
+                    await write_frame(writer, {"type": "aborted", "roomId": room_id})
+        finally:
+            # commit されなかったものは動かさない
+            for prepared in pending.values():
+                self.discard(prepared)
+            writer.close()
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class HandoffSender:
+    """古いプロセス側。1ルームずつ送り、相手が登録し終えるまで待つ"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.sent = 0
+
+    @classmethod
+    async def connect(cls, path: str) -> "HandoffSender":
+        reader, writer = await asyncio.open_unix_connection(path)
+        return cls(reader, writer)
+
+    async def _request(self, frame: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """1フレーム送って応答を待つ。切断・タイムアウト・壊れた応答は HandoffError（resumable は呼び出し側で決める）"""
+        try:
+            await write_frame(self.writer, frame)
+            return await asyncio.wait_for(read_frame(self.reader), ACK_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise HandoffError("確認応答がタイムアウトしました", resumable=False) from None
+        except (OSError, ValueError) as e:
+            raise HandoffError(f"送受信に失敗しました: {e!r}", resumable=False) from e
+
+    async def send_room(self, room: Dict[str, Any]) -> None:
+        """
+        渡し終えたら（相手が commit を確認したら）戻る。失敗は HandoffError で、
+        e.resumable が真のときだけ手元でそのルームを続けてよい
+        """
+        room_id = room["roomId"]
+        try:
+            reply = await self._request({"type": "room", "room": room})
+        except HandoffError as e:
+            # 相手が復元したかわからないので、明示的に取り消してもらう
+            raise await self._abort(room_id, str(e)) from e
+        if reply is not None and reply.get("type") == "error":
+            raise HandoffError(f"{room_id}: 引き継ぎ先で復元に失敗しました: {reply.get('error')}", resumable=True)
+        if reply is None or reply.get("type") != "ready" or reply.get("roomId") != room_id:
+            raise await self._abort(room_id, f"確認応答が不正です: {reply}")
+
+        # ここから先は相手で動き始めているかもしれないので、失敗しても再開させない
+        try:
+            reply = await self._request({"type": "commit", "roomId": room_id})
+        except HandoffError as e:
+            raise HandoffError(f"{room_id}: commit の確認応答がありません: {e}", resumable=False) from e
+        if reply is not None and reply.get("type") == "error":
+            raise HandoffError(f"{room_id}: 引き継ぎ先で登録に失敗しました: {reply.get('error')}", resumable=True)
+        if reply is None or reply.get("type") != "ack" or reply.get("roomId") != room_id:
+            raise HandoffError(f"{room_id}: commit の確認応答が不正です: {reply}", resumable=False)
+        self.sent += 1
+
+    async def _abort(self, room_id: str, reason: str) -> HandoffError:
+        """abort を送り、相手が取り消しを確認したら resumable な失敗にする"""
+        try:
+            reply = await self._request({"type": "abort", "roomId": room_id})
+        except HandoffError:
+            reply = None
+        aborted = reply is not None and reply.get("type") == "aborted" and reply.get("roomId") == room_id
+        return HandoffError(f"{room_id}: {reason}", resumable=aborted)
+
+    def abort(self) -> None:
+        """途中で失敗したとき。終わりの合図は送らずに閉じる"""
+        self.writer.close()
+
+    async def finish(self) -> None:
+        try:
+            await write_frame(self.writer, {"type": "end"})
+            await asyncio.wait_for(read_frame(self.reader), ACK_TIMEOUT)
+        finally:
+            self.writer.close()
@@ -0,0 +1,188 @@
+"""
+ロビー一覧の索引 (lobby.py)
+参加できるルーム・観戦できるルームの一覧を、ルーム側の変化（参加・退出・開始・終了）のたびに
+差分で更新しておく。一覧の取得は ROOMS を走査せず、絞り込みごとの連結リストを
+カーソル位置からたどるので、ページの大きさに比例した時間で返せる。
+変化は購読者（/lobby/ws）のキューへも流す。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+
+# =========================
+# 設定
+# =========================
+WAITING = "waiting"            # 開始前で席が空いている
+IN_PROGRESS = "in_progress"    # 対戦中
+SPECTATABLE = "spectatable"    # 対戦中で観戦枠が空いている
+ALL = "all"
+FILTERS = (ALL, WAITING, IN_PROGRESS, SPECTATABLE)
+
+PAGE_LIMIT = 100               # 1ページの上限
+FEED_QUEUE_SIZE = 256          # 購読者ごとに溜める変化の上限（溢れたら resync を送る）
+
+
+@dataclass(frozen=True)
+class LobbyEntry:
+    room_id: str
+    status: str
+    players: int
+    spectators: int
+    updated_at: float
+
+    def view(self) -> Dict[str, Any]:
+        return {
+            "roomId": self.room_id,
+            "status": self.status,
+            "players": self.players,
+            "spectators": self.spectators,
+            "updatedAt": self.updated_at,
+        }
+
+
+class _Bucket:
+    """追加順の双方向連結リスト（room_id をキーにした dict で前後をたどる）"""
+
+    def __init__(self) -> None:
+        self.head: Optional[str] = None
+        self.tail: Optional[str] = None
+        self.prev: Dict[str, Optional[str]] = {}
+        self.next: Dict[str, Optional[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.next)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.next
+
+    def append(self, key: str) -> None:
+        self.prev[key] = self.tail
+        self.next[key] = None
+        if self.tail is None:
+            self.head = key
+        else:
+            self.next[self.tail] = key
+        self.tail = key
+
+    def remove(self, key: str) -> None:
+        p = self.prev.pop(key)
+        n = self.next.pop(key)
+        if p is None:
+            self.head = n
+        else:
+            self.next[p] = n
+        if n is None:
+            self.tail = p
+        else:
+            self.prev[n] = p
+
+    def page(self, after: Optional[str], limit: int) -> List[str]:
+        key = self.head if after is None else self.next[after]
+        out: List[str] = []
+        while key is not None and len(out) < limit:
+            out.append(key)
+            key = self.next[key]
+        return out
+
+
+class LobbySubscriber:
+    def __init__(self, filter_name: str):
+        self.filter = filter_name
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=FEED_QUEUE_SIZE)
+
+    def push(self, event: Dict[str, Any]) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # 読むのが遅い購読者には差分をあきらめて取り直してもらう
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"op": "resync"})
+
+
+class LobbyIndex:
+    def __init__(self, max_spectators: int):
+        self.max_spectators = max_spectators
+        self.entries: Dict[str, LobbyEntry] = {}
+        self.buckets: Dict[str, _Bucket] = {name: _Bucket() for name in FILTERS}
+        self.subscribers: List[LobbySubscriber] = []
+
+    def _tags(self, entry: Optional[LobbyEntry]) -> FrozenSet[str]:
+        if entry is None:
+            return frozenset()
+        if entry.status == IN_PROGRESS and entry.spectators < self.max_spectators:
+            return frozenset((ALL, IN_PROGRESS, SPECTATABLE))
+        return frozenset((ALL, entry.status))
+
+    # ----- 更新（ルーム側から呼ぶ。await しないのでロック内から呼んでよい） -----
+    def update(self, room_id: str, status: Optional[str], players: int = 0, spectators: int = 0) -> None:
+        """status=None ならロビーから外す（終了・片付け済み）"""
+        old = self.entries.get(room_id)
+        if status is None:
+            new = None
+        else:
+            if old is not None and (old.status, old.players, old.spectators) == (status, players, spectators):
+                return
+            new = LobbyEntry(room_id, status, players, spectators, time.time())
+        if old is None and new is None:
+            return
+
+        old_tags, new_tags = self._tags(old), self._tags(new)
+        for tag in old_tags - new_tags:
+            self.buckets[tag].remove(room_id)
+        for tag in new_tags - old_tags:
+            self.buckets[tag].append(room_id)
+        if new is None:
+            del self.entries[room_id]
+        else:
+            self.entries[room_id] = new
+        self._publish(room_id, new, old_tags, new_tags)
+
+    def remove(self, room_id: str) -> None:
+        self.update(room_id, None)
+
+    def _publish(self, room_id: str, entry: Optional[LobbyEntry],
+                 old_tags: FrozenSet[str], new_tags: FrozenSet[str]) -> None:
+        if not self.subscribers:
+            return
+        view = entry.view() if entry is not None else {"roomId": room_id}
+        upsert = {"op": "upsert", "room": view}
+        remove = {"op": "remove", "room": {"roomId": room_id}}
+        for sub in self.subscribers:
+            # 絞り込みに入った・残った → upsert、外れた → remove、無関係なら送らない
+            if sub.filter in new_tags:
+                sub.push(upsert)
+            elif sub.filter in old_tags:
+                sub.push(remove)
+
+    # ----- 取得 -----
+    def query(self, filter_name: str = ALL, cursor: Optional[str] = None,
+              limit: int = 20) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        戻り値: (ルーム一覧, 次ページのカーソル)。
+        カーソルのルームが絞り込みから外れていたら KeyError（最初から取り直してもらう）
+        """
+        bucket = self.buckets[filter_name]
+        if cursor is not None and cursor not in bucket:
+            raise KeyError(cursor)
+        keys = bucket.page(cursor, max(1, min(limit, PAGE_LIMIT)))
+        next_cursor = keys[-1] if keys and bucket.next[keys[-1]] is not None else None
+        return [self.entries[k].view() for k in keys], next_cursor
+
+    def counts(self) -> Dict[str, int]:
+        return {name: len(b) for name, b in self.buckets.items()}
+
+    # ----- 購読 -----
+    def subscribe(self, filter_name: str = ALL) -> LobbySubscriber:
+        sub = LobbySubscriber(filter_name)
+        self.subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: LobbySubscriber) -> None:
+        if sub in self.subscribers:
+            self.subscribers.remove(sub)
@@ -0,0 +1,82 @@
+"""
+1本の WebSocket で複数ルームを観戦する (mux.py)
+大会のダッシュボードや実況・監視用のボットが何十ルームも見るときに、ルームごとに接続を張らなくて済むようにする。
+
+ルームから見ると MuxChannel は観戦者のソケットの1つ（Room.clients に spectator として入る）。
+send_text は送らずに、接続ごとに1本のキューへ roomId を付けたフレームを積むだけなので、
+ブロードキャストが遅い観戦者の送信を待つことはない。キューは接続ごとの書き込みタスクが順に送る。
+
+    クライアント → {"type": "subscribe", "roomId": "..."} / {"type": "unsubscribe", "roomId": "..."}
+    サーバー → {"roomId": "...", "frame": {...}}  （frame は /ws/{room_id} で届くものと同じ）
+              {"type": "unsubscribed", "roomId": "...", "reason": "..."}
+              {"type": "resync"}  （キューが溢れた。購読中のルームを subscribe し直す）
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, Dict, Optional
+
+
+# =========================
+# 設定
+# =========================
+MUX_QUEUE_SIZE = 1024     # 接続ごとに溜めるフレームの上限（溢れたら resync を送る）
+MUX_MAX_ROOMS = 200       # 1接続で購読できるルーム数の上限
+
+
+class MuxChannel:
+    """1つのルームへの購読。ルームからは観戦者のソケットとして扱われる"""
+
+    def __init__(self, conn: "MuxConnection", room_id: str):
+        self.conn = conn
+        self.room_id = room_id
+        self.room: Any = None  # 購読先の Room（server.py が設定する）
+        # フレーム本体は組み立て直さず、前後に roomId の包みを足すだけにする
+        self._prefix = '{"roomId": ' + json.dumps(room_id, ensure_ascii=False) + ', "frame": '
+
+    async def send_text(self, text: str) -> None:
+        if self.conn.channels.get(self.room_id) is not self:
+            # 購読解除済み（ルーム側はこれで観戦者から外す）
+            raise ConnectionError(f"購読していません: {self.room_id}")
+        self.conn.push(self._prefix + text + "}")
+
+    async def close(self, code: int = 1000) -> None:
+        """ルーム側から切られた（引き継ぎで移動した等）。接続自体は閉じない"""
+        self.conn.detach(self, reason="closed", code=code)
+
+
+class MuxConnection:
+    def __init__(self) -> None:
+        self.channels: Dict[str, MuxChannel] = {}  # room_id -> 購読
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=MUX_QUEUE_SIZE)
+        self.dropped = 0  # 溢れて捨てたフレーム数
+
+    def push(self, text: str) -> None:
+        try:
+            self.queue.put_nowait(text)
+        except asyncio.QueueFull:
+            # 読むのが遅い接続には差分をあきらめて取り直してもらう
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.queue.put_nowait(json.dumps({"type": "resync"}))
+
+    def attach(self, room_id: str) -> Optional[MuxChannel]:
+        """新しい購読を作る。上限に達していれば None"""
+        if room_id not in self.channels and len(self.channels) >= MUX_MAX_ROOMS:
+            return None
+        channel = MuxChannel(self, room_id)
+        self.channels[room_id] = channel
+        return channel
+
+    def detach(self, channel: MuxChannel, reason: str, code: Optional[int] = None) -> bool:
+        if self.channels.get(channel.room_id) is not channel:
+            return False
+        del self.channels[channel.room_id]
+        notice: Dict[str, object] = {"type": "unsubscribed", "roomId": channel.room_id, "reason": reason}
+        if code is not None:
+            notice["code"] = code
+        self.push(json.dumps(notice, ensure_ascii=False))
+        return True
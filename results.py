@@ -0,0 +1,341 @@
+"""
+対戦結果の保存とランキング (results.py)
+終了した対戦の勝敗・ペナルティ・対戦時間を SQLite（WAL）に記録し、プレイヤーごとの戦績と
+ランキングを返す。
+
+record() はキューに積むだけで、書き込みは別スレッドがまとめて1トランザクションで行う（write-behind）。
+イベントループは SQLite の commit を待たない。そのかわり記録が読み出しに反映されるのは
+次のフラッシュ（最長 FLUSH_INTERVAL 秒後）になる。
+読み出しは索引を引くクエリだけで、結果は LRU キャッシュに置き、書き込みのたびに古くなったものだけ捨てる。
+
+    matches        1試合1行
+    player_results プレイヤー×試合（履歴。player, finished_at の索引）
+    players        プレイヤーごとの集計（勝敗数。ランキングの索引）
+
+使い方: python results.py var/results.sqlite3
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+# =========================
+# 設定
+# =========================
+BATCH_SIZE = 1000         # この数たまったら書き出す
+FLUSH_INTERVAL = 1.0      # これだけ経ったら数に満たなくても書き出す（秒）
+CACHE_SIZE = 1024         # 読み出し結果をキャッシュしておく件数
+LIMIT_MAX = 100           # ランキング・履歴の1回の上限
+NAME_MAX = 24             # プレイヤー名の最大文字数
+
+WIN, LOSS, DRAW = "win", "loss", "draw"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY,
+    room_id TEXT NOT NULL,
+    finished_at REAL NOT NULL,
+    duration REAL NOT NULL,
+    winner TEXT,
+    player TEXT,
+    opponent TEXT,
+    player_penalty INTEGER NOT NULL,
+    opponent_penalty INTEGER NOT NULL,
+    turns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS player_results (
+    player TEXT NOT NULL,
+    match_id INTEGER NOT NULL REFERENCES matches(id),
+    finished_at REAL NOT NULL,
+    role TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    penalty INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_player_results_player ON player_results(player, finished_at DESC);
+CREATE TABLE IF NOT EXISTS players (
+    player TEXT PRIMARY KEY,
+    wins INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    draws INTEGER NOT NULL DEFAULT 0,
+    penalties INTEGER NOT NULL DEFAULT 0,
+    last_played_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_players_rank ON players(wins DESC, losses ASC, player);
+"""
+
+UPSERT_PLAYER = """
+INSERT INTO players (player, wins, losses, draws, penalties, last_played_at) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT(player) DO UPDATE SET
+    wins = wins + excluded.wins,
+    losses = losses + excluded.losses,
+    draws = draws + excluded.draws,
+    penalties = penalties + excluded.penalties,
+    last_played_at = max(last_played_at, excluded.last_played_at)
+"""
+
+
+def clean_name(name: Optional[str]) -> Optional[str]:
+    """プレイヤー名を整える（空なら名無し = 戦績に残さない）"""
+    if name is None:
+        return None
+    name = name.strip()[:NAME_MAX]
+    return name or None
+
+
+@dataclass(frozen=True)
+class MatchResult:
+    room_id: str
+    finished_at: float
+    duration: float
+    winner: Optional[str]               # "player" / "opponent" / None（引き分け）
+    player: Optional[str]               # 各席のプレイヤー名（名無しなら None）
+    opponent: Optional[str]
+    player_penalty: int
+    opponent_penalty: int
+    turns: int
+
+    def outcomes(self) -> List[Tuple[str, str, str, int]]:
+        """名前のある席ごとの (名前, role, 結果, ペナルティ)"""
+        out = []
+        for role, name, penalty in (("player", self.player, self.player_penalty),
+                                    ("opponent", self.opponent, self.opponent_penalty)):
+            if name is None:
+                continue
+            if self.winner is None:
+                outcome = DRAW
+            else:
+                outcome = WIN if self.winner == role else LOSS
+            out.append((name, role, outcome, penalty))
+        return out
+
+
+# キューに積むもの: 結果 / フラッシュ完了の通知先 / 停止（None）
+_Item = Union[MatchResult, threading.Event, None]
+
+
+class ResultStore:
+    def __init__(self, path: str, batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL, cache_size: int = CACHE_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.cache_size = cache_size
+        self._queue: "queue.SimpleQueue[_Item]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._reader: Optional[sqlite3.Connection] = None
+        # 書き込みのたびに進める世代。キャッシュはこれより古ければ取り直す
+        self._generation = 0
+        self._player_generation: Dict[str, int] = {}
+        self._cache: "OrderedDict[Tuple, Tuple[int, Any]]" = OrderedDict()
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+
+    # ----- 書き込み（イベントループから呼ぶ。待たない） -----
+    def record(self, result: MatchResult) -> None:
+        self._ensure_thread()
+        self._queue.put(result)
+
+    def flush(self) -> None:
+        """積んである結果を書き終えるまで待つ（終了時・ベンチ用。イベントループからは呼ばない）"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def close(self) -> None:
+        """残りを書き出してスレッドを止める"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._thread = None
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+                self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        # WAL なら NORMAL でも壊れない（電源断で直近のコミットを失うことはある）
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(SCHEMA)
+        return db
+
+    def _run(self) -> None:
+        db = self._connect()
+        batch: List[MatchResult] = []
+        deadline = time.monotonic() + self.flush_interval
+        try:
+            while True:
+                try:
+                    item: _Item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    self._write(db, batch)
+                    batch = []
+                    deadline = time.monotonic() + self.flush_interval
+                    continue
+                if isinstance(item, MatchResult):
+                    batch.append(item)
+                    if len(batch) < self.batch_size and time.monotonic() < deadline:
+                        continue
+                self._write(db, batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+                if item is None:
+                    return
+                if isinstance(item, threading.Event):
+                    item.set()
+        finally:
+            db.close()
+
+    def _write(self, db: sqlite3.Connection, batch: List[MatchResult]) -> None:
+        if not batch:
+            return
+        try:
+            self._insert(db, batch)
+        except sqlite3.Error:
+            # ディスク不足などで書けなかったバッチは捨てる（書き込みスレッドは止めない）
+            self.failed += len(batch)
+            return
+        self.written += len(batch)
+        self.batches += 1
+
+    def _insert(self, db: sqlite3.Connection, batch: List[MatchResult]) -> None:
+        rows: List[Tuple[str, int, float, str, str, int]] = []
+        totals: Dict[str, List[Any]] = {}  # 名前 -> [勝, 敗, 分, ペナルティ, 最終対戦]
+        with db:
+            for r in batch:
+                cur = db.execute(
+                    "INSERT INTO matches (room_id, finished_at, duration, winner, player, opponent,"
+                    " player_penalty, opponent_penalty, turns) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (r.room_id, r.finished_at, r.duration, r.winner, r.player, r.opponent,
+                     r.player_penalty, r.opponent_penalty, r.turns),
+                )
+                for name, role, outcome, penalty in r.outcomes():
+                    rows.append((name, cur.lastrowid, r.finished_at, role, outcome, penalty))
+                    t = totals.setdefault(name, [0, 0, 0, 0, r.finished_at])
+                    t[(WIN, LOSS, DRAW).index(outcome)] += 1
+                    t[3] += penalty
+                    t[4] = max(t[4], r.finished_at)
+            db.executemany(
+                "INSERT INTO player_results (player, match_id, finished_at, role, outcome, penalty)"
+                " VALUES (?, ?, ?, ?, ?, ?)", rows,
+            )
+            db.executemany(UPSERT_PLAYER, [(name, *t) for name, t in totals.items()])
+        # コミット後に世代を進める（読み出し側は古いキャッシュを捨てる）
+        self._generation += 1
+        for name in totals:
+            self._player_generation[name] = self._generation
+
+    # ----- 読み出し -----
+    def _read(self) -> sqlite3.Connection:
+        if self._reader is None:
+            if not os.path.exists(self.path):
+                # まだ1件も書かれていない
+                self._reader = self._connect()
+            else:
+                self._reader = sqlite3.connect(self.path, check_same_thread=False)
+        return self._reader
+
+    def _cached(self, key: Tuple, generation: int) -> Optional[Any]:
+        hit = self._cache.get(key)
+        if hit is None or hit[0] < generation:
+            return None
+        self._cache.move_to_end(key)
+        return hit[1]
+
+    def _store(self, key: Tuple, generation: int, value: Any) -> Any:
+        self._cache[key] = (generation, value)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return value
+
+    def leaderboard(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """勝ち数の多い順（同数なら負けの少ない順）"""
+        limit = max(1, min(limit, LIMIT_MAX))
+        generation = self._generation
+        key = ("leaderboard", limit)
+        hit = self._cached(key, generation)
+        if hit is not None:
+            return hit
+        rows = self._read().execute(
+            "SELECT player, wins, losses, draws, penalties, last_played_at FROM players"
+            " ORDER BY wins DESC, losses ASC, player LIMIT ?", (limit,),
+        ).fetchall()
+        return self._store(key, generation, [
+            {"rank": i + 1, "player": p, "wins": w, "losses": l, "draws": d,
+             "penalties": pen, "lastPlayedAt": last}
+            for i, (p, w, l, d, pen, last) in enumerate(rows)
+        ])
+
+    def history(self, player: str, limit: int = 20) -> Dict[str, Any]:
+        """プレイヤーの通算成績と直近の対戦（新しい順）"""
+        limit = max(1, min(limit, LIMIT_MAX))
+        generation = self._player_generation.get(player, 0)
+        key = ("history", player, limit)
+        hit = self._cached(key, generation)
+        if hit is not None:
+            return hit
+        db = self._read()
+        total = db.execute(
+            "SELECT wins, losses, draws, penalties FROM players WHERE player = ?", (player,),
+        ).fetchone()
+        rows = db.execute(
+            "SELECT pr.match_id, pr.finished_at, pr.role, pr.outcome, pr.penalty, m.duration, m.turns,"
+            " CASE pr.role WHEN 'player' THEN m.opponent ELSE m.player END"
+            " FROM player_results pr JOIN matches m ON m.id = pr.match_id"
+            " WHERE pr.player = ? ORDER BY pr.finished_at DESC LIMIT ?", (player, limit),
+        ).fetchall()
+        wins, losses, draws, penalties = total or (0, 0, 0, 0)
+        return self._store(key, generation, {
+            "player": player,
+            "wins": wins,
+            "losses": losses,
+            "draws": draws,
+            "penalties": penalties,
+            "matches": [
+                {"matchId": mid, "finishedAt": at, "role": role, "outcome": outcome, "penalty": pen,
+                 "duration": duration, "turns": turns, "against": against}
+                for mid, at, role, outcome, pen, duration, turns, against in rows
+            ],
+        })
+
+
+def main(argv: List[str]) -> None:
+    if len(argv) != 2:
+        print("使い方: python results.py var/results.sqlite3")
+        sys.exit(1)
+    store = ResultStore(argv[1])
+    board = store.leaderboard(LIMIT_MAX)
+    print(f"{'rank':>4}  {'player':<{NAME_MAX}}  {'win':>5} {'loss':>5} {'draw':>5} {'pen':>5}")
+    for row in board:
+        print(f"{row['rank']:>4}  {row['player']:<{NAME_MAX}}  {row['wins']:>5} {row['losses']:>5} "
+              f"{row['draws']:>5} {row['penalties']:>5}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,71 @@
+"""
+ルームごとの CPU 時間 (roomcpu.py)
+アクション処理・ティック・スナップショットの作成・ブロードキャストにかかった CPU 時間を
+ルームごとに直近 WINDOW_SEC 秒の窓で数え、重いルームを見つけて間引けるようにする。
+
+    with room.cpu:       # 入れ子になっていれば一番外側だけを数える
+        ...              # 区間の中では await しない（エンコードまで測り、送信は区間の外で行う）
+
+time.thread_time（このスレッドの CPU 時間）で測るので、待ち時間は入らない。
+区間の中で await して制御が移ると、その間に動いた別のルームの処理まで数えてしまい、
+入れ子の深さも別のタスクと混ざるので、区間は同期的な処理だけを囲む。
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, List, Optional
+
+
+# =========================
+# 設定
+# =========================
+WINDOW_SEC = 10       # この秒数の窓で合計する
+BUCKET_SEC = 1.0      # 窓を区切る単位（秒）
+BUCKETS = int(WINDOW_SEC / BUCKET_SEC)
+
+
+class RoomCpu:
+    """1ルームぶんの CPU 時間。イベントループのスレッドからだけ使う"""
+
+    __slots__ = ("_start", "_depth", "_sums", "_ids", "total")
+
+    def __init__(self) -> None:
+        self._start = 0.0
+        self._depth = 0
+        self._sums: List[float] = [0.0] * BUCKETS
+        self._ids: List[int] = [-1] * BUCKETS   # 各枠が何番目の区切りのものか
+        self.total = 0.0
+
+    def reset(self) -> None:
+        self._depth = 0
+        for i in range(BUCKETS):
+            self._sums[i] = 0.0
+            self._ids[i] = -1
+        self.total = 0.0
+
+    def __enter__(self) -> "RoomCpu":
+        if self._depth == 0:
+            self._start = time.thread_time()
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            self.add(time.thread_time() - self._start)
+
+    def add(self, seconds: float, now: Optional[float] = None) -> None:
+        bucket = int((time.monotonic() if now is None else now) / BUCKET_SEC)
+        i = bucket % BUCKETS
+        if self._ids[i] != bucket:
+            # 窓から外れた古い区切りを使い回す
+            self._ids[i] = bucket
+            self._sums[i] = 0.0
+        self._sums[i] += seconds
+        self.total += seconds
+
+    def window(self, now: Optional[float] = None) -> float:
+        """直近 WINDOW_SEC 秒の CPU 時間（秒）"""
+        bucket = int((time.monotonic() if now is None else now) / BUCKET_SEC)
+        return sum(s for s, b in zip(self._sums, self._ids) if bucket - b < BUCKETS)
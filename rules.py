@@ -0,0 +1,733 @@
+"""
+ルールコア (rules.py)
+カード・状態・アクション処理をまとめた純Pythonモジュール。
+FastAPI/uvicorn に依存しないので、シミュレーション・bot・ベンチマークのワーカーから軽く import できる。
+（random などの重い/任意の依存は使う関数の中で import する）
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field as dataclass_field
+from typing import Any, Dict, List, Optional, Tuple
+
+from cards import Card, registry  # noqa: F401  (Card は従来通り rules から import できる)
+from clock import get_clock
+
+
+# =========================
+# 設定
+# =========================
+TURN_SECONDS = 60
+MULLIGAN_SECONDS = 10
+ACCUSATION_WINDOW_SEC = 10
+MAX_PENALTY = 3
+CHEAT_LOG_LIMIT = 200   # cheatLog に残す件数（指摘できるのは直近 ACCUSATION_WINDOW_SEC 秒ぶんだけ）
+DEFAULT_DECK = 10
+ROLES = ("player", "opponent")
+CHEAT_TYPES = (
+    "summon-own",
+    "destroy-opponent",
+    "steal-opponent",
+    "add-own-hand",
+    "remove-own-hand",
+    "add-opponent-hand",
+    "remove-opponent-hand",
+    "modify-hp",
+    "modify-mana",
+)
+
+
+# =========================
+# データモデル
+# =========================
+@dataclass
+class PlayerState:
+    hp: int = 20
+    mana: int = 3
+    maxMana: int = 3
+    hand: List[int] = dataclass_field(default_factory=list)      # card ids
+    field: List[int] = dataclass_field(default_factory=list)     # card ids
+    deck: int = DEFAULT_DECK
+    penalty: int = 0
+    grave: List[int] = dataclass_field(default_factory=list)     # card ids（オフライン用）
+
+
+@dataclass
+class CheatLogItem:
+    ts: float
+    by: str                 # "player" or "opponent"
+    action: str             # cheat action type
+    payload: Dict[str, Any] = dataclass_field(default_factory=dict)
+    seq: int = 0            # 対戦内の通し番号（時刻は重なりうるので、指摘の対象はこれで指す）
+
+
+@dataclass
+class GameState:
+    started: bool = False
+    currentTurn: str = "player"   # "player" or "opponent"
+    isGameOver: bool = False
+    winner: Optional[str] = None  # "player"/"opponent"/None
+    timer: int = TURN_SECONDS
+    turnCount: int = 0            # 開始からのターン数（1始まり）
+
+    # マリガンフェーズ
+    isMulliganPhase: bool = False
+    mulliganTimer: int = MULLIGAN_SECONDS
+    playerMulliganDone: bool = False
+    opponentMulliganDone: bool = False
+    playerMulliganCards: List[int] = dataclass_field(default_factory=list)  # 戻すカードのインデックス
+    opponentMulliganCards: List[int] = dataclass_field(default_factory=list)
+
+    player: PlayerState = dataclass_field(default_factory=PlayerState)
+    opponent: PlayerState = dataclass_field(default_factory=PlayerState)
+
+    cheatLog: List[CheatLogItem] = dataclass_field(default_factory=list)
+    cheatSeq: int = 0             # 最後に振った CheatLogItem.seq
+
+    # ----- 旧 main.GameState の snake_case 名（従来のコード向け。フィールドではないので保存・送信には出ない） -----
+    @property
+    def current_turn(self) -> str:
+        return self.currentTurn
+
+    @current_turn.setter
+    def current_turn(self, value: str) -> None:
+        self.currentTurn = value
+
+    @property
+    def is_game_over(self) -> bool:
+        return self.isGameOver
+
+    @is_game_over.setter
+    def is_game_over(self, value: bool) -> None:
+        self.isGameOver = value
+
+    @property
+    def cheat_log(self) -> List[CheatLogItem]:
+        return self.cheatLog
+
+    @cheat_log.setter
+    def cheat_log(self, value: List[CheatLogItem]) -> None:
+        self.cheatLog = value
+
+    @property
+    def room_id(self) -> str:
+        # ルームIDは server.Room が持つ。ここでは従来どおり既定は "offline"
+        return getattr(self, "_room_id", "offline")
+
+    @room_id.setter
+    def room_id(self, value: str) -> None:
+        self._room_id = value
+
+    @property
+    def cards(self) -> List[Card]:
+        # 従来どおり CARD_DB のコピーを state ごとに持つ（初めて参照したときに作り、以降は同じリスト）
+        cards = getattr(self, "_cards", None)
+        if cards is None:
+            cards = self._cards = list(registry().cards)
+        return cards
+
+    @cards.setter
+    def cards(self, value: List[Card]) -> None:
+        self._cards = value
+
+
+def state_to_dict(s: GameState) -> Dict[str, Any]:
+    """保存・プロセス間の受け渡し用に素の dict/list にする（JSON にできる）"""
+    from dataclasses import asdict
+
+    return asdict(s)
+
+
+def state_from_dict(d: Dict[str, Any]) -> GameState:
+    """state_to_dict の逆"""
+    d = dict(d)
+    d["player"] = PlayerState(**d["player"])
+    d["opponent"] = PlayerState(**d["opponent"])
+    d["cheatLog"] = [CheatLogItem(**item) for item in d["cheatLog"]]
+    return GameState(**d)
+
+
+def __getattr__(name: str) -> Any:
+    # CARD_DB は初回参照時にデータファイルから読み込む（import だけなら読み込まない）
+    if name == "CARD_DB":
+        return registry().cards
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def find_card(card_id: int) -> Optional[Card]:
+    return registry().get(card_id)
+
+
+def random_card(salt: float = 1.0) -> Card:
+    """時刻から擬似的に1枚選ぶ（イカサマ・マリガンのドロー用）"""
+    cards = registry().cards
+    return cards[int(get_clock().time() * salt) % len(cards)]
+
+
+def enemy_of(role: str) -> str:
+    return "opponent" if role == "player" else "player"
+
+
+def get_ps(s: GameState, role: str) -> PlayerState:
+    return s.player if role == "player" else s.opponent
+
+
+# =========================
+# 進行
+# =========================
+def start_game(s: GameState, first_attack_role: str) -> None:
+    """初期手札を配り、マリガンフェーズを開始する"""
+    s.started = True
+    s.isGameOver = False
+    s.winner = None
+    s.currentTurn = "player"
+    s.timer = TURN_SECONDS
+    s.turnCount = 1
+    s.cheatLog.clear()
+    s.cheatSeq = 0
+
+    # 先攻3枚、後攻4枚の初期手札を自動的に配る
+    first = get_ps(s, first_attack_role)
+    second = get_ps(s, enemy_of(first_attack_role))
+    cards = registry().cards
+    first.hand = [c.id for c in cards[:3]]
+    second.hand = [c.id for c in cards[:4]]
+
+    # カード配布後、マリガン選択フェーズを開始
+    s.isMulliganPhase = True
+    s.mulliganTimer = MULLIGAN_SECONDS
+    s.playerMulliganDone = False
+    s.opponentMulliganDone = False
+    s.playerMulliganCards.clear()
+    s.opponentMulliganCards.clear()
+
+
+def switch_turn(s: GameState) -> None:
+    s.currentTurn = enemy_of(s.currentTurn)
+    s.timer = TURN_SECONDS
+    s.turnCount += 1
+
+
+def end_game_if_needed(s: GameState) -> None:
+    if s.isGameOver:
+        return
+
+    if s.player.hp <= 0:
+        s.isGameOver = True
+        s.winner = "opponent"
+    elif s.opponent.hp <= 0:
+        s.isGameOver = True
+        s.winner = "player"
+
+    if s.player.penalty >= MAX_PENALTY:
+        s.isGameOver = True
+        s.winner = "opponent"
+    elif s.opponent.penalty >= MAX_PENALTY:
+        s.isGameOver = True
+        s.winner = "player"
+
+
+def log_cheat(s: GameState, by: str, action: str, payload: Dict[str, Any]) -> CheatLogItem:
+    s.cheatSeq += 1
+    item = CheatLogItem(ts=get_clock().time(), by=by, action=action, payload=payload, seq=s.cheatSeq)
+    s.cheatLog.append(item)
+    # 長い対戦でも際限なく伸びないよう古いものから捨てる
+    if len(s.cheatLog) > CHEAT_LOG_LIMIT:
+        del s.cheatLog[:-CHEAT_LOG_LIMIT]
+    return item
+
+
+# =========================
+# アクション処理
+# =========================
+def apply_action(s: GameState, role: str, action: str, payload: Dict[str, Any]) -> Tuple[bool, str]:
+    """
+    対戦中のアクションを1つ適用する（start/cursor などの接続まわりは呼び出し側で扱う）
+    戻り値: (ok, reason)
+    """
+    if role not in ROLES:
+        return False, "spectator は操作できません"
+
+    if not s.started:
+        return False, "ゲームが開始されていません（start を実行してください）"
+
+    if s.isGameOver:
+        return False, "ゲームは終了しています"
+
+    # 通常行動
+    if action == "play-card":
+        return play_card(s, role, payload)
+
+    if action == "end-turn":
+        if s.currentTurn != role:
+            return False, "自分のターンではありません"
+        switch_turn(s)
+        return True, "turn switched"
+
+    # イカサマ（ゲーム内で許可された「ズル」）
+    if action == "cheat":
+        return cheat(s, role, payload)
+
+    # 指摘
+    if action == "accuse":
+        return accuse(s, role, payload)
+
+    # マリガン
+    if action == "mulligan":
+        return select_mulligan(s, role, payload)
+
+    return False, f"不明なaction: {action}"
+
+
+def play_card(s: GameState, role: str, payload: Dict[str, Any]) -> Tuple[bool, str]:
+    if s.currentTurn != role:
+        return False, "自分のターンではありません"
+
+    hand_index = int(payload.get("handIndex", -1))
+    ps = get_ps(s, role)
+
+    if hand_index < 0 or hand_index >= len(ps.hand):
+        return False, "handIndexが不正です"
+
+    card_id = ps.hand[hand_index]
+    card = find_card(card_id)
+    if not card:
+        return False, "カードが存在しません"
+
+    if ps.mana < card.cost:
+        return False, "マナが足りません"
+
+    # 状態更新
+    ps.mana -= card.cost
+    ps.hand.pop(hand_index)
+    ps.field.append(card_id)
+
+    end_game_if_needed(s)
+    return True, "played"
+
+
+def cheat(s: GameState, role: str, payload: Dict[str, Any]) -> Tuple[bool, str]:
+    """
+    フロントのメニューに合わせる（index.html）
+    - summon-own: 自分の手札から召喚（= 手札1枚を場に出す。マナ無視）
+    - destroy-opponent: 相手フォロワー破壊（相手fieldから1体消す）
+    - steal-opponent: 相手フォロワー奪う（相手fieldから1体→自分fieldへ）
+    - add-own-hand / remove-own-hand
+    - add-opponent-hand / remove-opponent-hand
+    - modify-hp / modify-mana
+    """
+    cheat_type = str(payload.get("cheatType", ""))
+    data = payload.get("data", {}) or {}
+
+    ps = get_ps(s, role)
+    enemy = get_ps(s, enemy_of(role))
+
+    # ここで“許可されたイカサマ”を適用する（＝ゲーム仕様）
+    if cheat_type == "summon-own":
+        idx = int(data.get("handIndex", 0))
+        if ps.hand and 0 <= idx < len(ps.hand):
+            card_id = ps.hand.pop(idx)
+            ps.field.append(card_id)
+        log_cheat(s, role, cheat_type, {"handIndex": idx})
+
+    elif cheat_type == "destroy-opponent":
+        idx = int(data.get("fieldIndex", 0))
+        if enemy.field and 0 <= idx < len(enemy.field):
+            enemy.field.pop(idx)
+        log_cheat(s, role, cheat_type, {"fieldIndex": idx})
+
+    elif cheat_type == "steal-opponent":
+        idx = int(data.get("fieldIndex", 0))
+        if enemy.field and 0 <= idx < len(enemy.field):
+            card_id = enemy.field.pop(idx)
+            ps.field.append(card_id)
+        log_cheat(s, role, cheat_type, {"fieldIndex": idx})
+
+    elif cheat_type == "add-own-hand":
+        # カードを1枚増やす（DBからランダム風）
+        ps.hand.append(random_card().id)
+        log_cheat(s, role, cheat_type, {})
+
+    elif cheat_type == "remove-own-hand":
+        if ps.hand:
+            ps.hand.pop()
+        log_cheat(s, role, cheat_type, {})
+
+    elif cheat_type == "add-opponent-hand":
+        enemy.hand.append(random_card(1.7).id)
+        log_cheat(s, role, cheat_type, {})
+
+    elif cheat_type == "remove-opponent-hand":
+        if enemy.hand:
+            enemy.hand.pop()
+        log_cheat(s, role, cheat_type, {})
+
+    elif cheat_type == "modify-hp":
+        target = str(data.get("target", "self"))  # "self" or "opponent"
+        delta = int(data.get("delta", 0))
+        tps = ps if target == "self" else enemy
+        tps.hp += delta
+        log_cheat(s, role, cheat_type, {"target": target, "delta": delta})
+
+    elif cheat_type == "modify-mana":
+        target = str(data.get("target", "self"))
+        delta = int(data.get("delta", 0))
+        tps = ps if target == "self" else enemy
+        tps.mana = max(0, tps.mana + delta)
+        tps.maxMana = max(tps.maxMana, tps.mana)
+        log_cheat(s, role, cheat_type, {"target": target, "delta": delta})
+
+    else:
+        return False, f"不明なcheatType: {cheat_type}"
+
+    end_game_if_needed(s)
+    return True, "cheated"
+
+
+def accuse(s: GameState, role: str, payload: Dict[str, Any]) -> Tuple[bool, str]:
+    """
+    指摘：直近10秒以内の相手のイカサマを当てる
+    payload:
+      - seq: 指摘したログの seq（一意に決まるのでこれを優先する）
+      - index: cheat候補のインデックス（cheatLogの末尾から数えるのでもOK）
+      - ts: 指摘したログのts（従来のクライアント用。同じ時刻のものがあれば先の1件）
+    """
+    now = get_clock().time()
+    idx = payload.get("index", None)
+    ts = payload.get("ts", None)
+    seq = payload.get("seq", None)
+
+    enemy_role = enemy_of(role)
+
+    # 直近window内の、相手のcheatだけ抽出
+    recent = [
+        item for item in s.cheatLog
+        if item.by == enemy_role and (now - item.ts) <= ACCUSATION_WINDOW_SEC
+    ]
+    if not recent:
+        # 何もないのに指摘：自分にペナルティ
+        get_ps(s, role).penalty += 1
+        end_game_if_needed(s)
+        return False, "直近10秒の相手のイカサマはありません（指摘失敗：自分にペナルティ）"
+
+    chosen: Optional[CheatLogItem] = None
+
+    if seq is not None:
+        try:
+            seq_i = int(seq)
+            chosen = next((item for item in recent if item.seq == seq_i), None)
+        except Exception:
+            chosen = None
+
+    if chosen is None and ts is not None:
+        try:
+            ts_f = float(ts)
+            for item in recent:
+                if abs(item.ts - ts_f) < 0.0001:
+                    chosen = item
+                    break
+        except Exception:
+            chosen = None
+
+    if chosen is None and idx is not None:
+        try:
+            i = int(idx)
+            if 0 <= i < len(recent):
+                chosen = recent[i]
+        except Exception:
+            chosen = None
+
+    if chosen is None:
+        # 指摘が成立しない：自分ペナルティ
+        get_ps(s, role).penalty += 1
+        end_game_if_needed(s)
+        return False, "指摘対象が不正です（指摘失敗：自分にペナルティ）"
+
+    # 指摘成功：相手にペナルティ
+    get_ps(s, enemy_role).penalty += 1
+
+    # ログとして「accuse」も残す（任意）
+    log_cheat(s, role, "accuse", {"targetSeq": chosen.seq, "targetTs": chosen.ts, "targetAction": chosen.action})
+
+    end_game_if_needed(s)
+    return True, "accuse success (enemy penalty +1)"
+
+
+def select_mulligan(s: GameState, role: str, payload: Dict[str, Any]) -> Tuple[bool, str]:
+    """マリガン選択を受け付ける"""
+    if not s.isMulliganPhase:
+        return False, "マリガンフェーズではありません"
+
+    if (role == "player" and s.playerMulliganDone) or \
+       (role == "opponent" and s.opponentMulliganDone):
+        return False, "既にマリガンは完了しています"
+
+    card_indices = payload.get("cardIndices", [])
+    if not isinstance(card_indices, list):
+        return False, "cardIndicesは配列である必要があります"
+
+    ps = get_ps(s, role)
+    # インデックスの有効性チェック
+    for idx in card_indices:
+        if not isinstance(idx, int) or idx < 0 or idx >= len(ps.hand):
+            return False, f"無効なカードインデックス: {idx}"
+
+    # マリガン情報を保存
+    if role == "player":
+        s.playerMulliganCards = card_indices[:]
+        s.playerMulliganDone = True
+    else:
+        s.opponentMulliganCards = card_indices[:]
+        s.opponentMulliganDone = True
+
+    return True, f"マリガン選択完了: {len(card_indices)}枚"
+
+
+def execute_mulligan(s: GameState) -> None:
+    """マリガンを実行する"""
+    if not s.isMulliganPhase:
+        return
+
+    for ps, indices, salt in (
+        (s.player, s.playerMulliganCards, 1.1),
+        (s.opponent, s.opponentMulliganCards, 1.3),
+    ):
+        if not indices:
+            continue
+        # 降順でソートして後ろから削除（インデックスずれを防ぐ）
+        for idx in sorted(indices, reverse=True):
+            if 0 <= idx < len(ps.hand):
+                ps.hand.pop(idx)
+        # 削除した枚数分ドロー
+        for _ in range(len(indices)):
+            if len(registry()) > 0:
+                ps.hand.append(random_card(salt).id)
+
+    # マリガンフェーズ終了
+    s.isMulliganPhase = False
+    s.timer = TURN_SECONDS  # 通常ターンタイマーに戻す
+
+
+# =========================
+# 合法手の列挙（クライアント表示・bot・シミュレーター用）
+# =========================
+def legal_actions(s: GameState, role: str, now: Optional[float] = None) -> Dict[str, Any]:
+    """
+    role が今出して通る操作をまとめる（判定は play_card / accuse / select_mulligan と同じ条件）
+      - playable: 出せる手札インデックスの一覧（自分のターンかつコスト<=マナ）
+      - canEndTurn: ターン終了できるか
+      - canAccuse: 指摘の対象になる相手のイカサマが ACCUSATION_WINDOW_SEC 内にあるか
+      - accuseUntil: canAccuse が偽になる時刻（クライアント側で期限切れを判断できるように）
+      - mulliganPending: マリガンの選択待ちか
+    """
+    legal: Dict[str, Any] = {
+        "playable": [],
+        "canEndTurn": False,
+        "canAccuse": False,
+        "accuseUntil": None,
+        "mulliganPending": False,
+    }
+    if role not in ROLES or not s.started or s.isGameOver:
+        return legal
+
+    if s.currentTurn == role:
+        ps = get_ps(s, role)
+        playable: List[int] = []
+        for i, card_id in enumerate(ps.hand):
+            card = find_card(card_id)
+            if card is not None and card.cost <= ps.mana:
+                playable.append(i)
+        legal["playable"] = playable
+        legal["canEndTurn"] = True
+
+    if now is None:
+        now = get_clock().time()
+    enemy_role = enemy_of(role)
+    latest = max((item.ts for item in s.cheatLog if item.by == enemy_role), default=None)
+    if latest is not None and now - latest <= ACCUSATION_WINDOW_SEC:
+        legal["canAccuse"] = True
+        legal["accuseUntil"] = latest + ACCUSATION_WINDOW_SEC
+
+    if s.isMulliganPhase:
+        legal["mulliganPending"] = not (s.playerMulliganDone if role == "player" else s.opponentMulliganDone)
+    return legal
+
+
+def tick(s: GameState) -> None:
+    """1秒ぶんタイマーを進める（マリガン締め切り・ターン切り替えを含む）"""
+    if not s.started or s.isGameOver:
+        return
+
+    if s.isMulliganPhase:
+        s.mulliganTimer -= 1
+        if s.mulliganTimer <= 0:
+            execute_mulligan(s)
+        elif s.playerMulliganDone and s.opponentMulliganDone:
+            execute_mulligan(s)
+    else:
+        s.timer -= 1
+        if s.timer <= 0:
+            switch_turn(s)
+
+
+# =========================
+# オフライン用ロジック（main.jsのゲームロジック部分をPython化したもの）
+# =========================
+class GameLogic:
+    """ゲームのルールとロジックを管理するクラス（オフライン対戦・AI）"""
+
+    @staticmethod
+    def create_initial_state() -> GameState:
+        """初期状態を生成"""
+        return GameState()
+
+    @staticmethod
+    def check_game_over(state: GameState) -> None:
+        """勝敗判定"""
+        end_game_if_needed(state)
+
+    @staticmethod
+    def play_card(state: GameState, hand_index: int) -> bool:
+        """手札からカードを場に出す（通常プレイ）"""
+        if not state.started or state.isGameOver:
+            return False
+        ok, _ = play_card(state, "player", {"handIndex": hand_index})
+        return ok
+
+    @staticmethod
+    def sneak_to_grave_from_hand(state: GameState, hand_index: int) -> bool:
+        """手札からこっそり墓地に置く（イカサマ）"""
+        if not state.started or state.isGameOver:
+            return False
+
+        ps = state.player
+        if hand_index < 0 or hand_index >= len(ps.hand):
+            return False
+
+        card_id = ps.hand.pop(hand_index)
+        ps.grave.append(card_id)
+
+        # イカサマログに記録
+        log_cheat(state, "player", "sneak-grave", {"from": "hand", "handIndex": hand_index})
+
+        end_game_if_needed(state)
+        return True
+
+    @staticmethod
+    def sneak_discard_from_hand(state: GameState, hand_index: int) -> bool:
+        """手札からこっそり捨てる（イカサマ）"""
+        if not state.started or state.isGameOver:
+            return False
+
+        ps = state.player
+        if hand_index < 0 or hand_index >= len(ps.hand):
+            return False
+
+        ps.hand.pop(hand_index)
+
+        # イカサマログに記録
+        log_cheat(state, "player", "sneak-discard", {"from": "hand", "handIndex": hand_index})
+
+        end_game_if_needed(state)
+        return True
+
+    @staticmethod
+    def destroy_opponent_field(state: GameState, field_index: int) -> bool:
+        """相手の場のカードを破壊（イカサマ）"""
+        if not state.started or state.isGameOver:
+            return False
+        if field_index < 0 or field_index >= len(state.opponent.field):
+            return False
+
+        state.opponent.field.pop(field_index)
+
+        # イカサマログに記録
+        log_cheat(state, "player", "destroy-opponent-demo", {"fieldIndex": field_index})
+
+        end_game_if_needed(state)
+        return True
+
+    @staticmethod
+    def simulate_opponent_turn(state: GameState) -> None:
+        """相手のターンをシミュレート（AI）"""
+        import random
+
+        if not state or state.isGameOver:
+            return
+
+        opp = state.opponent
+
+        # 可能なら召喚
+        if opp.hand and random.random() < 0.5:
+            card_id = opp.hand[0]
+            card = find_card(card_id)
+            if card and opp.mana >= card.cost:
+                opp.mana -= card.cost
+                opp.hand.pop(0)
+                opp.field.append(card_id)
+
+        # たまにイカサマ（指摘用）
+        if random.random() < 0.35:
+            kind = random.choice(["modify-hp", "modify-mana"])
+            if kind == "modify-hp":
+                state.player.hp -= 1
+            else:
+                state.player.mana = max(0, state.player.mana - 1)
+            log_cheat(state, "opponent", kind, {"target": "opponent", "delta": -1})
+
+            # ログが長くなりすぎないよう制限
+            if len(state.cheatLog) > 100:
+                state.cheatLog = state.cheatLog[-100:]
+
+        end_game_if_needed(state)
+
+    @staticmethod
+    def switch_turn(state: GameState) -> None:
+        """ターン切り替え"""
+        if not state or state.isGameOver:
+            return
+
+        switch_turn(state)
+
+        # 相手ターンならシミュレート
+        if state.currentTurn == "opponent":
+            GameLogic.simulate_opponent_turn(state)
+            state.currentTurn = "player"
+            state.timer = TURN_SECONDS
+
+    @staticmethod
+    def start_game_offline(state: GameState) -> None:
+        """オフラインゲームを開始"""
+        state.started = True
+        cards = registry().cards
+        state.player.hand = [c.id for c in cards[:3]]
+        state.opponent.hand = [c.id for c in cards[:3]]
+        state.currentTurn = "player"
+        state.timer = TURN_SECONDS
+
+    @staticmethod
+    def accuse_cheat(state: GameState, target_ts: float, target_action: str) -> bool:
+        """イカサマを指摘"""
+        now = get_clock().time()
+
+        # 直近の相手イカサマを探す
+        recent_cheats = [
+            log for log in state.cheatLog
+            if log.by == "opponent" and now - log.ts <= ACCUSATION_WINDOW_SEC
+        ]
+
+        # 指摘対象を検証
+        target = next((log for log in recent_cheats if log.ts == target_ts and log.action == target_action), None)
+
+        if target:
+            # 指摘成功
+            state.opponent.penalty += 1
+            log_cheat(state, "player", "accuse",
+                      {"targetSeq": target.seq, "targetTs": target_ts, "targetAction": target_action})
+            end_game_if_needed(state)
+            return True
+        else:
+            # 指摘失敗
+            state.player.penalty += 1
+            end_game_if_needed(state)
+            return False
@@ -1,104 +1,205 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import heapq
 import json
+import os
 import secrets
 import time
-from dataclasses import dataclass, asdict, field
-from typing import Any, Dict, List, Optional, Set, Tuple
-
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import FileResponse
-from fastapi.staticfiles import StaticFiles
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel
+
+import rules
+import admission
+from admission import AdmissionController
+from archive import MatchArchiveWriter, MatchRecord
+from assets import REVALIDATE_CACHE, AssetPipeline, AssetStaticFiles
+from audit import AuditLog
+from cards import registry
+from clock import get_clock
+from handoff import HandoffError, HandoffReceiver, HandoffSender
+import lobby
+from lobby import LobbyIndex
+from mux import MuxConnection
+import roomcpu
+from roomcpu import RoomCpu
+from results import MatchResult, ResultStore, clean_name
+from rules import GameState, PlayerState
+from tracing import NOOP_TRACE, Trace, Tracer
 
 
 # =========================
 # 設定
 # =========================
-TURN_SECONDS = 60
-ACCUSATION_WINDOW_SEC = 10
-MAX_PENALTY = 3
-DEFAULT_DECK = 10
+# ゲームルールの定数は rules.py を参照
 
+# 再接続（レジューム）
+REPLAY_BUFFER_SIZE = 256   # ルームごとに保持する直近フレーム数
+RESUME_GRACE_SEC = 60      # 切断後、席を確保しておく秒数
 
-# =========================
-# データモデル
-# =========================
-@dataclass
-class Card:
-    id: int
-    name: str
-    cost: int
-    power: int
-    toughness: int
+# 1ルームあたりの観戦者の上限
+MAX_SPECTATORS = 50
 
+# ルームプール（終了したルームを作り直さず再利用する）
+ROOM_POOL_SIZE = 1024      # プールに置いておく上限
+ROOM_POOL_PREWARM = 64     # 起動時に作っておく数
+MAX_PROVISION = 5000       # 一括作成APIで1回に作れる上限
 
-CARD_DB: List[Card] = [
-    Card(0, "フォロワーA", 2, 3, 2),
-    Card(1, "フォロワーB", 3, 4, 3),
-    Card(2, "フォロワーC", 1, 1, 1),
-    Card(3, "フォロワーD", 4, 5, 4),
-    Card(4, "フォロワーE", 2, 2, 3),
-]
+# 管理API用トークン（未設定なら管理APIは無効）
+ADMIN_TOKEN = os.environ.get("IKASAMA_ADMIN_TOKEN")
 
+# 受け入れ制御（admission.py）のしきい値。未設定なら admission.py の既定値
+ADMISSION_MAX_ROOMS = int(os.environ.get("IKASAMA_MAX_ROOMS", admission.MAX_ROOMS))
+ADMISSION_LAG_DEGRADE_MS = float(os.environ.get("IKASAMA_LAG_DEGRADE_MS", admission.LAG_DEGRADE_MS))
+ADMISSION_LAG_REJECT_MS = float(os.environ.get("IKASAMA_LAG_REJECT_MS", admission.LAG_REJECT_MS))
 
-@dataclass
-class PlayerState:
-    hp: int = 20
-    mana: int = 3
-    maxMana: int = 3
-    hand: List[int] = field(default_factory=list)      # card ids
-    field: List[int] = field(default_factory=list)     # card ids
-    deck: int = DEFAULT_DECK
-    penalty: int = 0
+# ルームごとの CPU 時間（roomcpu.py）。直近の窓でこの割合（1コア = 1.0）を超えたルームは間引く
+ROOM_CPU_BUDGET = float(os.environ.get("IKASAMA_ROOM_CPU_BUDGET", "0.05"))
 
+# デプロイ時のルーム引き継ぎ：新しいプロセスはこのパスで受け取りを待つ
+HANDOFF_LISTEN = os.environ.get("IKASAMA_HANDOFF_LISTEN")
+HANDOFF_CLOSE_CODE = 1012  # service restart（クライアントは同じトークンで再接続する）
 
-@dataclass
-class CheatLogItem:
-    ts: float
-    by: str                 # "player" or "opponent"
-    action: str             # cheat action type
-    payload: Dict[str, Any]
+# 終了した対戦の保存先（列指向バイナリ。archive.py で集計）
+ARCHIVE_PATH = "var/matches.ikab"
+ACTION_LOG_MAX = 10_000  # 1試合で記録するアクションの上限（イカサマを連打するルームでも増え続けないように）
+CHEAT_RECORD_MAX = 5_000  # 1試合でアーカイブ用に記録するイカサマの上限（表示用の cheatLog とは別に数える）
 
+# 対戦結果とランキング（SQLite。書き込みは別スレッドでまとめて行う）
+RESULTS_PATH = "var/results.sqlite3"
 
-@dataclass
-class GameState:
-    currentTurn: str = "player"   # "player" or "opponent"
-    isGameOver: bool = False
-    winner: Optional[str] = None  # "player"/"opponent"/None
-    timer: int = TURN_SECONDS
-    
-    # マリガンフェーズ
-    isMulliganPhase: bool = False
-    mulliganTimer: int = 10
-    playerMulliganDone: bool = False
-    opponentMulliganDone: bool = False
-    playerMulliganCards: List[int] = field(default_factory=list)  # 戻すカードのインデックス
-    opponentMulliganCards: List[int] = field(default_factory=list)
-
-    player: PlayerState = field(default_factory=PlayerState)
-    opponent: PlayerState = field(default_factory=PlayerState)
-
-    cheatLog: List[CheatLogItem] = field(default_factory=list)
+# 監査ログ（接続・アクション・イカサマ・指摘を JSON Lines で。書き込みは別スレッド）
+AUDIT_PATH = "var/audit.jsonl"
+
+# アクションのトレース（OTLP/JSON を1行1バッチで追記）
+TRACE_PATH = "var/spans.jsonl"
+TRACE_SAMPLE_RATE = float(os.environ.get("IKASAMA_TRACE_SAMPLE_RATE", "0.1"))
 
 
 # =========================
 # ルーム管理
 # =========================
+@dataclass(frozen=True)
+class StateVersion:
+    """
+    公開用の不変スナップショット。ロック内で作って self.current を差し替えるだけなので、
+    読み手（ブロードキャスト・観戦・メトリクス）はロックなしで一貫した状態を読める。
+    view の中身は共有されるため読み取り専用として扱うこと（配列はタプル）。
+    legal はプレイヤーごとの合法手（rules.legal_actions）。バージョンごとに1回だけ計算する
+    """
+    version: int
+    view: Dict[str, Any]
+    legal: Dict[str, Dict[str, Any]]
+
+
+_CARDS_BODY: Optional[Tuple[bytes, str]] = None
+
+
+def cards_body() -> Tuple[bytes, str]:
+    """
+    カード表の JSON と ETag。state には載せず、クライアントは GET /api/cards で1回だけ取って
+    state の手札・場・墓地のカードIDから引く
+    """
+    global _CARDS_BODY
+    if _CARDS_BODY is None:
+        body = json.dumps([asdict(c) for c in registry().cards], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        _CARDS_BODY = (body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+    return _CARDS_BODY
+
+
+@dataclass
+class Session:
+    """再接続用のセッション（hello で発行したトークンと席の対応）"""
+    token: str
+    role: str
+    ws: Optional[WebSocket] = None
+    disconnected_at: Optional[float] = None
+
+
 class Room:
     def __init__(self, room_id: str):
-        self.room_id = room_id
-        self.state = GameState()
-        self.clients: Dict[WebSocket, str] = {}  # ws -> role ("player"/"opponent"/"spectator")
         self.lock = asyncio.Lock()
         self.loop_task: Optional[asyncio.Task] = None
-        self.started = False
-        self.first_attack_role: Optional[str] = None  # "player" or "opponent"
-        self.last_game_state = None  # 前回送信したゲーム状態（差分送信用）
+        self.clients: Dict[WebSocket, str] = {}  # ws -> role ("player"/"opponent"/"spectator")。/mux/ws の購読（MuxChannel）も入る
         self.client_cursors: Dict[str, Dict[str, Any]] = {}  # role -> {x, y, cardId, etc.}
+        # 送信フレームの通し番号とリプレイバッファ（再接続時の差分再送用）
+        self.replay: Deque[Tuple[int, str]] = deque(maxlen=REPLAY_BUFFER_SIZE)
+        self.sessions: Dict[str, Session] = {}  # token -> Session
+        self.player_names: Dict[str, str] = {}  # role -> 参加時に名乗った名前（戦績・ランキング用）
+        # 公開スナップショット（変更のない部分は前バージョンと共有する）
+        self._player_views: Dict[str, Tuple[Tuple, Dict[str, Any]]] = {}  # role -> (比較キー, view)
+        # 混雑時の間引き用
+        self.cursor_accepted_at: Dict[str, float] = {}  # role -> 最後にカーソルを受け付けた時刻
+        # 対戦記録（終了時にアーカイブへ書き出す）
+        self.action_log: List[Tuple[float, str, str, bool]] = []  # (経過秒, role, action, ok)
+        # [by, cheatType, seq, 指摘されたか]。表示用の cheatLog は古いものから捨てるので、集計にはこちらを使う
+        self.cheat_record: List[List[Any]] = []
+        # 対戦途中で全員いなくなったときの片付け予約
+        self.reap_task: Optional[asyncio.Task] = None
+        # CPU 時間の計測（使いすぎたルームは throttled にして間引く）
+        self.cpu = RoomCpu()
+        self.reset(room_id)
+
+    def reset(self, room_id: str, first_attack_role: Optional[str] = None) -> None:
+        """
+        新しい対戦用に初期化する（ルームプールで再利用するため、コンテナは作り直さず空にする）
+        ループタスクは止めておくこと
+        """
+        self.room_id = room_id
+        self.state = GameState()
+        self.first_attack_role = first_attack_role  # "player" or "opponent"
+        self.clients.clear()
+        self.client_cursors.clear()
+        self.seq = 0
+        self.replay.clear()
+        self.sessions.clear()
+        self.player_names.clear()
+        self._player_views.clear()
+        self._cheat_view: Tuple[Tuple, Tuple[Dict[str, Any], ...]] = ((), ())
+        self.current = StateVersion(0, self._build_view(), self._build_legal())
+        self.last_broadcast_version = -1  # 最後にstateを配信したバージョン
+        self.spectator_version = -1       # 観戦者へ最後に送ったバージョン
+        self.spectator_sent_at = 0.0
+        self.cursor_accepted_at.clear()
+        self.ticks = 0
+        self.cpu.reset()
+        self.throttled = False
+        self.match_started_at: Optional[float] = None
+        self.action_log.clear()
+        self.cheat_record.clear()
+        self.archived = False
+
+    async def stop_loop(self) -> None:
+        if self.loop_task is None:
+            return
+        task, self.loop_task = self.loop_task, None
+        if task is not asyncio.current_task():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    @property
+    def started(self) -> bool:
+        return self.state.started
 
     def roles_in_use(self) -> Set[str]:
-        return set(self.clients.values())
+        used = set(self.clients.values())
+        # 切断直後のプレイヤーの席は猶予時間内は確保しておく
+        now = get_clock().time()
+        for sess in self.sessions.values():
+            if sess.disconnected_at is not None and now - sess.disconnected_at <= RESUME_GRACE_SEC:
+                used.add(sess.role)
+        return used
+
+    def player_count(self) -> int:
+        return sum(1 for r in self.clients.values() if r != "spectator")
 
     def assign_role(self) -> str:
         used = self.roles_in_use()
@@ -108,26 +209,68 @@ class Room:
             return "opponent"
         return "spectator"
 
-    def snapshot(self) -> Dict[str, Any]:
-        s = self.state
-
-        def player_view(ps: PlayerState) -> Dict[str, Any]:
-            return {
-                "hp": ps.hp,
-                "mana": ps.mana,
-                "maxMana": ps.maxMana,
-                "hand": ps.hand,
-                "field": ps.field,
-                "deck": ps.deck,
-                "penalty": ps.penalty,
-            }
+    def _update_lobby_locked(self) -> None:
+        """ロビーの索引へ現在の状況を反映する（参加・退出・開始・終了のたびに呼ぶ）"""
+        if self.state.isGameOver:
+            LOBBY.remove(self.room_id)
+            return
+        players = self.player_count()
+        if self.started:
+            status: Optional[str] = lobby.IN_PROGRESS
+        elif self.assign_role() != "spectator":
+            status = lobby.WAITING
+        else:
+            # 開始前だが再接続待ちで席が埋まっている
+            status = None
+        LOBBY.update(self.room_id, status, players, len(self.clients) - players)
+
+    def _update_throttle_locked(self) -> None:
+        """直近の CPU 時間が予算を超えたら間引く（ティックごとに見直す）"""
+        used = self.cpu.window()
+        budget = ROOM_CPU_BUDGET * roomcpu.WINDOW_SEC
+        # 予算の前後で切り替わり続けないよう、戻すのは半分を下回ってから
+        throttled = used > (budget / 2 if self.throttled else budget)
+        if throttled != self.throttled:
+            self.throttled = throttled
+            AUDIT.record("throttle", room=self.room_id, throttled=throttled, cpuMs=round(used * 1000, 1))
 
+    def snapshot(self) -> Dict[str, Any]:
+        """現在の公開スナップショット（ロック不要・読み取り専用）"""
+        return self.current.view
+
+    def _player_view(self, role: str, ps: PlayerState) -> Dict[str, Any]:
+        key = (ps.hp, ps.mana, ps.maxMana, tuple(ps.hand), tuple(ps.field), ps.deck, ps.penalty)
+        cached = self._player_views.get(role)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        view = {
+            "hp": ps.hp,
+            "mana": ps.mana,
+            "maxMana": ps.maxMana,
+            "hand": key[3],
+            "field": key[4],
+            "deck": ps.deck,
+            "penalty": ps.penalty,
+        }
+        self._player_views[role] = (key, view)
+        return view
+
+    def _cheat_log_view(self) -> Tuple[Dict[str, Any], ...]:
+        log = self.state.cheatLog
+        # 追記のみなので「件数と末尾の要素」が同じなら前のビューを使い回す
+        key = (len(log), id(log[-1]) if log else None)
+        if self._cheat_view[0] == key:
+            return self._cheat_view[1]
         # cheatLog は“内容”は見せる（ゲーム仕様）想定。ただしpayloadは必要最小限
-        cheat_log = [
-            {"ts": item.ts, "by": item.by, "action": item.action, "payload": item.payload}
-            for item in s.cheatLog[-50:]
-        ]
+        view = tuple(
+            {"seq": item.seq, "ts": item.ts, "by": item.by, "action": item.action, "payload": item.payload}
+            for item in log[-50:]
+        )
+        self._cheat_view = (key, view)
+        return view
 
+    def _build_view(self) -> Dict[str, Any]:
+        s = self.state
         return {
             "roomId": self.room_id,
             "started": self.started,
@@ -139,18 +282,173 @@ class Room:
             "mulliganTimer": s.mulliganTimer,
             "playerMulliganDone": s.playerMulliganDone,
             "opponentMulliganDone": s.opponentMulliganDone,
-            "player": player_view(s.player),
-            "opponent": player_view(s.opponent),
-            "cards": [asdict(c) for c in CARD_DB],
-            "cheatLog": cheat_log,
+            "player": self._player_view("player", s.player),
+            "opponent": self._player_view("opponent", s.opponent),
+            "cheatLog": self._cheat_log_view(),
             "firstAttackRole": self.first_attack_role,
         }
 
-    async def broadcast(self, data: Dict[str, Any]) -> None:
+    def _build_legal(self) -> Dict[str, Dict[str, Any]]:
+        return {role: rules.legal_actions(self.state, role) for role in rules.ROLES}
+
+    def state_frame(self, role: str) -> Dict[str, Any]:
+        """現在の state フレーム（プレイヤーには自分の合法手を付ける）"""
+        cur = self.current
+        data: Dict[str, Any] = {"type": "state", "state": cur.view}
+        if role in cur.legal:
+            data["legal"] = cur.legal[role]
+        return data
+
+    def _publish_locked(self) -> StateVersion:
+        """作業中の状態から次のバージョンを作って差し替える（変化がなければ据え置き）"""
+        view = self._build_view()
+        cur = self.current
+        if view != cur.view:
+            cur = StateVersion(cur.version + 1, view, self._build_legal())
+            self.current = cur
+        return cur
+
+    async def broadcast_state(
+        self, actor: Optional[WebSocket] = None, result: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """
+        未配信のバージョンがあれば state を全員へ送る（混雑時、観戦者へは間引く）。
+        actor/result を渡すと、その接続には結果を載せた state を送る（ack を別に送らなくてよい）。
+        送ったかどうかを返す
+        """
+        cur = self.current
+        if cur.version == self.last_broadcast_version:
+            return False
+        self.last_broadcast_version = cur.version
+        to_spectators = self._spectators_due()
+        if to_spectators:
+            self._mark_spectators_sent(cur.version)
+
+        # state 本体は1回だけ JSON にして、プレイヤーごとの合法手（と本人への結果）を後ろに足す
+        with self.cpu:
+            self.seq += 1
+            head = self._encode_head({"type": "state", "state": cur.view})
+            text = self._join(head, self.seq)
+            self.replay.append((self.seq, text))
+            by_role = {role: self._join(head, self.seq, {"legal": legal}) for role, legal in cur.legal.items()}
+            personal: Dict[WebSocket, str] = {}
+            for ws, role in self.clients.items():
+                if ws is actor and result:
+                    personal[ws] = self._join(head, self.seq, {**result, "legal": cur.legal.get(role)})
+                elif role in by_role:
+                    personal[ws] = by_role[role]
+        await self._send_text_all(text, None if to_spectators else (lambda role: role != "spectator"), personal)
+        return True
+
+    def _spectators_due(self) -> bool:
+        return time.monotonic() - self.spectator_sent_at >= ADMISSION.spectator_interval(self.throttled)
+
+    def _mark_spectators_sent(self, version: int) -> None:
+        self.spectator_version = version
+        self.spectator_sent_at = time.monotonic()
+
+    async def _catch_up_spectators(self) -> None:
+        """間引きで送らなかった最新stateを、間隔が空いたら観戦者へまとめて送る"""
+        cur = self.current
+        if cur.version == self.spectator_version or not self._spectators_due():
+            return
+        self._mark_spectators_sent(cur.version)
+        with self.cpu:
+            text = self._encode({"type": "state", "state": cur.view}, self.seq)
+        await self._send_text_all(text, lambda role: role == "spectator")
+
+    # =========================
+    # セッション（再接続）
+    # =========================
+    def open_session(self, ws: WebSocket, role: str) -> str:
+        """新しい参加者にレジューム用トークンを発行する"""
+        token = secrets.token_urlsafe(16)
+        self.sessions[token] = Session(token=token, role=role, ws=ws)
+        return token
+
+    def resume_session(self, token: str, ws: WebSocket) -> Tuple[Optional[str], Optional[WebSocket]]:
+        """
+        トークンが有効なら同じ席で再接続させる。
+        戻り値: (role, 切り離した古いソケット)。無効なトークンなら role は None
+        """
+        sess = self.sessions.get(token)
+        if sess is None:
+            return None, None
+        if sess.disconnected_at is not None and get_clock().time() - sess.disconnected_at > RESUME_GRACE_SEC:
+            self.sessions.pop(token, None)
+            return None, None
+        stale = sess.ws
+        if stale is not None:
+            # 切断をまだ検知していない古い接続から席を引き継ぐ
+            self.clients.pop(stale, None)
+        sess.ws = ws
+        sess.disconnected_at = None
+        self.clients[ws] = sess.role
+        return sess.role, stale
+
+    def detach_session(self, ws: WebSocket) -> bool:
+        """切断されたソケットのセッションを猶予状態にする。席を引き継がれていればFalse"""
+        for sess in self.sessions.values():
+            if sess.ws is ws:
+                sess.ws = None
+                sess.disconnected_at = get_clock().time()
+                return True
+        return False
+
+    def replay_since(self, last_seq: Optional[int]) -> Optional[List[str]]:
+        """last_seq より後のフレームを返す。バッファから溢れていればNone（スナップショットで代替）"""
+        if last_seq is None or last_seq > self.seq:
+            return None
+        if last_seq == self.seq:
+            return []
+        if not self.replay or self.replay[0][0] > last_seq + 1:
+            return None
+        return [text for seq, text in self.replay if seq > last_seq]
+
+    # =========================
+    # 送信
+    # =========================
+    def _encode(self, data: Dict[str, Any], seq: int) -> str:
+        return json.dumps({**data, "seq": seq}, ensure_ascii=False)
+
+    @staticmethod
+    def _encode_head(data: Dict[str, Any]) -> str:
+        """閉じ括弧を除いた JSON（_join で宛先ごとの項目と seq を足して閉じる）"""
+        return json.dumps(data, ensure_ascii=False)[:-1]
+
+    @staticmethod
+    def _join(head: str, seq: int, extra: Optional[Dict[str, Any]] = None) -> str:
+        tail = json.dumps({**extra, "seq": seq} if extra else {"seq": seq}, ensure_ascii=False)
+        return head + ", " + tail[1:]
+
+    async def send(self, ws: WebSocket, data: Dict[str, Any]) -> None:
+        """個別フレーム（hello/ack/error等）。通し番号は進めず現在値を付ける"""
+        await ws.send_text(self._encode(data, self.seq))
+
+    async def broadcast(self, data: Dict[str, Any], buffered: bool = True, spectators: bool = True) -> None:
+        # buffered=True のフレームは通し番号を進めてリプレイバッファに積む
+        # （タイマー等の使い捨てフレームは現在の番号を付けるだけ）
+        with self.cpu:
+            if buffered:
+                self.seq += 1
+                text = self._encode(data, self.seq)
+                self.replay.append((self.seq, text))
+            else:
+                text = self._encode(data, self.seq)
+        await self._send_text_all(text, None if spectators else (lambda role: role != "spectator"))
+
+    async def _send_text_all(
+        self,
+        text: str,
+        include: Optional[Callable[[str], bool]] = None,
+        personal: Optional[Dict[WebSocket, str]] = None,
+    ) -> None:
         dead: List[WebSocket] = []
-        for ws in list(self.clients.keys()):
+        for ws, role in list(self.clients.items()):
+            if include is not None and not include(role):
+                continue
             try:
-                await ws.send_text(json.dumps(data, ensure_ascii=False))
+                await ws.send_text(personal.get(ws, text) if personal else text)
             except Exception:
                 dead.append(ws)
         for ws in dead:
@@ -163,44 +461,46 @@ class Room:
 
     async def _game_loop(self) -> None:
         # ターンタイマー（サーバー権威）
+        # 毎回 sleep(1) すると処理時間ぶんずつ遅れていくので、予定時刻を基準に眠る
+        # （時計は差し替え可能。シミュレーションでは仮想時計で待たずに進める）
+        clock = get_clock()
+        next_tick = clock.monotonic()
         try:
             while True:
-                await asyncio.sleep(1)
+                next_tick += 1
+                await clock.sleep(max(0.0, next_tick - clock.monotonic()))
                 async with self.lock:
+                    self._update_throttle_locked()
                     if not self.started:
                         continue
                     if self.state.isGameOver:
+                        # 決着した局面がまだ出ていなければ（間引き中に決着した等）ここで送る
+                        if not self.current.view["isGameOver"]:
+                            with self.cpu:
+                                self._publish_locked()
+                            await self.broadcast_state()
                         continue
 
-                    # マリガンフェーズの処理
-                    if self.state.isMulliganPhase:
-                        self.state.mulliganTimer -= 1
-                        if self.state.mulliganTimer <= 0:
-                            await self._execute_mulligan_locked()
-                        elif self.state.playerMulliganDone and self.state.opponentMulliganDone:
-                            await self._execute_mulligan_locked()
-                    else:
-                        # 通常のターンタイマー
-                        self.state.timer -= 1
-                        if self.state.timer <= 0:
-                            await self._switch_turn_locked()
-
-                    # 現在の状態スナップショットを取得
-                    current_snap = self.snapshot()
-                    
+                    # マリガン締め切り・ターンタイマー
+                    with self.cpu:
+                        rules.tick(self.state)
+                        self._publish_locked()
+
                     # ゲーム状態が変更された場合のみ送信
-                    if self.last_game_state != current_snap:
-                        await self.broadcast({"type": "state", "state": current_snap})
-                        self.last_game_state = current_snap.copy() if isinstance(current_snap, dict) else current_snap
-                    
-                    # タイマー・カーソル情報は常時送信
+                    await self.broadcast_state()
+                    await self._catch_up_spectators()
+
+                    # タイマー・カーソル情報（混雑時は間引く）
+                    self.ticks += 1
+                    if self.ticks % ADMISSION.realtime_every(self.throttled):
+                        continue
                     realtime_data = {
                         "type": "realtime",
                         "timer": self.state.timer if not self.state.isMulliganPhase else None,
                         "mulliganTimer": self.state.mulliganTimer if self.state.isMulliganPhase else None,
                         "cursors": self.client_cursors
                     }
-                    await self.broadcast(realtime_data)
+                    await self.broadcast(realtime_data, buffered=False)
         except asyncio.CancelledError:
             return
 
@@ -208,37 +508,106 @@ class Room:
         if self.started:
             return
         import random
-        self.started = True
-        self.state.isGameOver = False
-        self.state.winner = None
-        self.state.currentTurn = "player"
-        self.state.timer = TURN_SECONDS
-        self.state.cheatLog.clear()
 
         # 先攻・後攻は部屋作成者（player1）が決定し、既に決まっていれば再利用
         if self.first_attack_role is None:
             self.first_attack_role = random.choice(["player", "opponent"])
 
-        # 先攻3枚、後攻4枚の初期手札を自動的に配る
-        if self.first_attack_role == "player":
-            # playerが先攻なので3枚
-            self.state.player.hand = [c.id for c in CARD_DB[:3]]
-            # opponentが後攻なので4枚
-            self.state.opponent.hand = [c.id for c in CARD_DB[:4]]
-        else:
-            # opponentが先攻なので3枚
-            self.state.opponent.hand = [c.id for c in CARD_DB[:3]]
-            # playerが後攻なので4枚
-            self.state.player.hand = [c.id for c in CARD_DB[:4]]
-        
-        # カード配布後、マリガン選択フェーズを開始
-        self.state.isMulliganPhase = True
-        self.state.mulliganTimer = 10  # マリガン選択時間を10秒に
-        self.state.playerMulliganDone = False
-        self.state.opponentMulliganDone = False
-        self.state.playerMulliganCards.clear()
-        self.state.opponentMulliganCards.clear()
-    
+        # 初期手札の配布とマリガン選択フェーズの開始
+        with self.cpu:
+            rules.start_game(self.state, self.first_attack_role)
+        self.match_started_at = get_clock().time()
+        self.action_log.clear()
+        self.cheat_record.clear()
+        self.archived = False
+        self._update_lobby_locked()
+
+    def _record_action_locked(self, role: str, action: str, ok: bool) -> None:
+        if self.match_started_at is None or len(self.action_log) >= ACTION_LOG_MAX:
+            # 上限を超えた分は残さない（アーカイブには先頭 ACTION_LOG_MAX 件が入る）
+            return
+        self.action_log.append((get_clock().time() - self.match_started_at, role, action, ok))
+
+    def _record_cheat_locked(self, item: rules.CheatLogItem) -> None:
+        """cheatLog に積まれたイカサマ・指摘をアーカイブ用の記録へ反映する"""
+        if item.action == "accuse":
+            # 指摘されたイカサマに印を付ける（seq は対戦内で一意。指摘できるのは直近のものだけなので後ろから探す）
+            target_seq = item.payload.get("targetSeq")
+            for rec in reversed(self.cheat_record):
+                if rec[2] == target_seq:
+                    rec[3] = True
+                    break
+            return
+        if len(self.cheat_record) < CHEAT_RECORD_MAX:
+            self.cheat_record.append([item.by, item.action, item.seq, False])
+
+    def _archive_match_locked(self) -> None:
+        """ゲーム終了時に一度だけ対戦結果をアーカイブへ渡す"""
+        if self.archived or not self.state.isGameOver or self.match_started_at is None:
+            return
+        self.archived = True
+        s = self.state
+        finished_at = get_clock().time()
+        ARCHIVE.append(MatchRecord(
+            started_at=self.match_started_at,
+            duration=finished_at - self.match_started_at,
+            winner=s.winner,
+            first_attack_role=self.first_attack_role,
+            player_penalty=s.player.penalty,
+            opponent_penalty=s.opponent.penalty,
+            turns=s.turnCount,
+            actions=list(self.action_log),
+            cheats=[(by, cheat_type, caught) for by, cheat_type, _, caught in self.cheat_record],
+        ))
+        RESULTS.record(MatchResult(
+            room_id=self.room_id,
+            finished_at=finished_at,
+            duration=finished_at - self.match_started_at,
+            winner=s.winner,
+            player=self.player_names.get("player"),
+            opponent=self.player_names.get("opponent"),
+            player_penalty=s.player.penalty,
+            opponent_penalty=s.opponent.penalty,
+            turns=s.turnCount,
+        ))
+
+    # =========================
+    # 引き継ぎ（デプロイ時に別プロセスへ渡す）
+    # =========================
+    def export_handoff_locked(self) -> Dict[str, Any]:
+        """再接続後に同じ席・同じ局面から続けられるだけの情報を書き出す（ループは止めておくこと）"""
+        return {
+            "roomId": self.room_id,
+            "state": rules.state_to_dict(self.state),
+            "firstAttackRole": self.first_attack_role,
+            "seq": self.seq,
+            "ticks": self.ticks,
+            "matchStartedAt": self.match_started_at,
+            "actionLog": self.action_log,
+            "cheatRecord": self.cheat_record,
+            "archived": self.archived,
+            # 再接続用トークン。接続中だった人も受け取り側では「切断直後」として席を確保する
+            "sessions": [[sess.token, sess.role, sess.disconnected_at] for sess in self.sessions.values()],
+            "playerNames": self.player_names,
+        }
+
+    def restore_handoff_locked(self, data: Dict[str, Any]) -> None:
+        self.state = rules.state_from_dict(data["state"])
+        self.first_attack_role = data["firstAttackRole"]
+        # 通し番号を引き継ぐので、クライアントの last_seq はそのまま使える
+        self.seq = data["seq"]
+        self.ticks = data["ticks"]
+        self.match_started_at = data["matchStartedAt"]
+        self.action_log[:] = [tuple(item) for item in data["actionLog"]]
+        self.cheat_record[:] = [list(item) for item in data.get("cheatRecord", [])]
+        self.archived = data["archived"]
+        self.player_names.update(data.get("playerNames", {}))
+        now = get_clock().time()
+        for token, role, disconnected_at in data["sessions"]:
+            self.sessions[token] = Session(token=token, role=role, disconnected_at=disconnected_at or now)
+        self._publish_locked()
+        self.last_broadcast_version = self.current.version
+
     def _action_update_cursor_locked(self, role: str, payload: Dict[str, Any]) -> Tuple[bool, str]:
         """カーソル位置を更新"""
         try:
@@ -250,420 +619,832 @@ class Room:
                 'x': x,
                 'y': y,
                 'cardId': card_id,
-                'timestamp': time.time()
+                'timestamp': get_clock().time()
             }
             
             return True, "cursor updated"
         except Exception as e:
             return False, f"カーソル更新エラー: {str(e)}"
 
-    async def _switch_turn_locked(self) -> None:
-        s = self.state
-        s.currentTurn = "opponent" if s.currentTurn == "player" else "player"
-        s.timer = TURN_SECONDS
-
-    def _get_ps(self, role: str) -> PlayerState:
-        return self.state.player if role == "player" else self.state.opponent
-
-    def _get_enemy_ps(self, role: str) -> PlayerState:
-        return self.state.opponent if role == "player" else self.state.player
-
-    def _end_game_if_needed_locked(self) -> None:
-        s = self.state
-        if s.isGameOver:
-            return
-
-        if s.player.hp <= 0:
-            s.isGameOver = True
-            s.winner = "opponent"
-        elif s.opponent.hp <= 0:
-            s.isGameOver = True
-            s.winner = "player"
-
-        if s.player.penalty >= MAX_PENALTY:
-            s.isGameOver = True
-            s.winner = "opponent"
-        elif s.opponent.penalty >= MAX_PENALTY:
-            s.isGameOver = True
-            s.winner = "player"
-
     # =========================
     # アクション処理
     # =========================
-    async def handle_action(self, role: str, action: str, payload: Dict[str, Any]) -> Tuple[bool, str]:
+    async def handle_action(
+        self, role: str, action: str, payload: Dict[str, Any], trace: Trace = NOOP_TRACE,
+        ws: Optional[WebSocket] = None,
+    ) -> Tuple[bool, str]:
+        """ws を渡すと、その接続がまだこのルームの role の席にいるときだけ適用する"""
         # spectator は操作不可
         if role not in ("player", "opponent"):
             return False, "spectator は操作できません"
 
-        async with self.lock:
-            if action == "start":
-                # 2人揃ってなくても開始はできるが、通常は2人推奨
-                await self.start_game_locked()
-                await self.ensure_loop()
-                return True, "started"
+        # 混雑時はカーソル更新を間引く（ロックを取る前に捨てる）
+        if action == "cursor":
+            interval = ADMISSION.cursor_interval(self.throttled)
+            now = time.monotonic()
+            if interval and now - self.cursor_accepted_at.get(role, 0.0) < interval:
+                return True, "cursor throttled"
+            self.cursor_accepted_at[role] = now
 
-            if not self.started:
-                return False, "ゲームが開始されていません（start を実行してください）"
+        wait_start = time.time_ns()
+        async with self.lock:
+            trace.add("room.lock.wait", wait_start, time.time_ns())
+            # ロック待ちの間に別プロセスへ引き継がれた
+            if ROOMS.get(self.room_id) is not self:
+                return False, "サーバーを移行中です（再接続してください）"
+            if ws is not None and self.clients.get(ws) != role:
+                return False, "このルームの席から外れています（再接続してください）"
+            with trace.span("handler"):
+                ok, reason = await self._apply_action_locked(role, action, payload)
+            with self.cpu:
+                self._audit_action_locked(role, action, payload, ok, reason, trace)
+                # 間引き中のルームはスナップショットもティックでまとめて作る（決着した局面はすぐ作る）
+                if action != "cursor" and (not self.throttled or self.state.isGameOver):
+                    with trace.span("snapshot"):
+                        self._publish_locked()
+            return ok, reason
+
+    def _audit_action_locked(
+        self, role: str, action: str, payload: Dict[str, Any], ok: bool, reason: str, trace: Trace
+    ) -> None:
+        """アクションの結果を監査ログへ（ロック内で積むので、記録の順序は適用順と一致する）"""
+        fields: Dict[str, Any] = {"room": self.room_id, "role": role, "action": action, "ok": ok, "reason": reason}
+        if trace is not NOOP_TRACE:
+            fields["traceId"] = trace.trace_id
+        if action == "cursor":
+            # 件数が多いので座標は残さない
+            AUDIT.record("action", **fields)
+            return
+        # イカサマ・指摘は別のイベント名にして絞り込みやすくする
+        AUDIT.record(action if action in ("cheat", "accuse") else "action", **fields, payload=payload)
+
+    async def _apply_action_locked(self, role: str, action: str, payload: Dict[str, Any]) -> Tuple[bool, str]:
+        if action == "start":
+            # 2人揃ってなくても開始はできるが、通常は2人推奨
+            await self.start_game_locked()
+            await self.ensure_loop()
+            self._record_action_locked(role, action, True)
+            return True, "started"
+
+        # 以降は await しないので、まとめてこのルームの CPU 時間に数える
+        with self.cpu:
+            # カーソル位置更新
+            if action == "cursor":
+                if not self.started:
+                    return False, "ゲームが開始されていません（start を実行してください）"
+                if self.state.isGameOver:
+                    return False, "ゲームは終了しています"
+                return self._action_update_cursor_locked(role, payload)
 
+            # 対戦中のアクションはルールコアで処理
+            log = self.state.cheatLog
+            last = log[-1] if log else None
+            ok, reason = rules.apply_action(self.state, role, action, payload)
+            self._record_action_locked(role, action, ok)
+            if log and log[-1] is not last:
+                # 1回のアクションで積まれるのは1件まで
+                self._record_cheat_locked(log[-1])
             if self.state.isGameOver:
-                return False, "ゲームは終了しています"
+                self._archive_match_locked()
+                self._update_lobby_locked()
+            return ok, reason
 
-            # 通常行動
-            if action == "play-card":
-                return self._action_play_card_locked(role, payload)
+ROOMS: Dict[str, Room] = {}
+ARCHIVE = MatchArchiveWriter(ARCHIVE_PATH)
+AUDIT = AuditLog(AUDIT_PATH)
+RESULTS = ResultStore(RESULTS_PATH)
+TRACER = Tracer(TRACE_PATH, sample_rate=TRACE_SAMPLE_RATE)
+LOBBY = LobbyIndex(max_spectators=MAX_SPECTATORS)
+HANDOFF_RECEIVER: Optional[HandoffReceiver] = None
+ADMISSION = AdmissionController(
+    room_count=lambda: len(ROOMS),
+    max_rooms=ADMISSION_MAX_ROOMS,
+    lag_degrade_ms=ADMISSION_LAG_DEGRADE_MS,
+    lag_reject_ms=ADMISSION_LAG_REJECT_MS,
+)
 
-            if action == "end-turn":
-                if self.state.currentTurn != role:
-                    return False, "自分のターンではありません"
-                await self._switch_turn_locked()
-                return True, "turn switched"
 
-            # イカサマ（ゲーム内で許可された「ズル」）
-            if action == "cheat":
-                return self._action_cheat_locked(role, payload)
+class RoomPool:
+    """リセット済みの Room を貯めておき、接続時のルーム生成コストを先払いする"""
 
-            # 指摘
-            if action == "accuse":
-                return self._action_accuse_locked(role, payload)
+    def __init__(self, max_size: int = ROOM_POOL_SIZE):
+        self.max_size = max_size
+        self.free: List[Room] = []
 
-            # マリガン
-            if action == "mulligan":
-                return self._action_mulligan_locked(role, payload)
-            
-            # カーソル位置更新
-            if action == "cursor":
-                return self._action_update_cursor_locked(role, payload)
+    def prewarm(self, n: int) -> None:
+        while len(self.free) < min(n, self.max_size):
+            self.free.append(Room(""))
 
-            return False, f"不明なaction: {action}"
+    def acquire(self, room_id: str, first_attack_role: Optional[str] = None) -> Room:
+        if self.free:
+            room = self.free.pop()
+            room.reset(room_id, first_attack_role)
+            return room
+        room = Room(room_id)
+        room.first_attack_role = first_attack_role
+        return room
 
-    def _action_play_card_locked(self, role: str, payload: Dict[str, Any]) -> Tuple[bool, str]:
-        if self.state.currentTurn != role:
-            return False, "自分のターンではありません"
+    def release(self, room: Room) -> None:
+        if len(self.free) < self.max_size:
+            room.reset("")
+            self.free.append(room)
 
-        hand_index = int(payload.get("handIndex", -1))
-        ps = self._get_ps(role)
 
-        if hand_index < 0 or hand_index >= len(ps.hand):
-            return False, "handIndexが不正です"
+POOL = RoomPool()
 
-        card_id = ps.hand[hand_index]
-        card = next((c for c in CARD_DB if c.id == card_id), None)
-        if not card:
-            return False, "カードが存在しません"
 
-        if ps.mana < card.cost:
-            return False, "マナが足りません"
+def get_room(room_id: str) -> Room:
+    if room_id not in ROOMS:
+        ROOMS[room_id] = POOL.acquire(room_id)
+    return ROOMS[room_id]
 
-        # 状態更新
-        ps.mana -= card.cost
-        ps.hand.pop(hand_index)
-        ps.field.append(card_id)
 
-        self._end_game_if_needed_locked()
-        return True, "played"
+async def recycle_room(room: Room) -> None:
+    """
+    誰もいなくなったルームを一覧から外し、プールへ戻す。
+    終了した対戦はすぐに、開始前・対戦途中のものは再接続の猶予が過ぎてから片付ける
+    """
+    # 引き継ぎ済みなど、既に一覧から外れたルームは触らない
+    if room.clients or ROOMS.get(room.room_id) is not room:
+        return
+    if not room.state.isGameOver:
+        if room.reap_task is None or room.reap_task.done():
+            room.reap_task = asyncio.create_task(_reap_abandoned(room, room.room_id))
+        return
+    del ROOMS[room.room_id]
+    LOBBY.remove(room.room_id)
+    await room.stop_loop()
+    POOL.release(room)
+
+
+async def _reap_abandoned(room: Room, room_id: str) -> None:
+    delay = RESUME_GRACE_SEC
+    while True:
+        await get_clock().sleep(delay)
+        # 誰かが戻ってきた・既に片付いた・別のルームとして再利用された
+        if room.clients or ROOMS.get(room_id) is not room:
+            break
+        # 後から切断したプレイヤーがいれば、その猶予が過ぎるまで待つ
+        last = max((sess.disconnected_at or 0.0 for sess in room.sessions.values()), default=0.0)
+        delay = last + RESUME_GRACE_SEC - get_clock().time()
+        if delay <= 0:
+            del ROOMS[room_id]
+            LOBBY.remove(room_id)
+            await room.stop_loop()
+            POOL.release(room)
+            break
+    if room.reap_task is asyncio.current_task():
+        room.reap_task = None
+
+
+def prepare_room(data: Dict[str, Any]) -> Room:
+    """引き継ぎで受け取ったルームを復元する（まだ一覧に載せず、ループも動かさない）"""
+    room_id = data["roomId"]
+    if room_id in ROOMS:
+        # 既にこちらで動いているルームは上書きしない（送信側はそのルームを手元で続ける）
+        raise ValueError(f"同じIDのルームが既にあります: {room_id}")
+    room = POOL.acquire(room_id)
+    try:
+        room.restore_handoff_locked(data)
+    except Exception:
+        POOL.release(room)
+        raise
+    return room
+
+
+def commit_room(room: Room) -> None:
+    """prepare_room で復元したルームを登録し、ループを再開する"""
+    if room.room_id in ROOMS:
+        # prepare の後に同じIDで作られた
+        raise ValueError(f"同じIDのルームが既にあります: {room.room_id}")
+    ROOMS[room.room_id] = room
+    room._update_lobby_locked()
+    if room.started and not room.state.isGameOver:
+        room.loop_task = asyncio.create_task(room._game_loop())
+
+
+def discard_room(room: Room) -> None:
+    """commit されなかったルームをプールへ戻す"""
+    POOL.release(room)
+
+
+async def drain_rooms(path: str) -> Tuple[List[float], Optional[str]]:
+    """
+    新規ルームの受け付けを止め、全ルームを path で待つ新しいプロセスへ渡す。
+    ルームごとに「ロックを取ってから相手の確認応答が届くまで」の停止時間（秒）と、
+    途中で失敗したときはその理由を返す。引き継ぎ先が断った・取り消したルームと未送信のルームはこのプロセスで続け、
+    受け付けも再開する。commit の確認応答が来なかったルームは引き継ぎ先で動いているものとして、こちらでは止める。
+    接続できなければ OSError（何も渡していない）
+    """
+    sender = await HandoffSender.connect(path)
+    ADMISSION.drain()
+    pauses: List[float] = []
+    notices: List[asyncio.Task] = []
+    error: Optional[str] = None
+    finished = False
+    try:
+        for room in list(ROOMS.values()):
+            in_doubt = False
+            t0 = time.perf_counter()
+            async with room.lock:
+                if ROOMS.get(room.room_id) is not room:
+                    continue
+                await room.stop_loop()
+                try:
+                    await sender.send_room(room.export_handoff_locked())
+                except Exception as e:
+                    error = str(e) if isinstance(e, HandoffError) else repr(e)
+                    in_doubt = isinstance(e, HandoffError) and not e.resumable
+                    if not in_doubt:
+                        # 相手では動いていない（断られた・取り消しを確認した）ので、止めたタイマーを戻して続ける
+                        if room.started and not room.state.isGameOver:
+                            await room.ensure_loop()
+                        break
+                    # 相手で動き始めているかもしれない。両方で動かさないよう、こちらでは渡したものとして扱う
+                    error += f"（{room.room_id} は引き継ぎ先で動いている可能性があるため、こちらでは止めました）"
+                clients = list(room.clients)
+                # 以降この部屋への退出処理（退出通知・片付け）は行わない
+                room.clients.clear()
+                room.sessions.clear()
+                del ROOMS[room.room_id]
+                LOBBY.remove(room.room_id)
+            pauses.append(time.perf_counter() - t0)
+
+            # 切断の完了は待たずに次のルームへ進む
+            text = room._encode({"type": "reconnect", "reason": "server restart"}, room.seq)
+            notices += [asyncio.create_task(_send_reconnect(ws, text)) for ws in clients]
+            if in_doubt:
+                break
+        if error is None:
+            finished = True
+            try:
+                await sender.finish()
+            except (OSError, asyncio.TimeoutError) as e:
+                # ルームはすべて確認応答済みなので、終わりの合図が届かなくても引き継ぎは済んでいる
+                error = f"終了の確認応答がありません: {e!r}"
+    finally:
+        if not finished:
+            sender.abort()
+        if ROOMS:
+            # 渡しきれなかったルームがある
+            ADMISSION.undrain()
+        await asyncio.gather(*notices)
+    return pauses, error
 
-    def _log_cheat_locked(self, by: str, action: str, payload: Dict[str, Any]) -> None:
-        self.state.cheatLog.append(
-            CheatLogItem(ts=time.time(), by=by, action=action, payload=payload)
-        )
 
-    def _action_cheat_locked(self, role: str, payload: Dict[str, Any]) -> Tuple[bool, str]:
-        """
-        フロントのメニューに合わせる（index.html）
-        - summon-own: 自分の手札から召喚（= 手札1枚を場に出す。マナ無視）
-        - destroy-opponent: 相手フォロワー破壊（相手fieldから1体消す）
-        - steal-opponent: 相手フォロワー奪う（相手fieldから1体→自分fieldへ）
-        - add-own-hand / remove-own-hand
-        - add-opponent-hand / remove-opponent-hand
-        - modify-hp / modify-mana
-        """
-        cheat_type = str(payload.get("cheatType", ""))
-        data = payload.get("data", {}) or {}
-
-        ps = self._get_ps(role)
-        enemy = self._get_enemy_ps(role)
-
-        # ここで“許可されたイカサマ”を適用する（＝ゲーム仕様）
-        if cheat_type == "summon-own":
-            idx = int(data.get("handIndex", 0))
-            if ps.hand and 0 <= idx < len(ps.hand):
-                card_id = ps.hand.pop(idx)
-                ps.field.append(card_id)
-            self._log_cheat_locked(role, cheat_type, {"handIndex": idx})
-
-        elif cheat_type == "destroy-opponent":
-            idx = int(data.get("fieldIndex", 0))
-            if enemy.field and 0 <= idx < len(enemy.field):
-                enemy.field.pop(idx)
-            self._log_cheat_locked(role, cheat_type, {"fieldIndex": idx})
-
-        elif cheat_type == "steal-opponent":
-            idx = int(data.get("fieldIndex", 0))
-            if enemy.field and 0 <= idx < len(enemy.field):
-                card_id = enemy.field.pop(idx)
-                ps.field.append(card_id)
-            self._log_cheat_locked(role, cheat_type, {"fieldIndex": idx})
-
-        elif cheat_type == "add-own-hand":
-            # カードを1枚増やす（DBからランダム風）
-            ps.hand.append(CARD_DB[int(time.time()) % len(CARD_DB)].id)
-            self._log_cheat_locked(role, cheat_type, {})
-
-        elif cheat_type == "remove-own-hand":
-            if ps.hand:
-                ps.hand.pop()
-            self._log_cheat_locked(role, cheat_type, {})
-
-        elif cheat_type == "add-opponent-hand":
-            enemy.hand.append(CARD_DB[int(time.time() * 1.7) % len(CARD_DB)].id)
-            self._log_cheat_locked(role, cheat_type, {})
-
-        elif cheat_type == "remove-opponent-hand":
-            if enemy.hand:
-                enemy.hand.pop()
-            self._log_cheat_locked(role, cheat_type, {})
-
-        elif cheat_type == "modify-hp":
-            target = str(data.get("target", "self"))  # "self" or "opponent"
-            delta = int(data.get("delta", 0))
-            tps = ps if target == "self" else enemy
-            tps.hp += delta
-            self._log_cheat_locked(role, cheat_type, {"target": target, "delta": delta})
-
-        elif cheat_type == "modify-mana":
-            target = str(data.get("target", "self"))
-            delta = int(data.get("delta", 0))
-            tps = ps if target == "self" else enemy
-            tps.mana = max(0, tps.mana + delta)
-            tps.maxMana = max(tps.maxMana, tps.mana)
-            self._log_cheat_locked(role, cheat_type, {"target": target, "delta": delta})
+async def _send_reconnect(ws: WebSocket, text: str) -> None:
+    try:
+        await ws.send_text(text)
+        await ws.close(code=HANDOFF_CLOSE_CODE)
+    except Exception:
+        pass
 
-        else:
-            return False, f"不明なcheatType: {cheat_type}"
 
-        self._end_game_if_needed_locked()
-        return True, "cheated"
+def provision_rooms(specs: List[Tuple[str, Optional[str]]]) -> Tuple[List[str], List[str]]:
+    """
+    (room_id, first_attack_role) の一覧からルームをまとめて用意し、ループも先に起動しておく
+    戻り値: (作成したID, 既に存在したID)
+    """
+    created: List[str] = []
+    skipped: List[str] = []
+    for room_id, first_attack_role in specs:
+        if room_id in ROOMS:
+            skipped.append(room_id)
+            continue
+        room = POOL.acquire(room_id, first_attack_role)
+        ROOMS[room_id] = room
+        room._update_lobby_locked()
+        room.loop_task = asyncio.create_task(room._game_loop())
+        created.append(room_id)
+    return created, skipped
 
-    def _action_accuse_locked(self, role: str, payload: Dict[str, Any]) -> Tuple[bool, str]:
-        """
-        指摘：直近10秒以内の相手のイカサマを当てる
-        payload:
-          - index: cheat候補のインデックス（cheatLogの末尾から数えるのでもOK）
-          - ts: 指摘したログのts（安全のため）
-        """
-        now = time.time()
-        idx = payload.get("index", None)
-        ts = payload.get("ts", None)
-
-        enemy_role = "opponent" if role == "player" else "player"
-
-        # 直近window内の、相手のcheatだけ抽出
-        recent = [
-            item for item in self.state.cheatLog
-            if item.by == enemy_role and (now - item.ts) <= ACCUSATION_WINDOW_SEC
-        ]
-        if not recent:
-            # 何もないのに指摘：自分にペナルティ
-            self._get_ps(role).penalty += 1
-            self._end_game_if_needed_locked()
-            return False, "直近10秒の相手のイカサマはありません（指摘失敗：自分にペナルティ）"
-
-        chosen: Optional[CheatLogItem] = None
-
-        if ts is not None:
+
+# =========================
+# FastAPI
+# =========================
+app = FastAPI()
+
+# 先攻・後攻ランダム決定API
+@app.post("/api/first_attack")
+async def decide_first_attack():
+    import random
+    first = random.choice(["player", "opponent"])
+    return {"first": first}
+
+# =========================
+# 管理API
+# =========================
+async def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="管理APIは無効です（IKASAMA_ADMIN_TOKEN を設定してください）")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="管理トークンが不正です")
+
+
+class RoomSpec(BaseModel):
+    roomId: str
+    firstAttackRole: Optional[str] = None
+
+
+class ProvisionRequest(BaseModel):
+    # rooms で個別指定するか、count + prefix で連番IDを作る
+    rooms: List[RoomSpec] = []
+    count: int = 0
+    prefix: str = "room-"
+    firstAttackRole: Optional[str] = None
+
+
+@app.post("/api/admin/rooms", dependencies=[Depends(require_admin)])
+async def admin_provision_rooms(req: ProvisionRequest):
+    """大会用：ルームを一括で用意する（プールから取り出し、ループも起動済みにする）"""
+    # 件数は一覧を作る前に見る（巨大な count でメモリを使わせない）
+    if req.count < 0:
+        raise HTTPException(status_code=400, detail=f"countが不正です: {req.count}")
+    if req.count + len(req.rooms) > MAX_PROVISION:
+        raise HTTPException(status_code=400, detail=f"一度に作れるルームは{MAX_PROVISION}件までです")
+    specs = [(r.roomId, r.firstAttackRole) for r in req.rooms]
+    specs += [(f"{req.prefix}{i}", req.firstAttackRole) for i in range(req.count)]
+    seen: Set[str] = set()
+    for room_id, role in specs:
+        if not room_id.strip():
+            raise HTTPException(status_code=400, detail="roomIdが空です")
+        if room_id in seen:
+            raise HTTPException(status_code=400, detail=f"roomIdが重複しています: {room_id}")
+        seen.add(room_id)
+        if role not in (None, "player", "opponent"):
+            raise HTTPException(status_code=400, detail=f"firstAttackRoleが不正です: {role}")
+    created, skipped = provision_rooms(specs)
+    return {"created": created, "skipped": skipped, "pooled": len(POOL.free)}
+
+
+class DrainRequest(BaseModel):
+    socket: str  # 新しいプロセスの IKASAMA_HANDOFF_LISTEN
+
+
+@app.post("/api/admin/drain", dependencies=[Depends(require_admin)])
+async def admin_drain(req: DrainRequest):
+    """デプロイ用：全ルームを新しいプロセスへ引き継ぎ、クライアントに再接続させる"""
+    try:
+        pauses, error = await drain_rooms(req.socket)
+    except OSError as e:
+        raise HTTPException(status_code=502, detail=f"引き継ぎ先に接続できません: {e}")
+    if error is not None and ROOMS:
+        # 一部だけ渡した。残りはこのプロセスで続けている
+        raise HTTPException(status_code=502, detail={
+            "error": f"引き継ぎが途中で失敗しました: {error}",
+            "moved": len(pauses),
+            "remaining": len(ROOMS),
+        })
+    ms = sorted(p * 1000 for p in pauses)
+
+    def pct(q: float) -> Optional[float]:
+        return round(ms[min(len(ms) - 1, int(len(ms) * q))], 3) if ms else None
+
+    return {
+        "rooms": len(ms),
+        "pauseMs": {"p50": pct(0.5), "p99": pct(0.99), "max": round(ms[-1], 3) if ms else None},
+    }
+
+
+@app.get("/api/admin/admission", dependencies=[Depends(require_admin)])
+async def admin_admission():
+    """受け入れ制御の今の負荷レベル・ループ遅延・しきい値・拒否した数"""
+    return ADMISSION.stats()
+
+
+@app.get("/api/admin/rooms/hot", dependencies=[Depends(require_admin)])
+async def admin_hot_rooms(limit: int = 10):
+    """直近の窓で CPU 時間を多く使っているルーム（多い順）"""
+    now = time.monotonic()
+    window = roomcpu.WINDOW_SEC
+    usage = heapq.nlargest(
+        max(1, min(limit, 100)),
+        ((room.cpu.window(now), room) for room in ROOMS.values()),
+        key=lambda item: item[0],
+    )
+    return {
+        "windowSec": window,
+        "budgetMs": round(ROOM_CPU_BUDGET * window * 1000, 1),
+        "throttled": sum(1 for room in ROOMS.values() if room.throttled),
+        "rooms": [
+            {
+                "roomId": room.room_id,
+                "cpuMs": round(used * 1000, 2),
+                "loadPct": round(used / window * 100, 2),  # 1コアに対する割合
+                "totalCpuMs": round(room.cpu.total * 1000, 2),
+                "throttled": room.throttled,
+                "started": room.started,
+                "clients": len(room.clients),
+            }
+            for used, room in usage
+        ],
+    }
+
+
+# =========================
+# ロビー
+# =========================
+@app.get("/api/lobby")
+async def lobby_rooms(
+    filter_name: str = Query(lobby.ALL, alias="filter"),
+    cursor: Optional[str] = None,
+    limit: int = 20,
+):
+    """参加・観戦できるルームの一覧（filter: all / waiting / in_progress / spectatable）"""
+    if filter_name not in lobby.FILTERS:
+        raise HTTPException(status_code=400, detail=f"filterが不正です: {filter_name}")
+    try:
+        rooms, next_cursor = LOBBY.query(filter_name, cursor, limit)
+    except KeyError:
+        raise HTTPException(status_code=400, detail="cursorが無効です（最初から取得し直してください）")
+    return {"rooms": rooms, "nextCursor": next_cursor, "counts": LOBBY.counts()}
+
+
+@app.get("/api/cards")
+async def get_cards(request: Request):
+    """カード表（state はカードIDだけを持つ）。ETag で再検証できる"""
+    body, etag = cards_body()
+    headers = {"ETag": etag, "Cache-Control": REVALIDATE_CACHE}
+    if etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@app.get("/api/leaderboard")
+async def leaderboard(limit: int = 20):
+    """名前を付けて対戦したプレイヤーのランキング（勝ち数順）"""
+    return {"players": RESULTS.leaderboard(limit)}
+
+
+@app.get("/api/players/{player}/history")
+async def player_history(player: str, limit: int = 20):
+    """プレイヤーの通算成績と直近の対戦"""
+    return RESULTS.history(player, limit)
+
+
+@app.websocket("/lobby/ws")
+async def lobby_feed(websocket: WebSocket, filter_name: str = Query(lobby.ALL, alias="filter")):
+    """ロビーの変化を流す（最初に1ページ目を送り、以降は upsert/remove の差分）"""
+    await websocket.accept()
+    if filter_name not in lobby.FILTERS:
+        await websocket.send_text(json.dumps({"type": "error", "message": f"filterが不正です: {filter_name}"}, ensure_ascii=False))
+        await websocket.close()
+        return
+
+    sub = LOBBY.subscribe(filter_name)
+    rooms, next_cursor = LOBBY.query(filter_name)
+    await websocket.send_text(json.dumps(
+        {"type": "lobby", "op": "snapshot", "rooms": rooms, "nextCursor": next_cursor}, ensure_ascii=False
+    ))
+
+    async def pump() -> None:
+        while True:
+            event = await sub.queue.get()
+            await websocket.send_text(json.dumps({"type": "lobby", **event}, ensure_ascii=False))
+
+    pump_task = asyncio.create_task(pump())
+    try:
+        while True:
+            msg = await websocket.receive_text()
             try:
-                ts_f = float(ts)
-                for item in recent:
-                    if abs(item.ts - ts_f) < 0.0001:
-                        chosen = item
-                        break
+                data = json.loads(msg)
             except Exception:
-                chosen = None
+                continue
+            if isinstance(data, dict) and data.get("type") == "ping":
+                await websocket.send_text(json.dumps({"type": "pong"}))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        LOBBY.unsubscribe(sub)
+        pump_task.cancel()
+
+
+@app.websocket("/mux/ws")
+async def mux_feed(websocket: WebSocket):
+    """1本の接続で複数ルームを観戦する（フレームは roomId で包んで届く。mux.py 参照）"""
+    await websocket.accept()
+    conn = MuxConnection()
 
-        if chosen is None and idx is not None:
+    async def pump() -> None:
+        # この接続への送信はすべてキュー経由（順序を保つ）
+        while True:
+            text = await conn.queue.get()
+            await websocket.send_text(text)
+
+    pump_task = asyncio.create_task(pump())
+    try:
+        while True:
+            msg = await websocket.receive_text()
             try:
-                i = int(idx)
-                if 0 <= i < len(recent):
-                    chosen = recent[i]
+                data = json.loads(msg)
             except Exception:
-                chosen = None
+                conn.push(json.dumps({"type": "error", "message": "JSONが不正です"}, ensure_ascii=False))
+                continue
+            typ = str(data.get("type", "")) if isinstance(data, dict) else ""
+            room_id = str(data.get("roomId", "")) if isinstance(data, dict) else ""
+            if typ == "ping":
+                conn.push(json.dumps({"type": "pong"}))
+            elif typ == "subscribe":
+                await _mux_subscribe(conn, room_id)
+            elif typ == "unsubscribe":
+                channel = conn.channels.get(room_id)
+                if channel is not None and conn.detach(channel, reason="unsubscribed"):
+                    await _leave_room(channel, channel.room, "spectator")
+            else:
+                conn.push(json.dumps({"type": "error", "message": f"不明type: {typ}"}, ensure_ascii=False))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        pump_task.cancel()
+        for channel in list(conn.channels.values()):
+            conn.detach(channel, reason="disconnected")
+            await _leave_room(channel, channel.room, "spectator")
+
+
+async def _mux_subscribe(conn: MuxConnection, room_id: str) -> None:
+    """
+    観戦者として購読し、hello と現在の state を送る。
+    購読中のルームをもう一度 subscribe すると hello と state だけ送り直す（resync 後の取り直し用）
+    """
+    def error(message: str) -> None:
+        conn.push(json.dumps({"type": "error", "roomId": room_id, "message": message}, ensure_ascii=False))
+
+    old = conn.channels.get(room_id)
+    if old is not None and ROOMS.get(room_id) is not old.room:
+        # 前に購読していたルームは片付け済み・引き継ぎ済み
+        conn.detach(old, reason="closed")
+        await _leave_room(old, old.room, "spectator")
+        old = None
+
+    room = ROOMS.get(room_id)
+    if room is None:
+        error("部屋が見つかりませんでした")
+        return
+    async with room.lock:
+        if ROOMS.get(room_id) is not room:
+            error("部屋が見つかりませんでした")
+            return
+        channel = old
+        if channel is None:
+            if sum(1 for r in room.clients.values() if r == "spectator") >= MAX_SPECTATORS:
+                error("観戦者が上限に達しています")
+                return
+            channel = conn.attach(room_id)
+            if channel is None:
+                error("購読できるルーム数の上限に達しています")
+                return
+            # ルームからは観戦者のソケットの1つとして見える
+            channel.room = room
+            room.clients[channel] = "spectator"
+            room._update_lobby_locked()
+            AUDIT.record("join", room=room_id, role="spectator", mode="mux")
+        await room.send(channel, {"type": "hello", "roomId": room_id, "role": "spectator"})
+        await room.send(channel, room.state_frame("spectator"))
 
-        if chosen is None:
-            # 指摘が成立しない：自分ペナルティ
-            self._get_ps(role).penalty += 1
-            self._end_game_if_needed_locked()
-            return False, "指摘対象が不正です（指摘失敗：自分にペナルティ）"
 
-        # 指摘成功：相手にペナルティ
-        self._get_ps(enemy_role).penalty += 1
+# 静的アセット（ハッシュ付きURL・gzip版をメモリに保持）
+ASSETS = AssetPipeline("static")
 
-        # ログとして「accuse」も残す（任意）
-        self.state.cheatLog.append(
-            CheatLogItem(ts=now, by=role, action="accuse", payload={"targetTs": chosen.ts, "targetAction": chosen.action})
-        )
 
-        self._end_game_if_needed_locked()
-        return True, "accuse success (enemy penalty +1)"
+@app.on_event("startup")
+async def build_assets() -> None:
+    ASSETS.build()
 
-    def _action_mulligan_locked(self, role: str, payload: Dict[str, Any]) -> Tuple[bool, str]:
-        """マリガン選択を受け付ける"""
-        if not self.state.isMulliganPhase:
-            return False, "マリガンフェーズではありません"
-            
-        if (role == "player" and self.state.playerMulliganDone) or \
-           (role == "opponent" and self.state.opponentMulliganDone):
-            return False, "既にマリガンは完了しています"
-            
-        card_indices = payload.get("cardIndices", [])
-        if not isinstance(card_indices, list):
-            return False, "cardIndicesは配列である必要があります"
-            
-        ps = self._get_ps(role)
-        # インデックスの有効性チェック
-        for idx in card_indices:
-            if not isinstance(idx, int) or idx < 0 or idx >= len(ps.hand):
-                return False, f"無効なカードインデックス: {idx}"
-                
-        # マリガン情報を保存
-        if role == "player":
-            self.state.playerMulliganCards = card_indices[:]
-            self.state.playerMulliganDone = True
-        else:
-            self.state.opponentMulliganCards = card_indices[:]
-            self.state.opponentMulliganDone = True
-            
-        return True, f"マリガン選択完了: {len(card_indices)}枚"
-        
-    async def _execute_mulligan_locked(self) -> None:
-        """マリガンを実行する"""
-        if not self.state.isMulliganPhase:
-            return
-            
-        # プレイヤーのマリガン実行
-        if self.state.playerMulliganCards:
-            # 降順でソートして後ろから削除（インデックスずれを防ぐ）
-            for idx in sorted(self.state.playerMulliganCards, reverse=True):
-                if 0 <= idx < len(self.state.player.hand):
-                    self.state.player.hand.pop(idx)
-            # 削除した枚数分ドロー
-            draw_count = len(self.state.playerMulliganCards)
-            for _ in range(draw_count):
-                if len(CARD_DB) > 0:
-                    new_card = CARD_DB[int(time.time() * 1.1) % len(CARD_DB)]
-                    self.state.player.hand.append(new_card.id)
-                    
-        # 相手のマリガン実行
-        if self.state.opponentMulliganCards:
-            for idx in sorted(self.state.opponentMulliganCards, reverse=True):
-                if 0 <= idx < len(self.state.opponent.hand):
-                    self.state.opponent.hand.pop(idx)
-            draw_count = len(self.state.opponentMulliganCards)
-            for _ in range(draw_count):
-                if len(CARD_DB) > 0:
-                    new_card = CARD_DB[int(time.time() * 1.3) % len(CARD_DB)]
-                    self.state.opponent.hand.append(new_card.id)
-                    
-        # マリガンフェーズ終了
-        self.state.isMulliganPhase = False
-        self.state.timer = TURN_SECONDS  # 通常ターンタイマーに戻す
 
+@app.on_event("startup")
+async def start_admission() -> None:
+    ADMISSION.start()
 
-ROOMS: Dict[str, Room] = {}
 
+@app.on_event("startup")
+async def prewarm_rooms() -> None:
+    POOL.prewarm(ROOM_POOL_PREWARM)
 
-def get_room(room_id: str) -> Room:
-    if room_id not in ROOMS:
-        ROOMS[room_id] = Room(room_id)
-    return ROOMS[room_id]
 
+@app.on_event("startup")
+async def start_handoff_receiver() -> None:
+    global HANDOFF_RECEIVER
+    if HANDOFF_LISTEN:
+        HANDOFF_RECEIVER = HandoffReceiver(HANDOFF_LISTEN, prepare_room, commit_room, discard_room)
+        await HANDOFF_RECEIVER.start()
 
-# =========================
-# FastAPI
-# =========================
-app = FastAPI()
 
-# 先攻・後攻ランダム決定API
-@app.post("/api/first_attack")
-async def decide_first_attack():
-    import random
-    first = random.choice(["player", "opponent"])
-    return {"first": first}
+@app.on_event("shutdown")
+async def flush_archive() -> None:
+    # ブロックに満たない対戦記録も書き出しておく
+    ARCHIVE.close()
+
+
+@app.on_event("shutdown")
+async def flush_results() -> None:
+    RESULTS.close()
+
+
+@app.on_event("shutdown")
+async def flush_audit() -> None:
+    AUDIT.close()
+
+
+@app.on_event("shutdown")
+async def flush_traces() -> None:
+    TRACER.close()
 
-# ルートパスでindex.htmlを返す
+
+@app.on_event("shutdown")
+async def stop_handoff_receiver() -> None:
+    if HANDOFF_RECEIVER is not None:
+        HANDOFF_RECEIVER.close()
+
+
+# ルートパスでindex.html（参照をハッシュ付きURLへ書き換え済み）を返す
 @app.get("/")
-async def root():
-    return FileResponse("static/index.html")
+async def root(request: Request):
+    return ASSETS.response("/", request.headers)
 
 # 静的ファイル配信
-app.mount("/static", StaticFiles(directory="static", html=True), name="static")
+app.mount("/static", AssetStaticFiles(pipeline=ASSETS, directory="static", html=True), name="static")
 
 
 @app.websocket("/ws/{room_id}")
-async def ws_room(websocket: WebSocket, room_id: str, mode: str = "create"):
+async def ws_room(
+    websocket: WebSocket,
+    room_id: str,
+    mode: str = "create",
+    token: Optional[str] = None,
+    last_seq: Optional[int] = None,
+    name: Optional[str] = None,
+):
     await websocket.accept()
 
     room_exists = room_id in ROOMS
-    
+
+    # 再接続：トークンが有効なら同じ席に戻し、取りこぼしたフレームだけ再送する
+    if token and room_exists:
+        room = ROOMS[room_id]
+        role: Optional[str] = None
+        try:
+            async with room.lock:
+                # ロック待ちの間に片付け・再利用されていたら、そのルームの席には戻さない
+                role, stale = room.resume_session(token, websocket) if ROOMS.get(room_id) is room else (None, None)
+                if role is not None:
+                    room._update_lobby_locked()
+                    AUDIT.record("join", room=room_id, role=role, resumed=True, client=_client_addr(websocket))
+                    # ロック内で送る（先にループのブロードキャストが届いて hello より前になるのを防ぐ）
+                    await room.send(websocket, {"type": "hello", "roomId": room_id, "role": role, "token": token, "resumed": True})
+                    missed = room.replay_since(last_seq)
+                    if missed is None:
+                        # 遅れすぎ（バッファ外）ならスナップショット1つで追いつかせる
+                        await room.send(websocket, room.state_frame(role))
+                    else:
+                        for text in missed:
+                            await websocket.send_text(text)
+                        # 再送分は全員共通のフレームなので、自分の合法手だけ別に送る
+                        await room.send(websocket, {"type": "legal", "legal": room.current.legal.get(role)})
+        except Exception:
+            if role is not None:
+                await _leave_room(websocket, room, role)
+            return
+        if stale is not None:
+            try:
+                await stale.close()
+            except Exception:
+                pass
+        if role is not None:
+            await _serve_client(websocket, room, role)
+            return
+        room_exists = room_id in ROOMS
+
+    if mode == "watch":
+        # 観戦モード：既存のルームに spectator として入る
+        if not room_exists:
+            await _reject_not_found(websocket, room_id, mode)
+            return
+        room = ROOMS[room_id]
+        try:
+            async with room.lock:
+                if ROOMS.get(room_id) is not room:
+                    # ロック待ちの間に片付け・再利用・引き継ぎされた
+                    await _reject_not_found(websocket, room_id, mode)
+                    return
+                if sum(1 for r in room.clients.values() if r == "spectator") >= MAX_SPECTATORS:
+                    AUDIT.record("reject", room=room_id, mode=mode, reason="spectators_full", client=_client_addr(websocket))
+                    await room.send(websocket, {"type": "error", "message": "観戦者が上限に達しています"})
+                    await websocket.close()
+                    return
+                room.clients[websocket] = "spectator"
+                room._update_lobby_locked()
+                AUDIT.record("join", room=room_id, role="spectator", mode=mode, client=_client_addr(websocket))
+                await room.send(websocket, {"type": "hello", "roomId": room_id, "role": "spectator"})
+            await room.send(websocket, room.state_frame("spectator"))
+        except Exception:
+            await _leave_room(websocket, room, "spectator")
+            return
+        await _serve_client(websocket, room, "spectator")
+        return
+
     if mode == "join":
         # 「部屋を探す」モード：既存のルームにのみ接続可能
         if not room_exists:
-            await websocket.send_text(json.dumps({"type": "error", "message": "部屋が見つかりませんでした"}, ensure_ascii=False))
-            await websocket.close()
+            await _reject_not_found(websocket, room_id, mode)
             return
         
         room = ROOMS[room_id]
-        async with room.lock:
-            if len(room.clients) >= 2:
-                await websocket.send_text(json.dumps({"type": "error", "message": "このルームは既に満員です"}, ensure_ascii=False))
-                await websocket.close()
-                return
-            
-            role = room.assign_role()  # "opponent"または"spectator"
-            room.clients[websocket] = role
     else:
         # 「部屋を作る」モード：新しいルームを作成または既存ルームに接続
         if not room_exists:
-            room = Room(room_id)
-            ROOMS[room_id] = room
+            # 混雑時は新しいルームを作らせない（進行中の対戦のタイマー精度を優先）
+            if not ADMISSION.admit_new_room():
+                AUDIT.record("reject", room=room_id, mode=mode, reason="overloaded", client=_client_addr(websocket))
+                await websocket.send_text(json.dumps({
+                    "type": "error",
+                    "code": "overloaded",
+                    "message": "サーバーが混雑しています。しばらくしてから再度お試しください",
+                }, ensure_ascii=False))
+                await websocket.close(code=1013)
+                return
+            room = get_room(room_id)
         else:
             room = ROOMS[room_id]
-        
+
+    role = "spectator"
+    try:
         async with room.lock:
-            if len(room.clients) >= 2:
-                await websocket.send_text(json.dumps({"type": "error", "message": "このルームは既に満員です"}, ensure_ascii=False))
-                await websocket.close()
+            if ROOMS.get(room_id) is not room:
+                # ロック待ちの間に片付け・再利用・引き継ぎされた（別の対戦に座らせない）
+                await _reject_not_found(websocket, room_id, mode)
                 return
-            
+            # 再接続待ちの席も埋まっているものとして扱う
             role = room.assign_role()
+            if room.player_count() >= 2 or role == "spectator":
+                AUDIT.record("reject", room=room_id, mode=mode, reason="room_full", client=_client_addr(websocket))
+                await room.send(websocket, {"type": "error", "message": "このルームは既に満員です"})
+                await websocket.close()
+                return
+
             room.clients[websocket] = role
+            token = room.open_session(websocket, role)
+            # 名前なしで参加したら前にその席にいた人の名前は引き継がない
+            player_name = clean_name(name)
+            if player_name is None:
+                room.player_names.pop(role, None)
+            else:
+                room.player_names[role] = player_name
+            room._update_lobby_locked()
+            AUDIT.record("join", room=room_id, role=role, mode=mode, name=player_name, client=_client_addr(websocket))
+
+            # 参加通知（ロック内で送り、他のフレームより先に届くようにする）
+            await room.send(websocket, {"type": "hello", "roomId": room_id, "role": role, "token": token, "resumed": False})
+
+        # 参加時のメッセージを役割で分岐
+        if role == "player":
+            await room.broadcast({"type": "system", "message": "接続待機中..."})
+        elif role == "opponent":
+            await room.broadcast({"type": "system", "message": "対戦相手が見つかりました"})
+
+        # 2人揃ったら自動でゲーム開始
+        if room.player_count() == 2 and not room.started:
+            await room.handle_action("player", "start", {})
+
+        # すぐstateを送る
+        await room.send(websocket, room.state_frame(role))
+    except Exception:
+        # 参加処理の途中で切れた（作ったばかりの空ルームもここで片付けに回る）
+        await _leave_room(websocket, room, role)
+        return
+
+    await _serve_client(websocket, room, role)
 
-    # 参加通知
-    await websocket.send_text(json.dumps({"type": "hello", "roomId": room_id, "role": role}, ensure_ascii=False))
-    # 参加時のメッセージを役割で分岐
-    if role == "player":
-        await room.broadcast({"type": "system", "message": "接続待機中..."})
-    elif role == "opponent":
-        await room.broadcast({"type": "system", "message": "対戦相手が見つかりました"})
 
-    # 2人揃ったら自動でゲーム開始
-    if len(room.clients) == 2 and not room.started:
-        await room.handle_action("player", "start", {})
+async def _reject_not_found(websocket: WebSocket, room_id: str, mode: str) -> None:
+    AUDIT.record("reject", room=room_id, mode=mode, reason="not_found", client=_client_addr(websocket))
+    await websocket.send_text(json.dumps({"type": "error", "message": "部屋が見つかりませんでした"}, ensure_ascii=False))
+    await websocket.close()
 
-    # すぐstateを送る
-    await websocket.send_text(json.dumps({"type": "state", "state": room.snapshot()}, ensure_ascii=False))
 
+def _client_addr(websocket: WebSocket) -> Optional[str]:
+    client = websocket.client
+    return f"{client.host}:{client.port}" if client else None
+
+
+async def _serve_client(websocket: WebSocket, room: Room, role: str) -> None:
+    """参加後の受信ループ（新規接続・再接続で共通）"""
     try:
         while True:
+            recv_start = time.time_ns()
             msg = await websocket.receive_text()
+            recv_end = time.time_ns()
+            if websocket not in room.clients:
+                # 席を外れた（再接続した別の接続に引き継がれた・引き継ぎでルームごと移った）
+                break
             try:
                 data = json.loads(msg)
             except Exception:
-                await websocket.send_text(json.dumps({"type": "error", "message": "JSONが不正です"}, ensure_ascii=False))
+                await room.send(websocket, {"type": "error", "message": "JSONが不正です"})
                 continue
 
             typ = str(data.get("type", ""))
             if typ == "ping":
-                await websocket.send_text(json.dumps({"type": "pong"}, ensure_ascii=False))
+                await room.send(websocket, {"type": "pong"})
                 continue
 
             if typ == "battle-ready":
@@ -675,21 +1456,62 @@ async def ws_room(websocket: WebSocket, room_id: str, mode: str = "create"):
                 action = str(data.get("action", ""))
                 payload = data.get("payload", {}) or {}
 
-                ok, reason = await room.handle_action(role, action, payload)
-
-                # 反映後stateを全員へ
-                await room.broadcast({"type": "state", "state": room.snapshot()})
+                # ws.receive は受信待ちの時間も含む（前のメッセージからの間隔）
+                trace = TRACER.start("ws.action", recv_start, **{"room.id": room.room_id, "role": role, "action": action})
+                trace.add("ws.receive", recv_start, recv_end)
+                trace.add("json.loads", recv_end, time.time_ns())
+
+                ok, reason = await room.handle_action(role, action, payload, trace, websocket)
+                # トレースIDを返すのでクライアント側のログと突き合わせられる
+                result: Dict[str, Any] = {"ok": ok, "reason": reason, "traceId": trace.trace_id}
+
+                # 反映後stateを全員へ（状態が変わらなかった操作では送らない）
+                # rid 付きの操作なら、本人には結果を載せた state 1通だけを送る
+                rid = data.get("rid")
+                if rid is not None:
+                    result["rid"] = rid
+                with trace.span("broadcast"):
+                    if room.throttled and not room.state.isGameOver:
+                        # CPU を使いすぎているルームは操作ごとに送らず、次のティックでまとめて送る
+                        folded = False
+                    elif rid is None:
+                        folded = False
+                        await room.broadcast_state()
+                    else:
+                        folded = await room.broadcast_state(websocket, result)
 
-                # 自分へ結果
-                await websocket.send_text(json.dumps({"type": "ack", "ok": ok, "reason": reason}, ensure_ascii=False))
+                # state が出なかった（失敗・カーソル等）か rid なしなら ack を別に送る
+                if not folded:
+                    with trace.span("ack.send"):
+                        await room.send(websocket, {"type": "ack", **result})
+                TRACER.finish(trace, ok=ok)
                 continue
 
-            await websocket.send_text(json.dumps({"type": "error", "message": f"不明type: {typ}"}, ensure_ascii=False))
+            await room.send(websocket, {"type": "error", "message": f"不明type: {typ}"})
 
     except WebSocketDisconnect:
         pass
     finally:
-        async with room.lock:
-            room.clients.pop(websocket, None)
-
+        await _leave_room(websocket, room, role)
+
+
+async def _leave_room(websocket: WebSocket, room: Room, role: str) -> None:
+    """切断時の後始末（受信ループの終了時と、参加処理の途中で送信に失敗したとき）"""
+    async with room.lock:
+        member = room.clients.pop(websocket, None) is not None
+        # 別の接続に席を引き継がれていれば退出扱いにしない
+        left = room.detach_session(websocket)
+        if left:
+            room.client_cursors.pop(role, None)
+            room.cursor_accepted_at.pop(role, None)
+        if ROOMS.get(room.room_id) is room:
+            room._update_lobby_locked()
+        # replaced: 再接続した別の接続に席を引き継がれた（退出ではない）
+        AUDIT.record("leave", room=room.room_id, role=role, replaced=not left and role != "spectator")
+
+    if left:
         await room.broadcast({"type": "system", "message": f"{role} が退出しました"})
+
+    # 全員抜けたらプールへ戻す（席にいなかった接続は、既に片付けられて再利用されたルームを触らない）
+    if member:
+        await recycle_room(room)
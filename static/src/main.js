@@ -1,5 +1,11 @@
 // main.js: ゲーム進行・UI制御・タイトル画面→ゲーム画面遷移
-import { initThree, renderFromState } from "/static/src/render-3d.js";
+import { initThree, renderFromState, setCardTable } from "/static/src/render-3d.js";
+
+// カード表は state に含まれないので最初に1回だけ取る（ETag で再検証される）
+const cardTableReady = fetch("/api/cards")
+  .then((res) => (res.ok ? res.json() : []))
+  .catch(() => [])
+  .then((cards) => setCardTable(cards));
 
 let gameStarted = false;
 let currentTurn = "player";
@@ -134,10 +140,37 @@ document.addEventListener("DOMContentLoaded", () => {
   let attackOrderShown = false;
   let mulliganTimerInterval = null;
   let currentCardHovered = null; // 現在カーソルが当たっているカード
-
-  function connectWebSocket(roomId, mode = "create") {
-    if (ws) ws.close();
-    ws = new WebSocket(`ws://127.0.0.1:8000/ws/${roomId}?mode=${mode}`);
+  // 再接続（レジューム）用
+  let sessionToken = null; // helloで受け取るトークン
+  let lastSeq = 0; // 最後に受信したフレームの通し番号
+  let reconnectAttempts = 0;
+  const MAX_RECONNECT_ATTEMPTS = 5;
+  let reconnectRequested = false; // サーバー再起動（引き継ぎ）で再接続を指示された
+  // 操作ごとのリクエストID（結果は rid 付きの state か ack で返ってくる）
+  let nextRid = 1;
+  const pendingActions = new Map(); // rid -> 送信時刻
+  // サーバーが計算した合法手（playable は出せる手札インデックスの配列）
+  let legalActions = null;
+
+  // 戦績・ランキング用の名前（ページURLの ?name=... を参加時にサーバーへ渡す）
+  const playerName = new URLSearchParams(location.search).get("name");
+
+  function connectWebSocket(roomId, mode = "create", resume = false) {
+    if (ws) {
+      ws.onclose = null; // 意図的な切断では再接続しない
+      ws.close();
+    }
+    let url = `ws://127.0.0.1:8000/ws/${roomId}?mode=${mode}`;
+    if (resume && sessionToken) {
+      url += `&token=${encodeURIComponent(sessionToken)}&last_seq=${lastSeq}`;
+    } else {
+      sessionToken = null;
+      lastSeq = 0;
+      if (playerName) {
+        url += `&name=${encodeURIComponent(playerName)}`;
+      }
+    }
+    ws = new WebSocket(url);
     const showRoomId = mode === "create";
     if (showRoomId) {
       document.getElementById("room-id-label").textContent = roomId;
@@ -150,6 +183,16 @@ document.addEventListener("DOMContentLoaded", () => {
     ws.onmessage = (event) => {
       const msg = JSON.parse(event.data);
       console.log("受信msg:", JSON.stringify(msg, null, 2));
+      if (msg.type === "hello") {
+        // 再接続に失敗して新規参加になった場合は通し番号を振り直す
+        if (!msg.resumed) lastSeq = 0;
+        if (msg.token) sessionToken = msg.token;
+        reconnectAttempts = 0;
+      } else if (typeof msg.seq === "number") {
+        // 再送フレームと新着フレームが前後した場合、古いものは捨てる
+        if (msg.seq < lastSeq) return;
+        lastSeq = msg.seq;
+      }
       if (msg.type === "hello") {
         myRole = msg.role;
         const myRoleEl = document.getElementById("my-role");
@@ -263,13 +306,14 @@ document.addEventListener("DOMContentLoaded", () => {
         // デバッグ: 受信stateの中身を確認
         console.log("state.player", latestState.player);
         console.log("state.opponent", latestState.opponent);
-        console.log("state.cards", latestState.cards);
         // 対戦画面に遷移済みなら描画
         const gameRoot = document.getElementById("game-root");
         const container = document.getElementById("game-3d-container");
 
         if (gameRoot && gameRoot.style.display === "block" && container) {
-          renderFromState(latestState, myRole);
+          // カード表が届く前に state が来たら、届いてから描く
+          const state = latestState;
+          cardTableReady.then(() => renderFromState(state, myRole));
         }
         // 通信相手が見つかったらUI表示
         if (msg.state.started) {
@@ -323,6 +367,24 @@ document.addEventListener("DOMContentLoaded", () => {
           }, 1000);
         }
       }
+      if (msg.legal !== undefined) {
+        // state に同梱、または再接続直後の legal フレーム
+        legalActions = msg.legal;
+      }
+      if (msg.type === "reconnect") {
+        // 対戦は新しいサーバーへ引き継ぎ済み。切断されたらすぐ同じ席へ戻る
+        reconnectRequested = true;
+        return;
+      }
+      if (msg.rid !== undefined && pendingActions.has(msg.rid)) {
+        // 自分の操作の結果（state に同梱されていても ack でも同じ扱い）
+        const sentAt = pendingActions.get(msg.rid);
+        pendingActions.delete(msg.rid);
+        console.log(`action rid=${msg.rid} ${Math.round(performance.now() - sentAt)}ms`);
+        if (msg.type !== "ack") {
+          document.getElementById("connection-status").textContent = msg.reason;
+        }
+      }
       if (msg.type === "ack") {
         // 操作結果
         document.getElementById("connection-status").textContent = msg.reason;
@@ -341,6 +403,19 @@ document.addEventListener("DOMContentLoaded", () => {
     };
     ws.onclose = () => {
       document.getElementById("connection-status").textContent = "未接続";
+      if (reconnectRequested) {
+        reconnectRequested = false;
+        setTimeout(() => connectWebSocket(roomId, mode, true), 100);
+        return;
+      }
+      // 回線が切れたら同じ席への再接続を試みる
+      if (sessionToken && reconnectAttempts < MAX_RECONNECT_ATTEMPTS) {
+        reconnectAttempts++;
+        setTimeout(
+          () => connectWebSocket(roomId, mode, true),
+          1000 * reconnectAttempts,
+        );
+      }
     };
     currentRoomId = roomId;
   }
@@ -398,19 +473,20 @@ document.addEventListener("DOMContentLoaded", () => {
     }
   }
 
+  // 操作を送る。rid を付けるので、結果は state 1通にまとめて返ってくる
+  function sendAction(action, payload = {}) {
+    if (!ws || ws.readyState !== WebSocket.OPEN) return null;
+    const rid = nextRid++;
+    pendingActions.set(rid, performance.now());
+    ws.send(JSON.stringify({ type: "action", action, payload, rid }));
+    return rid;
+  }
+
   // カーソル位置をサーバーに送信（ハイライト情報は送信しない）
   function sendCursorUpdate(x, y, cardId = null) {
-    if (ws && ws.readyState === WebSocket.OPEN) {
-      // ハイライト情報は送信せず、位置情報のみ送信
-      const payload = { x, y };
-      // cardIdは送信しない（ローカルのハイライトのみ）
-      
-      ws.send(JSON.stringify({
-        type: "action",
-        action: "cursor",
-        payload: payload
-      }));
-    }
+    // ハイライト情報は送信せず、位置情報のみ送信
+    // cardIdは送信しない（ローカルのハイライトのみ）
+    sendAction("cursor", { x, y });
   }
 
   // =========================
@@ -9,6 +9,9 @@ let input = {
   onCursorAction: null, // (hitInfo) -> main.jsが解釈する
 };
 
+// カード表（GET /api/cards を main.js が取ってきて渡す）
+let cardTable = [];
+
 let cardMeshes = [];
 let oppCardMeshes = [];
 let myFieldMeshes = [];
@@ -648,11 +651,15 @@ function setInputHandlers(handlers) {
   input = { ...input, ...handlers };
 }
 
+function setCardTable(cards) {
+  cardTable = cards || [];
+}
+
 function renderFromState(state, myRole) {
   if (!scene) return;
 
   const cardsById = new Map();
-  (state.cards || []).forEach((c) => cardsById.set(c.id, c));
+  (state.cards || cardTable).forEach((c) => cardsById.set(c.id, c));
 
   const me = myRole === "opponent" ? state.opponent : state.player;
   const enemy = myRole === "opponent" ? state.player : state.opponent;
@@ -829,6 +836,7 @@ window.updateCardHover3D = updateCardHover3D;
 export {
   initThree,
   renderFromState,
+  setCardTable,
   setInputHandlers,
   hitTestAtScreen,
   getCardUnderCursor,
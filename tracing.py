@@ -0,0 +1,181 @@
+"""
+アクション単位のトレース (tracing.py)
+受信したアクション1件ごとにトレースIDを振り、処理段階ごとのスパンを記録する。
+サンプリングは受信時点で決める（head sampling）。記録したスパンは別スレッドでまとめて
+OTLP/JSON（ExportTraceServiceRequest）形式の1行として追記するので、外部サービスなしで
+段階ごとの遅延を集計できる。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, List, Optional
+
+
+# =========================
+# 設定
+# =========================
+SAMPLE_RATE = 0.1         # 記録するトレースの割合
+BATCH_SPANS = 512         # この数たまったら書き出す
+FLUSH_INTERVAL = 2.0      # これだけ経ったら数に満たなくても書き出す（秒）
+SERVICE_NAME = "ikasama-cardgame"
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+
+_NOOP_SPAN = nullcontext()
+
+
+def _attr(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class Trace:
+    """1アクションぶんのトレース。sampled=False なら記録系の呼び出しは何もしない"""
+
+    __slots__ = ("trace_id", "sampled", "root_id", "start_ns", "name", "attrs", "spans")
+
+    def __init__(self, name: str, sampled: bool, attrs: Optional[Dict[str, Any]] = None,
+                 start_ns: Optional[int] = None):
+        self.trace_id = os.urandom(16).hex()
+        self.sampled = sampled
+        self.root_id = os.urandom(8).hex()
+        self.start_ns = start_ns if start_ns is not None else time.time_ns()
+        self.name = name
+        self.attrs = attrs or {}
+        self.spans: List[Dict[str, Any]] = []
+
+    def add(self, name: str, start_ns: int, end_ns: int, **attrs: Any) -> None:
+        """計測済みの区間をスパンとして追加する"""
+        if not self.sampled:
+            return
+        self.spans.append({
+            "traceId": self.trace_id,
+            "spanId": os.urandom(8).hex(),
+            "parentSpanId": self.root_id,
+            "name": name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(start_ns),
+            "endTimeUnixNano": str(end_ns),
+            "attributes": [_attr(k, v) for k, v in attrs.items()],
+        })
+
+    def span(self, name: str):
+        """with trace.span("broadcast"): ... で区間を計測する"""
+        if not self.sampled:
+            return _NOOP_SPAN
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name: str) -> Iterator[None]:
+        start = time.time_ns()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.time_ns())
+
+    def root_span(self, end_ns: int) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.root_id,
+            "name": self.name,
+            "kind": SPAN_KIND_SERVER,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(end_ns),
+            "attributes": [_attr(k, v) for k, v in self.attrs.items()],
+        }
+
+
+# 何も記録しないトレース（トレース不要な呼び出し元の既定値）
+NOOP_TRACE = Trace("noop", sampled=False)
+
+
+class Tracer:
+    def __init__(self, path: str, sample_rate: float = SAMPLE_RATE,
+                 batch_spans: int = BATCH_SPANS, flush_interval: float = FLUSH_INTERVAL):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.batch_spans = batch_spans
+        self.flush_interval = flush_interval
+        self._queue: "queue.SimpleQueue[Optional[List[Dict[str, Any]]]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.exported = 0
+        self.failed = 0    # 書き出せずに捨てたスパン数
+
+    def start(self, name: str, start_ns: Optional[int] = None, **attrs: Any) -> Trace:
+        return Trace(name, random.random() < self.sample_rate, attrs, start_ns)
+
+    def finish(self, trace: Trace, **attrs: Any) -> None:
+        if not trace.sampled:
+            return
+        trace.attrs.update(attrs)
+        spans = [trace.root_span(time.time_ns())] + trace.spans
+        self._ensure_thread()
+        self._queue.put(spans)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        batch: List[Dict[str, Any]] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = []
+            if item is None:
+                self._write(batch)
+                return
+            batch.extend(item)
+            if len(batch) >= self.batch_spans or time.monotonic() >= deadline:
+                self._write(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _write(self, spans: List[Dict[str, Any]]) -> None:
+        if not spans:
+            return
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [_attr("service.name", SERVICE_NAME)]},
+                "scopeSpans": [{"scope": {"name": "server"}, "spans": spans}],
+            }]
+        }
+        try:
+            line = json.dumps(payload, ensure_ascii=False, default=str) + "\n"
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except (OSError, ValueError):
+            # ディスク不足・権限・循環参照など。このバッチは捨てて数え、書き出しスレッドは止めない
+            self.failed += len(spans)
+            return
+        self.exported += len(spans)
+
+    def close(self) -> None:
+        """残りを書き出してスレッドを止める"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._thread = None